@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class FeedbackConfig(AppConfig):
+    name = 'feedback'
+
+    def ready(self):
+        # Connects the signal receivers that clean up the marksheet cache
+        import feedback.signals
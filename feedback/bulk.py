@@ -0,0 +1,131 @@
+"""Rendering the marksheets of a whole assessment at once
+
+Laying out the marksheets with ReportLab is CPU-bound, so the students
+are split into chunks and rendered in a pool of processes (as many as
+settings.MARKSHEET_WORKERS, or one per core). Every student gets a PDF
+of their own, which are then either merged into one document or packed
+into a ZIP file. Marksheets that have been rendered before come straight
+from the cache in feedback.marksheets.
+"""
+import zipfile
+from io import BytesIO
+from multiprocessing import Pool, cpu_count
+from django.conf import settings
+from django.db import connections
+from feedback.marksheets import cached_marksheet
+from main.models import Assessment, Student
+from PyPDF2 import PdfFileMerger
+
+CHUNKS_PER_WORKER = 4
+
+
+def students_with_marksheets(assessment, attempt):
+    """Returns the students with completed feedback for an assessment"""
+    return Student.objects.filter(
+        modules=assessment.module,
+        performances__module=assessment.module,
+        performances__assessment_results__assessment=assessment,
+        performances__assessment_results__feedback__attempt=attempt,
+        performances__assessment_results__feedback__completed=True
+    ).distinct()
+
+
+def render_chunk(chunk):
+    """Renders the marksheets for (assessment id, student ids, attempt)
+
+    This runs in the worker processes, so it only gets and returns simple
+    values. Returns a list of (student id, PDF) in the given order.
+    """
+    assessment_id, student_ids, attempt = chunk
+    assessment = Assessment.objects.select_related('module').get(
+        pk=assessment_id)
+    students = Student.objects.in_bulk(student_ids)
+    rendered = []
+    for student_id in student_ids:
+        student = students[student_id]
+        rendered.append(
+            (student.student_id,
+             cached_marksheet(assessment, student, attempt))
+        )
+    return rendered
+
+
+def split(items, number):
+    """Splits a list into at most number chunks of similar size"""
+    size = max(1, -(-len(items) // number))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def render_marksheets(assessment, students, attempt, workers=None,
+                      progress=None):
+    """Renders the marksheets of all students in parallel
+
+    Returns a list of (student id, PDF) in the order of students. With
+    only one worker, everything is rendered in this process.
+    """
+    if workers is None:
+        workers = settings.MARKSHEET_WORKERS or cpu_count()
+    pks = [student.pk for student in students]
+    chunks = [
+        (assessment.pk, chunk, attempt)
+        for chunk in split(pks, workers * CHUNKS_PER_WORKER)
+    ]
+    rendered = []
+    if workers == 1 or len(chunks) < 2:
+        results = map(render_chunk, chunks)
+        pool = None
+    else:
+        # The worker processes must not share the database connection
+        connections.close_all()
+        pool = Pool(workers)
+        results = pool.imap(render_chunk, chunks)
+    try:
+        for result in results:
+            rendered.extend(result)
+            if progress is not None:
+                progress(len(rendered), len(pks))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return rendered
+
+
+def merge_marksheets(rendered, output):
+    """Writes all marksheets into one PDF, each one starting on a new page"""
+    merger = PdfFileMerger()
+    for student_id, pdf in rendered:
+        merger.append(BytesIO(pdf))
+    merger.write(output)
+
+
+def zip_marksheets(assessment, students, rendered, output):
+    """Writes a ZIP file with one PDF per student"""
+    names = {}
+    for student in students:
+        names[student.student_id] = (
+            assessment.filename() + '_' +
+            student.last_name.replace(' ', '_') + '_' +
+            student.first_name.replace(' ', '_') + '.pdf'
+        )
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for student_id, pdf in rendered:
+            archive.writestr(names[student_id], pdf)
+
+
+def all_marksheets_pdf(output, progress, assessment_id, attempt):
+    """Renders the completed marksheets of an assessment into one PDF"""
+    assessment = Assessment.objects.get(pk=assessment_id)
+    students = list(students_with_marksheets(assessment, attempt))
+    rendered = render_marksheets(
+        assessment, students, attempt, progress=progress)
+    merge_marksheets(rendered, output)
+
+
+def all_marksheets_zip(output, progress, assessment_id, attempt):
+    """Renders the completed marksheets of an assessment into a ZIP file"""
+    assessment = Assessment.objects.get(pk=assessment_id)
+    students = list(students_with_marksheets(assessment, attempt))
+    rendered = render_marksheets(
+        assessment, students, attempt, progress=progress)
+    zip_marksheets(assessment, students, rendered, output)
@@ -0,0 +1,130 @@
+"""Rendering single marksheets, with a cache on the disk
+
+Students download their marksheets again and again, especially when the
+results are released. Every rendered marksheet is therefore kept in
+settings.MARKSHEET_CACHE, under a hash of everything that is printed on
+it: the feedback (and group feedback), the markers, the marks, the names
+of student, module and assessment, both marksheet types, the logo (or
+the name printed in its place) and MARKSHEET_VERSION. An unchanged
+marksheet is served from the disk, while any change leads to a different
+key, so an outdated file is never served - not even after a bulk update
+that does not send any signals.
+
+The files are kept in a directory per assessment result, and the
+receivers in feedback.signals remove that directory whenever the
+feedback or the marks change, so that unused files do not pile up.
+"""
+import hashlib
+import json
+import os
+import shutil
+from io import BytesIO
+from django.conf import settings
+from feedback.models import GroupFeedback, IndividualFeedback
+from feedback.views import group_presentation_marksheet, individual_marksheet
+from main.db_settings import db_settings
+from main.models import AssessmentResult, Staff
+from main.pdf import institution_name, logo_source
+from reportlab.platypus import SimpleDocTemplate
+
+# Raise this whenever the layout of the marksheets changes
+MARKSHEET_VERSION = 1
+
+
+def render_marksheet(assessment, student, attempt):
+    """Returns the marksheet of one student as a PDF string"""
+    output = BytesIO()
+    document = SimpleDocTemplate(output)
+    uni_name = db_settings.uni_name
+    document.setAuthor = uni_name
+    document.setTitle = 'Marksheet'
+    if assessment.group_assessment:
+        elements = group_presentation_marksheet(assessment, student, attempt)
+    else:
+        elements = individual_marksheet(assessment, student, attempt)
+    document.build(elements)
+    return output.getvalue()
+
+
+def marker_names(markers):
+    return list(markers.order_by('pk').values_list(
+        'user__first_name', 'user__last_name'))
+
+
+def marksheet_key(assessment, student, attempt):
+    """Returns (assessment result id, key) for the marksheet of a student
+
+    The key is a hash of all the data that the marksheet shows.
+    """
+    feedback = IndividualFeedback.objects.get(
+        assessment_result__assessment=assessment,
+        assessment_result__part_of__student=student,
+        attempt=attempt
+    )
+    result = AssessmentResult.objects.filter(
+        pk=feedback.assessment_result_id).values()[0]
+    source = logo_source()
+    if source is None:
+        logo = [None, institution_name()]
+    else:
+        logo = [source, None]
+    # The layout of resits depends on the first marksheet type as well
+    data = [
+        MARKSHEET_VERSION,
+        [assessment.marksheet_type, assessment.resit_marksheet_type],
+        [assessment.group_assessment, logo],
+        [assessment.title, assessment.max_word_count],
+        [assessment.module.title, assessment.module.code],
+        [student.first_name, student.last_name],
+        result,
+        IndividualFeedback.objects.filter(pk=feedback.pk).values()[0],
+        marker_names(feedback.markers),
+        marker_names(Staff.objects.filter(pk=feedback.second_marker_id)),
+    ]
+    if assessment.group_assessment:
+        group_feedback = GroupFeedback.objects.get(
+            assessment=assessment,
+            group_number=result['assessment_group'],
+            attempt=attempt
+        )
+        data.append(
+            GroupFeedback.objects.filter(pk=group_feedback.pk).values()[0])
+        data.append(marker_names(group_feedback.markers))
+    encoded = json.dumps(data, sort_keys=True, default=str)
+    key = hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    return feedback.assessment_result_id, key
+
+
+def result_directory(result_id):
+    return os.path.join(settings.MARKSHEET_CACHE, str(result_id))
+
+
+def cached_marksheet(assessment, student, attempt):
+    """Returns the marksheet PDF, rendering it only if it is not cached"""
+    result_id, key = marksheet_key(assessment, student, attempt)
+    directory = os.path.join(result_directory(result_id), attempt)
+    path = os.path.join(directory, key + '.pdf')
+    try:
+        with open(path, 'rb') as cached:
+            return cached.read()
+    except IOError:
+        pass
+    pdf = render_marksheet(assessment, student, attempt)
+    # Written under a temporary name first, so that nobody reads half a
+    # file. If the directory is deleted in the meantime, the marksheet has
+    # changed anyway and is not cached.
+    temporary_path = '%s.%s.part' % (path, os.getpid())
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temporary_path, 'wb') as output:
+            output.write(pdf)
+        os.rename(temporary_path, path)
+    except OSError:
+        pass
+    return pdf
+
+
+def invalidate_marksheets(result_ids):
+    """Deletes the cached marksheets of the given assessment results"""
+    for result_id in result_ids:
+        shutil.rmtree(result_directory(result_id), ignore_errors=True)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 10:01
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupFeedback',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group_number', models.IntegerField()),
+                ('attempt', models.CharField(choices=[('first', 'First Attempt'), ('resit', 'First Resit'), ('second_resit', 'Second Resit'), ('qld_resit', 'QLD Resit')], max_length=15)),
+                ('completed', models.BooleanField(default=False)),
+                ('group_mark', models.IntegerField(blank=True, null=True)),
+                ('marking_date', models.DateField(blank=True, null=True)),
+                ('submission_date', models.DateField(blank=True, null=True)),
+                ('category_mark_1', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_2', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_3', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_4', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_5', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_6', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_7', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_8', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_1_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_2_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_3_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_4_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_5_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_6_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_7_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_8_free', models.IntegerField(blank=True, null=True)),
+                ('comments', models.TextField(blank=True)),
+                ('assessment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_feedback', to='main.Assessment')),
+                ('markers', models.ManyToManyField(blank=True, null=True, related_name='group_feedback', to='main.Staff')),
+                ('second_marker', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='group_feedback_as_second_marker', to='main.Staff')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IndividualFeedback',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt', models.CharField(choices=[('first', 'First Attempt'), ('resit', 'First Resit'), ('second_resit', 'Second Resit'), ('qld_resit', 'QLD Resit')], max_length=15)),
+                ('completed', models.BooleanField(default=False)),
+                ('marking_date', models.DateField(blank=True, null=True)),
+                ('individual_mark', models.IntegerField(blank=True, null=True)),
+                ('category_mark_1', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_2', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_3', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_4', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_5', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_6', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_7', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_8', models.IntegerField(blank=True, choices=[(29, '0 - 29 %'), (39, '30 - 39 %'), (49, '40 - 49 %'), (59, '50 - 59 %'), (69, '60 - 69 %'), (79, '70 - 79 %'), (80, '80 or more')], null=True)),
+                ('category_mark_1_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_2_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_3_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_4_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_5_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_6_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_7_free', models.IntegerField(blank=True, null=True)),
+                ('category_mark_8_free', models.IntegerField(blank=True, null=True)),
+                ('deduction', models.IntegerField(blank=True, null=True)),
+                ('deduction_explanation', models.TextField(blank=True)),
+                ('part_1_mark', models.IntegerField(blank=True, null=True)),
+                ('part_2_mark', models.IntegerField(blank=True, null=True)),
+                ('submission_date', models.DateField(blank=True, null=True)),
+                ('comments', models.TextField(blank=True)),
+                ('comments_2', models.TextField(blank=True)),
+                ('assessment_result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feedback', to='main.AssessmentResult')),
+                ('markers', models.ManyToManyField(blank=True, null=True, related_name='feedback', to='main.Staff')),
+                ('second_marker', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feedback_as_second_marker', to='main.Staff')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='individualfeedback',
+            unique_together=set([('assessment_result', 'attempt')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupfeedback',
+            unique_together=set([('assessment', 'group_number', 'attempt')]),
+        ),
+    ]
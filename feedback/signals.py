@@ -0,0 +1,46 @@
+"""Signal receivers that remove outdated marksheets from the cache
+
+The receivers are connected in FeedbackConfig.ready(). As the cache key
+contains all data on the marksheet, this only saves space - a changed
+marksheet is never served from the cache, even without a signal.
+"""
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from feedback.marksheets import invalidate_marksheets
+from feedback.models import GroupFeedback, IndividualFeedback
+from main.models import AssessmentResult
+
+
+@receiver(post_save, sender=IndividualFeedback)
+@receiver(post_delete, sender=IndividualFeedback)
+def individual_feedback_changed(sender, instance, **kwargs):
+    invalidate_marksheets([instance.assessment_result_id])
+
+
+@receiver(post_save, sender=GroupFeedback)
+@receiver(post_delete, sender=GroupFeedback)
+def group_feedback_changed(sender, instance, **kwargs):
+    invalidate_marksheets(
+        AssessmentResult.objects.filter(
+            assessment=instance.assessment_id,
+            assessment_group=instance.group_number
+        ).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=AssessmentResult)
+@receiver(post_delete, sender=AssessmentResult)
+def assessment_result_changed(sender, instance, **kwargs):
+    invalidate_marksheets([instance.pk])
+
+
+@receiver(m2m_changed, sender=IndividualFeedback.markers.through)
+def markers_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_') and not reverse:
+        invalidate_marksheets([instance.assessment_result_id])
+
+
+@receiver(m2m_changed, sender=GroupFeedback.markers.through)
+def group_markers_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_') and not reverse:
+        group_feedback_changed(GroupFeedback, instance)
@@ -0,0 +1,181 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from django.test import override_settings
+from io import BytesIO
+from .base import *
+from feedback.bulk import (
+    all_marksheets_pdf, all_marksheets_zip, render_marksheets,
+    students_with_marksheets)
+from feedback.marksheets import cached_marksheet, marksheet_key
+from feedback.models import *
+from main import pdf
+from main.db_settings import db_settings
+from main.marks import enter_marks
+from PyPDF2 import PdfFileReader
+
+
+class BulkMarksheetTest(TestCase):
+    """Testing the rendering and caching of marksheets"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MARKSHEET_CACHE=self.directory)
+        self.settings_override.enable()
+        set_initial_values()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.assessment = Assessment.objects.create(
+            module=self.module,
+            title="Essay",
+            value=100,
+            marksheet_type='ESSAY'
+        )
+        teacher = create_teacher()
+        self.student = stuff[1]
+        for student in stuff[1:4]:
+            performance = Performance.objects.get(
+                student=student, module=self.module)
+            performance.set_assessment_result('essay', 60)
+            result = performance.assessment_results.get()
+            feedback = IndividualFeedback.objects.create(
+                assessment_result=result,
+                attempt='first',
+                completed=True
+            )
+            feedback.markers.add(teacher)
+        # Feedback that has not been completed is left out
+        performance = Performance.objects.get(
+            student=stuff[4], module=self.module)
+        performance.set_assessment_result('essay', 50)
+        IndividualFeedback.objects.create(
+            assessment_result=performance.assessment_results.get(),
+            attempt='first'
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory)
+
+    def test_only_students_with_completed_feedback_are_exported(self):
+        students = students_with_marksheets(self.assessment, 'first')
+        self.assertEqual(
+            [student.student_id for student in students],
+            ['bb23', 'dd42', 'pp2323']
+        )
+
+    def test_marksheets_are_merged_into_one_pdf(self):
+        output = BytesIO()
+        all_marksheets_pdf(output, lambda done, total: None,
+                           self.assessment.pk, 'first')
+        output.seek(0)
+        self.assertEqual(PdfFileReader(output).getNumPages(), 3)
+
+    def test_marksheets_can_be_exported_as_zip_file(self):
+        output = BytesIO()
+        all_marksheets_zip(output, lambda done, total: None,
+                           self.assessment.pk, 'first')
+        archive = zipfile.ZipFile(output)
+        names = archive.namelist()
+        self.assertEqual(len(names), 3)
+        self.assertIn(
+            self.assessment.filename() + '_Duck_Daffy.pdf', names)
+
+    def test_parallel_rendering_keeps_the_order_of_the_students(self):
+        students = list(students_with_marksheets(self.assessment, 'first'))
+        steps = []
+        rendered = render_marksheets(
+            self.assessment,
+            students,
+            'first',
+            workers=2,
+            progress=lambda done, total: steps.append((done, total))
+        )
+        self.assertEqual(
+            [student_id for student_id, pdf in rendered],
+            ['bb23', 'dd42', 'pp2323']
+        )
+        self.assertEqual(steps[-1], (3, 3))
+        for student_id, pdf in rendered:
+            self.assertTrue(pdf.startswith(b'%PDF'))
+
+    def cached_files(self):
+        files = []
+        for path, directories, names in os.walk(self.directory):
+            files.extend(names)
+        return files
+
+    def test_rendered_marksheet_is_served_from_the_cache(self):
+        cached_marksheet(self.assessment, self.student, 'first')
+        result_id, key = marksheet_key(self.assessment, self.student, 'first')
+        path = os.path.join(
+            self.directory, str(result_id), 'first', key + '.pdf')
+        with open(path, 'wb') as cached:
+            cached.write(b'cached')
+        self.assertEqual(
+            cached_marksheet(self.assessment, self.student, 'first'),
+            b'cached'
+        )
+
+    def test_changed_feedback_removes_the_cached_marksheet(self):
+        cached_marksheet(self.assessment, self.student, 'first')
+        old_key = marksheet_key(self.assessment, self.student, 'first')
+        self.assertEqual(len(self.cached_files()), 1)
+        feedback = IndividualFeedback.objects.get(
+            assessment_result__part_of__student=self.student)
+        feedback.comments = 'What\'s up, doc?'
+        feedback.save()
+        self.assertEqual(self.cached_files(), [])
+        self.assertNotEqual(
+            marksheet_key(self.assessment, self.student, 'first'), old_key)
+
+    def test_bulk_mark_changes_lead_to_a_new_key(self):
+        old_key = marksheet_key(self.assessment, self.student, 'first')
+        enter_marks(self.assessment, {'bb23': 70})
+        self.assertNotEqual(
+            marksheet_key(self.assessment, self.student, 'first'), old_key)
+
+    def test_first_marksheet_type_is_part_of_the_resit_key(self):
+        result = AssessmentResult.objects.get(
+            assessment=self.assessment, part_of__student=self.student)
+        IndividualFeedback.objects.create(
+            assessment_result=result, attempt='resit', completed=True)
+        old_key = marksheet_key(self.assessment, self.student, 'resit')
+        self.assessment.marksheet_type = 'MEDIATION_ROLE_PLAY'
+        self.assessment.save()
+        self.assertNotEqual(
+            marksheet_key(self.assessment, self.student, 'resit'), old_key)
+
+    def test_name_printed_instead_of_the_logo_is_part_of_the_key(self):
+        logo_url, pdf.LOGO_URL = pdf.LOGO_URL, ''
+        try:
+            Setting.objects.create(
+                name='logo_path', value=os.path.join(self.directory, 'no'))
+            db_settings.invalidate()
+            old_key = marksheet_key(self.assessment, self.student, 'first')
+            Setting.objects.filter(name='uni_name').update(
+                value='Other University')
+            db_settings.invalidate()
+            self.assertNotEqual(
+                marksheet_key(self.assessment, self.student, 'first'),
+                old_key
+            )
+        finally:
+            pdf.LOGO_URL = logo_url
+            pdf._logos.clear()
+
+    def test_bulk_export_uses_the_cache(self):
+        for student in students_with_marksheets(self.assessment, 'first'):
+            cached_marksheet(self.assessment, student, 'first')
+        for path, directories, names in os.walk(self.directory):
+            for name in names:
+                with open(os.path.join(path, name), 'wb') as cached:
+                    cached.write(b'cached')
+        output = BytesIO()
+        all_marksheets_zip(output, lambda done, total: None,
+                           self.assessment.pk, 'first')
+        archive = zipfile.ZipFile(output)
+        for name in archive.namelist():
+            self.assertEqual(archive.read(name), b'cached')
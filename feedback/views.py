@@ -3,12 +3,15 @@ from django.shortcuts import render, redirect
 from django.utils import timezone
 from feedback.forms import *
 from feedback.models import *
+from main.db_settings import db_settings
+from main.jobs import queue_export
 from main.models import *
+from main.pdf import logo
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.platypus import (
-    Paragraph, Spacer, Image, Table, TableStyle, SimpleDocTemplate
+    Paragraph, Spacer, Table, TableStyle, SimpleDocTemplate
 )
 from reportlab.platypus.flowables import PageBreak
 
@@ -322,7 +325,13 @@ def group_feedback(
                     individual_part = individual_mark * individual_weighting
                     mark_sum = group_part + individual_part
                     mark = int(round(mark_sum/together))
+                    old_result = assessment_result.result()
                     assessment_result.set_one_mark(attempt, mark)
+                    performance.update_average(
+                        assessment.value,
+                        old_result,
+                        assessment_result.result()
+                    )
                     feedback = IndividualFeedback.objects.get(
                         assessment_result=assessment_result,
                         attempt=attempt
@@ -360,18 +369,6 @@ def group_feedback(
 # Functions for Reportlab stuff
 
 
-def logo():
-    """Returns the university logo, unless it is not available"""
-    styles = getSampleStyleSheet()
-    url = "https://cccu.nomosdb.org/static/img/cccu.jpg"
-    try:
-        image = Image(url, 2.45*inch, 1*inch)
-    except IOError:
-        image = Paragraph(
-            "Canterbury Christ Church University", styles['Heading1'])
-    return image
-
-
 def formatted_date(raw_date):
     """Returns a proper date string
 
@@ -1100,7 +1097,9 @@ def export_feedback(
     """Will export either one or multiple feedback sheets.
 
     This needs to be given the student id or the string 'all' if
-    you want all marksheets for the assessment. It will only work if
+    you want all marksheets for the assessment. All marksheets are
+    rendered in the background, as one PDF or, with ?format=zip, as a
+    ZIP file with one PDF per student. It will only work if
     the person requesting is a teacher, an admin or the student the
     marksheet is about.
     """
@@ -1112,48 +1111,15 @@ def export_feedback(
         assessment_type = assessment.resit_marksheet_type
     if student_id == 'all':
         if is_staff(request.user):
-            response = HttpResponse(content_type='application/pdf')
-            filename_string = (
-                'attachment; filename=' +
-                assessment.filename() +
-                '_-_all_marksheets.pdf'
-            )
-            all_students = module.students.all()
-            documentlist = []
-            students = []  # Only the students where feedback has been entered
-            for student in all_students:
-                performance = Performance.objects.get(
-                    student=student, module=module)
-                try:
-                    result = AssessmentResult.objects.get(
-                        part_of=performance, assessment=assessment)
-                    try:
-                        feedback = IndividualFeedback.objects.get(
-                            assessment_result=result, attempt=attempt)
-                        if feedback.completed:
-                            students.append(student)
-                    except IndividualFeedback.DoesNotExist:
-                        pass
-                except AssessmentResult.DoesNotExist:
-                    pass
-            for student in students:
-                if assessment.group_assessment:
-                    elements = group_presentation_marksheet(
-                        assessment, student, attempt)
-                    pass
-                else:
-                    elements = individual_marksheet(
-                        assessment, student, attempt)
-                for element in elements:
-                    documentlist.append(element)
-                documentlist.append(PageBreak())
-            response['Content-Disposition'] = filename_string
-            document = SimpleDocTemplate(response)
-            uni_name = Setting.objects.get(name="uni_name").value
-            document.setAuthor = uni_name
-            document.setTitle = 'Marksheet'
-            document.build(documentlist)
-            return response
+            if request.GET.get('format') == 'zip':
+                task = 'all_marksheets_zip'
+                filename = assessment.filename() + '_-_all_marksheets.zip'
+            else:
+                task = 'all_marksheets'
+                filename = assessment.filename() + '_-_all_marksheets.pdf'
+            job = queue_export(
+                request.user, task, filename, assessment.pk, attempt)
+            return redirect(job.get_absolute_url())
         else:
             return HttpResponseForbidden()
     else:
@@ -1175,17 +1141,9 @@ def export_feedback(
                 filename_string += ln + '_' + fn
             filename_string += '.pdf'
             response['Content-Disposition'] = filename_string
-            document = SimpleDocTemplate(response)
-            uni_name = Setting.objects.get(name="uni_name").value
-            document.setAuthor = uni_name
-            if assessment.group_assessment:
-                elements = group_presentation_marksheet(
-                    assessment, student, attempt)
-                pass
-            else:
-                elements = individual_marksheet(
-                    assessment, student, attempt)
-            document.build(elements)
+            # Imported here, as feedback.marksheets uses the functions above
+            from feedback.marksheets import cached_marksheet
+            response.write(cached_marksheet(assessment, student, attempt))
             return response
         else:
             return HttpResponseForbidden()
@@ -0,0 +1,138 @@
+"""Telling tutors and pastoral care staff about students at risk
+
+Saving a register only looks at the performances that have changed: a
+student whose absence streak reaches ABSENCE_STREAK (see main.attendance)
+is added to a queue of AttendanceAlerts in the same transaction. Students
+who already have an alert waiting are not queued twice.
+
+The send_attendance_alerts command, run by cron, then sends everything
+in the queue. The alerts are grouped by recipient - the personal tutor of
+each student and the pastoral care staff of the subject areas of the
+student's course - so that everybody gets one digest, and all digests go
+out over one SMTP connection. The queue is read with a handful of queries
+however many alerts are waiting, and the alerts are marked as sent with
+one UPDATE per batch. If sending fails, nothing is marked and the next
+run tries again.
+"""
+from collections import OrderedDict
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from main.db_settings import db_settings
+from main.messages import attendance_alert_email
+from main.models import AttendanceAlert, Course, Staff
+
+BATCH_SIZE = 500
+SUBJECT = 'NomosDB: Attendance alerts'
+
+
+def batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def queue_alerts(streaks):
+    """Queues alerts for {performance id: absence streak}
+
+    Performances with an alert that has not been sent yet are left out.
+    Returns the number of new alerts.
+    """
+    waiting = set(AttendanceAlert.objects.filter(
+        performance__in=list(streaks), sent=None
+    ).values_list('performance', flat=True))
+    alerts = [
+        AttendanceAlert(performance_id=pk, streak=streak)
+        for pk, streak in sorted(streaks.items()) if pk not in waiting
+    ]
+    AttendanceAlert.objects.bulk_create(alerts)
+    return len(alerts)
+
+
+def pastoral_staff(course_ids):
+    """Returns {course id: [(email, name)]} of the pastoral care staff"""
+    areas = {}
+    links = Course.subject_areas.through.objects.filter(
+        course__in=course_ids).values_list('course', 'subjectarea')
+    for course_id, subject_area in links:
+        areas.setdefault(subject_area, []).append(course_id)
+    found = {}
+    staff = Staff.subject_areas.through.objects.filter(
+        staff__pastoral_care=True,
+        subjectarea__in=list(areas)
+    ).order_by(
+        'staff__user__last_name', 'staff__user__first_name'
+    ).values_list(
+        'subjectarea', 'staff__user__email', 'staff__user__first_name')
+    for subject_area, email, first_name in staff:
+        for course_id in areas[subject_area]:
+            if (email, first_name) not in found.setdefault(course_id, []):
+                found[course_id].append((email, first_name))
+    return found
+
+
+def digests(alerts):
+    """Groups alerts by recipient
+
+    Returns an ordered dictionary of {email: (name, [alert details])}, see
+    attendance_alert_email(). Recipients without an email address are left
+    out.
+    """
+    pastoral = pastoral_staff(set(
+        alert.performance.student.course_id for alert in alerts
+        if alert.performance.student.course_id is not None))
+    found = OrderedDict()
+    for alert in alerts:
+        student = alert.performance.student
+        recipients = []
+        if student.tutor is not None:
+            recipients.append((
+                student.tutor.user.email,
+                student.tutor.user.first_name,
+                'tutee'
+            ))
+        for email, first_name in pastoral.get(student.course_id, []):
+            recipients.append((email, first_name, 'pastoral'))
+        for email, first_name, reason in recipients:
+            if not email:
+                continue
+            name, details = found.setdefault(email, (first_name, []))
+            if any(detail['alert'] == alert.pk for detail in details):
+                continue
+            details.append({
+                'alert': alert.pk,
+                'student': student.name(),
+                'module': str(alert.performance.module),
+                'streak': alert.streak,
+                'reason': reason
+            })
+    return found
+
+
+def send_alerts(limit=None):
+    """Sends the queued alerts as digests over one connection
+
+    Returns (number of emails, number of alerts). Alerts that nobody can
+    be told about are marked as sent as well.
+    """
+    alerts = AttendanceAlert.objects.filter(sent=None).select_related(
+        'performance__student__tutor__user', 'performance__module')
+    if limit:
+        alerts = alerts[:limit]
+    alerts = list(alerts)
+    if not alerts:
+        return 0, 0
+    messages = [
+        EmailMessage(
+            SUBJECT,
+            attendance_alert_email(name, details),
+            db_settings.admin_email,
+            [email]
+        )
+        for email, (name, details) in digests(alerts).items()
+    ]
+    if messages:
+        connection = get_connection()
+        connection.send_messages(messages)
+    now = timezone.now()
+    for batch in batches([alert.pk for alert in alerts]):
+        AttendanceAlert.objects.filter(pk__in=batch).update(sent=now)
+    return len(messages), len(alerts)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MainConfig(AppConfig):
+    name = 'main'
+
+    def ready(self):
+        # Connects the signal receivers that keep the caches up to date
+        import main.db_settings
+        import main.signals
@@ -0,0 +1,185 @@
+"""Reading and writing the attendance of many students at once
+
+The attendance of a student in a module is stored in Performance.attendance
+(see decode_attendance() in main.models). The functions below work on
+whole registers, so that a module or a cohort only needs one query to
+read and one transaction to write.
+
+The attendance of a whole cohort is read with one query and every
+attendance string is decoded once, into a row of the weeks to look at
+with the number of attended sessions, the percentage and the current
+streak of absences. This is cached until attendance is saved or a
+performance changes.
+"""
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import transaction
+from main.caching import (
+    invalidate_attendance, invalidate_mark_grids, versioned_key)
+from main.alerts import queue_alerts
+from main.functions import bulk_update
+from main.models import (
+    Performance, Student, ATTENDANCE_VALUES, decode_attendance,
+    encode_attendance)
+
+ATTENDANCE_TIMEOUT = 60 * 60 * 24
+# Students who missed this many sessions in a row are at risk
+ABSENCE_STREAK = 2
+
+
+def read_attendance(performances):
+    """Returns {performance id: {week: presence}} for a queryset or list
+
+    A queryset is read with a single query that only fetches the
+    attendance column.
+    """
+    if isinstance(performances, (list, tuple)):
+        rows = [
+            (performance.pk, performance.attendance)
+            for performance in performances
+        ]
+    else:
+        rows = performances.values_list('pk', 'attendance')
+    attendance = {}
+    for pk, encoded in rows:
+        attendance[pk] = decode_attendance(encoded)
+    return attendance
+
+
+def write_attendance(attendance):
+    """Stores {performance id: {week: presence}} in one transaction
+
+    The weeks given replace the whole attendance of each performance. The
+    rows are written with one UPDATE per batch of performances (see
+    bulk_update()). Returns the number of performances that were updated.
+    """
+    encoded = {}
+    for pk, weeks in attendance.items():
+        encoded[pk] = {'attendance': encode_attendance(weeks)}
+    with transaction.atomic():
+        module_ids = set(
+            Performance.objects.filter(pk__in=list(encoded))
+            .values_list('module', flat=True)
+        )
+        updated = bulk_update(Performance, encoded)
+    invalidate_mark_grids(module_ids)
+    invalidate_attendance()
+    return updated
+
+
+def save_register(register):
+    """Saves the cells of a submitted attendance register
+
+    register maps performance ids to {week: presence} for all cells in
+    the form. The stored attendance is read in one query, and only the
+    performances with changed cells are written - all in one transaction.
+    Blank or unknown entries are ignored. Students who are at risk after
+    the changes, but were not before, are queued for an attendance alert.
+    Returns the number of changed cells.
+    """
+    changed_cells = 0
+    changed = {}
+    with transaction.atomic():
+        stored = read_attendance(
+            Performance.objects.select_for_update().filter(
+                pk__in=list(register)).order_by()
+        )
+        at_risk = {}
+        for pk, weeks in register.items():
+            if pk not in stored:
+                continue
+            attendance = stored[pk]
+            was_at_risk = absence_streak(attendance) >= ABSENCE_STREAK
+            changes = 0
+            for week, presence in weeks.items():
+                week = int(week)
+                if presence not in ATTENDANCE_VALUES:
+                    continue
+                if attendance.get(week) != presence:
+                    attendance[week] = presence
+                    changes += 1
+            if changes:
+                changed[pk] = attendance
+                changed_cells += changes
+                streak = absence_streak(attendance)
+                if streak >= ABSENCE_STREAK and not was_at_risk:
+                    at_risk[pk] = streak
+        if changed:
+            write_attendance(changed)
+        if at_risk:
+            queue_alerts(at_risk)
+    return changed_cells
+
+
+def absence_streak(attendance):
+    """The number of sessions missed since the last one attended
+
+    attendance is {week: presence}. Excused absences end a streak.
+    """
+    streak = 0
+    for week in sorted(attendance, reverse=True):
+        if attendance[week] != 'a':
+            break
+        streak += 1
+    return streak
+
+
+def attendance_summary(attendance, weeks):
+    """Returns the figures for one decoded attendance
+
+    These are the presence in each of the weeks ('' if nothing was
+    recorded), the number of attended (or excused) sessions, the number
+    of sessions, the percentage attended (None without sessions), the
+    absence streak and whether the streak puts the student at risk.
+    """
+    present = 0
+    sessions = 0
+    for presence in attendance.values():
+        if presence in ['p', 'e']:
+            present += 1
+            sessions += 1
+        elif presence == 'a':
+            sessions += 1
+    if sessions:
+        percentage = int(round(100.0 * present / sessions))
+    else:
+        percentage = None
+    streak = absence_streak(attendance)
+    return {
+        'weeks': [attendance.get(week, '') for week in weeks],
+        'present': present,
+        'sessions': sessions,
+        'percentage': percentage,
+        'streak': streak,
+        'at_risk': streak >= ABSENCE_STREAK
+    }
+
+
+def cohort_attendance(subject_area, year, academic_year, weeks):
+    """Returns {student id: [module attendance]} for a cohort
+
+    The cohort are the active students of a subject area in one year of
+    study, and only modules of the academic year count. Every module
+    attendance is an attendance_summary() with the title and url of the
+    module added, in the order of the modules. The result is cached.
+    """
+    key = versioned_key(
+        'attendance', subject_area.slug, year, academic_year,
+        ','.join(str(week) for week in weeks))
+    found = cache.get(key)
+    if found is not None:
+        return found
+    found = {}
+    performances = Performance.objects.filter(
+        student__in=Student.objects.cohort(
+            subject_area, year).order_by().values('student_id'),
+        module__year=academic_year
+    ).order_by('module__title', 'module__year').values_list(
+        'student', 'module__title', 'module__code', 'attendance')
+    for student_id, title, code, encoded in performances:
+        summary = attendance_summary(decode_attendance(encoded), weeks)
+        summary['title'] = title
+        summary['url'] = reverse('module_view', args=[code, academic_year])
+        found.setdefault(student_id, []).append(summary)
+    cache.set(key, found, ATTENDANCE_TIMEOUT)
+    return found
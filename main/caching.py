@@ -0,0 +1,85 @@
+"""Helpers for cached data that has to be invalidated across processes
+
+Every group of cached values (for example the menubar) has a version stamp
+that is kept in Django's cache. The cache keys contain the stamp, so
+replacing it makes all old entries unreachable at once - they simply
+expire. The cache backend has to be shared by all worker processes
+(memcached, database or file cache, see CACHES in nomosdb/settings.py),
+so that they all see the new stamp immediately. The per-process local
+memory cache only works with a single process.
+
+The signal receivers that replace the stamps live in main.signals.
+"""
+from uuid import uuid4
+from django.core.cache import cache
+from django.db import transaction
+
+MENUBAR_TIMEOUT = 60 * 60 * 24
+
+
+def version(name):
+    """Returns the current version stamp for a group of cached values"""
+    key = 'version_' + name
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, uuid4().hex, None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def replace_stamp(name):
+    cache.set('version_' + name, uuid4().hex, None)
+
+
+def new_version(name):
+    """Invalidates all cached values in a group
+
+    Inside a transaction, the stamp is replaced at once and again when
+    the transaction commits: another process could otherwise read the old
+    rows before the commit and cache them under the new stamp.
+    """
+    replace_stamp(name)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: replace_stamp(name))
+
+
+def versioned_key(name, *parts):
+    """Returns a cache key that is only valid for the current version"""
+    key_parts = [name, version(name)]
+    for part in parts:
+        key_parts.append(str(part))
+    return ':'.join(key_parts)
+
+
+def invalidate_menubar():
+    new_version('menubar')
+
+
+def mark_grid_version(module_id):
+    """Name of the version stamp for the mark grid of one module"""
+    return 'mark_grid_' + str(module_id)
+
+
+def invalidate_mark_grids(module_ids):
+    for module_id in set(module_ids):
+        new_version(mark_grid_version(module_id))
+    # Everything that changes a mark grid also changes the progression
+    invalidate_progression()
+
+
+def invalidate_progression():
+    new_version('progression')
+
+
+def invalidate_attendance():
+    new_version('attendance')
+
+
+def resits_version(module_id):
+    """Name of the version stamp for the resit eligibility in a module"""
+    return 'resits_' + str(module_id)
+
+
+def invalidate_resits(module_ids):
+    for module_id in set(module_ids):
+        new_version(resits_version(module_id))
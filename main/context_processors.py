@@ -1,4 +1,8 @@
+from django.core.cache import cache
+from django.db.models import Q
 from main.unisettings import *
+from main.caching import versioned_key, MENUBAR_TIMEOUT
+from main.db_settings import db_settings
 from main.models import *
 from main.views import is_teacher, is_admin, is_staff
 
@@ -11,12 +15,9 @@ def constants(request):
             show_admin_menu = True
         elif request.user.staff.programme_director:
             show_admin_menu = True
+    uni_name = db_settings.get('uni_name', '')
     try:
-        uni_name = Setting.objects.get(name='uni_name').value
-    except Setting.DoesNotExist:
-        uni_name = ''
-    try:
-        uni_short_name = Setting.objects.get(name='uni_short_name').value
+        uni_short_name = db_settings.uni_short_name
         uni_short_name += '@Nomos DB'
     except Setting.DoesNotExist:
         uni_short_name = 'Nomos DB'
@@ -28,85 +29,81 @@ def constants(request):
 
 
 def menubar(request):
-    """Returns the module dictionary for the menubar"""
+    """Returns the module dictionary for the menubar
+
+    The menubar is the same on every page, so it is built once per staff
+    member and kept in the cache, which all worker processes share, until
+    a module, student, course or subject area changes (see main.caching).
+    """
     if is_staff(request.user):
         staff = request.user.staff
-        future = []
-        current = []
-        past = []
-        try:
-            current_year = int(Setting.objects.get(name="current_year").value)
-        except Setting.DoesNotExist:
-            current_year = 2015
-        staff_subject_areas = staff.subject_areas.all().values('name')
-        modules = []
-        if staff.role == 'teacher':
-            if staff.programme_director:
-                for module in Module.objects.filter(
-                        subject_areas__name__in=staff_subject_areas):
-                    modules.append(module)
-            for module in staff.modules.all():
-                if module not in modules:
-                    modules.append(module)
-        else:
-            if staff.main_admin:
-                modules = Module.objects.all()
-            else:
-                modules = Module.objects.filter(
-                    subject_areas__name__in=staff_subject_areas)
-        for module in modules:
-            if module.year == current_year:
-                current.append(module)
-            elif module.year > current_year:
-                future.append(module)
-            elif module.year < current_year:
-                past.append(module)
-        current.sort(key=lambda x: x.title)
-        past.sort(key=lambda x: x.title)
-        future.sort(key=lambda x: x.title)
-        module_dict = {}
-        module_dict['current'] = current
-        module_dict['past'] = past
-        module_dict['future'] = future
+        key = versioned_key('menubar', staff.pk)
+        menu = cache.get(key)
+        if menu is None:
+            menu = menubar_for_staff(staff)
+            cache.set(key, menu, MENUBAR_TIMEOUT)
+        return menu
+    return {
+        'module_dict': {},
+        'menu_student_categories': [],
+        'menu_other_categories': [],
+        'menu_tutees': False
+    }
 
-        student_list = []
-        other_categories = []
-        if staff.main_admin:
-            relevant_students = Student.objects.all()
-        else:
-            relevant_students = Student.objects.filter(
-                course__subject_areas__name__in=staff_subject_areas)
-        if relevant_students.filter(year=1, active=True).exists():
-            student_list.append(('1', 'Year 1'))
-        if relevant_students.filter(year=2, active=True).exists():
-            student_list.append(('2', 'Year 2'))
-        if relevant_students.filter(year=3, active=True).exists():
-            student_list.append(('3', 'Year 3'))
-        if relevant_students.filter(year=7, active=True).exists():
-            student_list.append(('7', 'Masters Students'))
-        if relevant_students.filter(year=8, active=True).exists():
-            student_list.append(('8', 'PhD Students'))
-        if relevant_students.filter(year=9, active=True).exists():
-            student_list.append(('9', 'Alumni'))
-        if relevant_students.filter(year=None, active=True).exists():
-            other_categories.append(
-                ('unassigned', 'Students not assigned to a Year')
-            )
-        if relevant_students.filter(active=False).exists():
-            other_categories.append(('inactive', 'Inactive Students'))
-        if staff.tutees.all().exists():
-            tutees = True
+
+def menubar_for_staff(staff):
+    """Builds the menubar with one query per menu"""
+    try:
+        current_year = db_settings.current_year
+    except Setting.DoesNotExist:
+        current_year = 2015
+    staff_subject_areas = staff.subject_areas.all()
+    if staff.role == 'teacher':
+        if staff.programme_director:
+            modules = Module.objects.filter(
+                Q(teachers=staff) | Q(subject_areas__in=staff_subject_areas))
         else:
-            tutees = False
+            modules = Module.objects.filter(teachers=staff)
+    elif staff.main_admin:
+        modules = Module.objects.all()
+    else:
+        modules = Module.objects.filter(subject_areas__in=staff_subject_areas)
+    module_dict = {'current': [], 'past': [], 'future': []}
+    for module in modules.distinct().order_by('title', 'year'):
+        if module.year == current_year:
+            module_dict['current'].append(module)
+        elif module.year > current_year:
+            module_dict['future'].append(module)
+        elif module.year < current_year:
+            module_dict['past'].append(module)
 
+    if staff.main_admin:
+        relevant_students = Student.objects.all()
     else:
-        student_list = []
-        module_dict = {}
-        other_categories = []
-        tutees = False
+        relevant_students = Student.objects.filter(
+            course__subject_areas__in=staff_subject_areas)
+    categories = set(
+        relevant_students.order_by().values_list('year', 'active').distinct())
+    student_list = []
+    for year, label in [
+            (1, 'Year 1'),
+            (2, 'Year 2'),
+            (3, 'Year 3'),
+            (7, 'Masters Students'),
+            (8, 'PhD Students'),
+            (9, 'Alumni')]:
+        if (year, True) in categories:
+            student_list.append((str(year), label))
+    other_categories = []
+    if (None, True) in categories:
+        other_categories.append(
+            ('unassigned', 'Students not assigned to a Year')
+        )
+    if any(not active for year, active in categories):
+        other_categories.append(('inactive', 'Inactive Students'))
     return {
         'module_dict': module_dict,
         'menu_student_categories': student_list,
         'menu_other_categories': other_categories,
-        'menu_tutees': tutees
+        'menu_tutees': staff.tutees.exists()
     }
@@ -0,0 +1,97 @@
+"""A process-wide cache for the Setting table
+
+Almost every page needs at least one of the values saved in Setting
+(current_year, uni_name...), so instead of asking the database every
+time, all rows are loaded in one go and kept in memory.
+
+Each process remembers which version of the settings it has loaded. The
+version itself is kept in Django's cache framework and changed whenever a
+Setting is saved or deleted (and again once the transaction commits, see
+main.caching), so with the shared cache backend configured in
+nomosdb/settings.py all worker processes notice the change and reload on
+their next access. Usage:
+
+    from main.db_settings import db_settings
+    current_year = db_settings.current_year
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from main.caching import version, new_version
+from main.models import Setting
+
+NOT_SET = object()
+
+
+class DBSettings(object):
+    """Loads all Setting rows once and serves them from memory"""
+
+    def __init__(self):
+        self._values = None
+        self._version = None
+
+    def all(self):
+        """Returns a dictionary of all settings (name: value)"""
+        current_version = version('db_settings')
+        if self._values is None or current_version != self._version:
+            self._values = dict(Setting.objects.values_list('name', 'value'))
+            self._version = current_version
+        return self._values
+
+    def get(self, name, default=NOT_SET):
+        """Returns the value of a setting
+
+        Without a default, a missing setting raises Setting.DoesNotExist,
+        just like Setting.objects.get would.
+        """
+        values = self.all()
+        if name in values:
+            return values[name]
+        if default is NOT_SET:
+            raise Setting.DoesNotExist(
+                'Setting "%s" does not exist' % (name))
+        return default
+
+    def exists(self):
+        return bool(self.all())
+
+    def invalidate(self):
+        """Makes all processes reload the settings on their next access"""
+        self._values = None
+        new_version('db_settings')
+
+    @property
+    def current_year(self):
+        return int(self.get('current_year'))
+
+    @property
+    def uni_name(self):
+        return self.get('uni_name')
+
+    @property
+    def uni_short_name(self):
+        return self.get('uni_short_name')
+
+    @property
+    def nomosdb_url(self):
+        return self.get('nomosdb_url')
+
+    @property
+    def admin_name(self):
+        return self.get('admin_name')
+
+    @property
+    def admin_email(self):
+        return self.get('admin_email')
+
+    @property
+    def example_email(self):
+        return self.get('example_email')
+
+
+db_settings = DBSettings()
+
+
+@receiver(post_save, sender=Setting)
+@receiver(post_delete, sender=Setting)
+def invalidate_db_settings(sender, **kwargs):
+    db_settings.invalidate()
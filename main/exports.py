@@ -0,0 +1,228 @@
+"""Machine-readable versions of the reports, as CSV or NDJSON
+
+Every report is a generator of rows. The rows are read from the database
+in chunks and written straight into a StreamingHttpResponse, so the
+first line goes out at once and the memory used does not depend on the
+size of the cohort. The columns are the same as in the PDF tables, with
+the attendance given as p (present), e (excused) and a (absent).
+
+NDJSON has one JSON object per line, with the column headers as keys.
+"""
+import csv
+import json
+from django.http import StreamingHttpResponse
+from main.functions import week_starting_date
+from main.models import *
+
+CHUNK_SIZE = 500
+
+FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'json': ('application/x-ndjson', '.ndjson'),
+}
+
+
+class Echo(object):
+    """A file-like object for csv.writer that returns what it is given"""
+
+    def write(self, value):
+        return value
+
+
+def chunked(queryset, size=CHUNK_SIZE):
+    """Iterates over a queryset in lists of up to size objects
+
+    The queryset is read with iterator(), so the objects are neither
+    cached on the queryset nor loaded all at once, and the order of the
+    queryset is kept.
+    """
+    chunk = []
+    for instance in queryset.iterator():
+        chunk.append(instance)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row))) + '\n'
+
+
+def streaming_export(header, rows, export_format, filename):
+    """Returns a StreamingHttpResponse for a report
+
+    export_format is 'csv' or 'json', filename is given without the
+    extension.
+    """
+    content_type, extension = FORMATS[export_format]
+    if export_format == 'csv':
+        lines = csv_lines(header, rows)
+    else:
+        lines = ndjson_lines(header, rows)
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = (
+        'attachment; filename=' + filename + extension)
+    return response
+
+
+def first_marks(performances):
+    """Returns {performance id: {assessment id: first mark}} in one query"""
+    through = Performance.assessment_results.through
+    marks = {}
+    for performance in performances:
+        marks[performance.pk] = {}
+    rows = through.objects.filter(
+        performance__in=list(marks)
+    ).values_list(
+        'performance', 'assessmentresult__assessment', 'assessmentresult__mark'
+    )
+    for performance_id, assessment_id, mark in rows:
+        marks[performance_id][assessment_id] = mark
+    return marks
+
+
+def module_mark_header(assessments):
+    header = ['Name', 'ID', 'Course']
+    for assessment in assessments:
+        header.append(assessment.title + ' (' + str(assessment.value) + '%)')
+    if len(assessments) > 1:
+        header.append('Average')
+    return header
+
+
+def module_mark_rows(module, assessments):
+    """The rows of the mark overview of a module
+
+    These are the first attempts and the average of all active students,
+    sorted by name as in the PDF, one query per chunk of students.
+    """
+    performances = Performance.objects.filter(
+        module=module, student__active=True
+    ).select_related('student__course').order_by(
+        'student__last_name', 'student__first_name')
+    for chunk in chunked(performances):
+        marks = first_marks(chunk)
+        for performance in chunk:
+            student = performance.student
+            if student.course:
+                course = student.course.short_title
+            else:
+                course = ''
+            row = [student.name(), student.student_id, course]
+            for assessment in assessments:
+                row.append(marks[performance.pk].get(assessment.pk) or 0)
+            if len(assessments) > 1:
+                if performance.average is None:
+                    performance.calculate_average()
+                row.append(performance.average)
+            yield row
+
+
+def module_marks(module):
+    """Returns (header, rows) for the marks of a module"""
+    assessments = list(module.all_assessments())
+    return (
+        module_mark_header(assessments),
+        module_mark_rows(module, assessments)
+    )
+
+
+def all_marks_rows(modules):
+    for module in modules:
+        assessments = list(module.all_assessments())
+        header = module_mark_header(assessments)
+        for row in module_mark_rows(module, assessments):
+            for column, value in zip(header[3:], row[3:]):
+                yield [module.code, module.title] + row[:3] + [column, value]
+
+
+def all_marks(subject_area, year, level):
+    """Returns (header, rows) for all marks of a level
+
+    The modules have different assessments, so there is one row per
+    student and column of the module tables (including the average).
+    """
+    modules = Module.objects.filter(
+        year=year,
+        eligible__contains=str(level),
+        subject_areas=subject_area
+    ).distinct()
+    header = [
+        'Module Code', 'Module', 'Name', 'ID', 'Course', 'Assessment', 'Mark']
+    return header, all_marks_rows(modules)
+
+
+def attendance_sheet_rows(module, weeks):
+    performances = Performance.objects.filter(
+        module=module, student__active=True
+    ).select_related('student').order_by(
+        'seminar_group', 'student__last_name', 'student__first_name')
+    for chunk in chunked(performances):
+        for performance in chunk:
+            attendance = decode_attendance(performance.attendance)
+            row = [
+                str(performance.student),
+                performance.student.student_id,
+                performance.seminar_group or ''
+            ]
+            for week in weeks:
+                row.append(attendance.get(week, ''))
+            yield row
+
+
+def attendance_sheet(module):
+    """Returns (header, rows) for the attendance of a module
+
+    The PDF has a table per seminar group, here the group is a column.
+    """
+    weeks = module.all_teaching_weeks()
+    header = ['Name', 'ID', 'Seminar Group'] + [str(week) for week in weeks]
+    return header, attendance_sheet_rows(module, weeks)
+
+
+def tier_4_attendance_rows(students, year):
+    for chunk in chunked(students):
+        performances = Performance.objects.filter(
+            student__in=chunk,
+            module__year=year
+        ).order_by('module__title').values_list(
+            'student', 'module__title', 'attendance')
+        by_student = {}
+        for student_id, module_title, attendance in performances:
+            by_student.setdefault(student_id, []).append(
+                (module_title, decode_attendance(attendance)))
+        for student in chunk:
+            for module_title, attendance in by_student.get(student.pk, []):
+                for week in sorted(attendance):
+                    starting_date = week_starting_date(week, year)
+                    if starting_date is not None:
+                        starting_date = starting_date.isoformat()
+                    yield [
+                        student.name(),
+                        student.student_id,
+                        module_title,
+                        week,
+                        starting_date,
+                        attendance[week]
+                    ]
+
+
+def tier_4_attendance(subject_area, year):
+    """Returns (header, rows) for the attendance of all Tier 4 students
+
+    There is one row per student, module and week with recorded attendance.
+    """
+    students = Student.objects.cohort(subject_area).filter(tier_4=True)
+    header = [
+        'Name', 'ID', 'Module', 'Week', 'Week starting', 'Attendance']
+    return header, tier_4_attendance_rows(students, int(year))
@@ -25,6 +25,11 @@ class MainSettingsForm(forms.Form):
     example_email = forms.CharField(
         label="Example Email for a user", required=True
     )
+    logo_path = forms.CharField(
+        label="Logo for PDF exports (file on the server or URL)",
+        required=False,
+        help_text="Leave empty to use the default logo"
+    )
     helper = FormHelper()
     helper.layout = Layout(
         'current_year',
@@ -34,6 +39,7 @@ class MainSettingsForm(forms.Form):
         'admin_name',
         'admin_email',
         'example_email',
+        'logo_path',
         FormActions(
             Submit('save', 'Save Settings', css_class="btn btn-primary")
         )
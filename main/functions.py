@@ -1,5 +1,7 @@
 import datetime
+from django.db.models import Case, F, Value, When
 from main.unisettings import FIRST_WEEK_STARTS
+from main.db_settings import db_settings
 from main.models import Setting
 
 
@@ -24,7 +26,7 @@ def week_dict(year):
 def week_number(chosen_date=False):
     """Returns the current week number"""
     try:
-        current_year = int(Setting.objects.get(name='current_year').value)
+        current_year = db_settings.current_year
         if chosen_date:
             today = chosen_date
         else:
@@ -49,7 +51,7 @@ def week_number(chosen_date=False):
 def week_starting_date(number, year='current'):
     try:
         if year == 'current':
-            current_year = int(Setting.objects.get(name="current_year").value)
+            year = db_settings.current_year
         else:
             year = int(year)
         first_day = FIRST_WEEK_STARTS[year]
@@ -94,3 +96,50 @@ def academic_year_string(year):
         second[-1]
     )
     return returnstr
+
+
+def bulk_update(model, values, batch_size=100):
+    """Writes different values to many rows of a table
+
+    values is a dictionary of {pk: {field name: value}}. Each batch of rows
+    is written with one UPDATE statement, using CASE expressions. Fields
+    that are not given for a row keep their value. Signals are not sent.
+    Returns the number of updated rows.
+    """
+    pks = list(values)
+    updated = 0
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start:start + batch_size]
+        field_names = set()
+        for pk in batch:
+            field_names.update(values[pk])
+        changes = {}
+        for field_name in field_names:
+            field = model._meta.get_field(field_name)
+            whens = []
+            for pk in batch:
+                if field_name in values[pk]:
+                    value = Value(values[pk][field_name], output_field=field)
+                    whens.append(When(pk=pk, then=value))
+            changes[field_name] = Case(
+                *whens, default=F(field_name), output_field=field)
+        updated += model.objects.filter(pk__in=batch).update(**changes)
+    return updated
+
+
+def page_number(request):
+    """Returns the page requested with ?page=, starting from 1"""
+    try:
+        return max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return 1
+
+
+def delete_rows(queryset):
+    """Deletes the rows of a queryset with one DELETE statement
+
+    Unlike QuerySet.delete(), this does not load the objects, send signals
+    or follow relations, so everything that refers to the rows has to be
+    deleted first. Returns the number of deleted rows.
+    """
+    return queryset._raw_delete(queryset.db)
@@ -0,0 +1,253 @@
+"""Importing students from a CSV file, for example a registry extract
+
+The upload is read line by line with the csv module, straight from the
+temporary file, after sniffing the dialect from the first few kilobytes
+(files saved by Excel or LibreOffice use semicolons or commas, depending
+on the locale). The rows are staged as a compact JSON list with
+main.staging, so that the columns can be assigned in the next step without
+parsing the file again.
+
+The staged rows are then compared with the students in the database,
+which allows a dry run showing new, changed and unchanged students.
+All changes are written in one transaction, with bulk_create for the
+new students and one UPDATE per batch for the changed ones. Signals are
+therefore not sent, and the search terms and caches are updated
+afterwards.
+"""
+import codecs
+import csv
+import json
+from collections import OrderedDict
+from django.db import transaction
+from main import staging
+from main.caching import invalidate_progression
+from main.functions import bulk_update
+from main.models import Student
+from main.search import index_students
+from main.student_actions import modules_of_students, students_changed
+
+SAMPLE_SIZE = 8192
+DELIMITERS = ';,\t|'
+CHUNK_SIZE = 500
+
+COLUMNS = (
+    ('student_id', 'Student ID'),
+    ('first_name', 'First Name'),
+    ('last_name', 'Last Name'),
+    ('exam_id', 'Exam ID'),
+    ('since', 'Studying since'),
+    ('year', 'Year of Study'),
+    ('email', 'University email'),
+    ('phone_number', 'Phone Number'),
+    ('cell_number', 'Mobile Number'),
+    ('permanent_email', 'Private email'),
+    ('achieved_degree', 'Achieved degree'),
+    ('address1', 'Term time address line 1'),
+    ('address2', 'Term time address line 2'),
+    ('address3', 'Term time address line 3'),
+    ('address4', 'Term time address line 4'),
+    ('address5', 'Term time address line 5'),
+    ('home_address1', 'Home address line 1'),
+    ('home_address2', 'Home address line 2'),
+    ('home_address3', 'Home address line 3'),
+    ('home_address4', 'Home address line 4'),
+    ('home_address5', 'Home address line 5')
+)
+
+TEXT_FIELDS = ['first_name', 'last_name', 'email', 'permanent_email']
+ADDRESS_FIELDS = ['address1', 'address2', 'address3', 'address4', 'address5']
+HOME_ADDRESS_FIELDS = ['home_' + field for field in ADDRESS_FIELDS]
+POSSIBLE_YEARS = [str(year) for year, label in Student.POSSIBLE_YEARS]
+
+
+class ExcelSemicolon(csv.excel):
+    delimiter = ';'
+
+
+csv.register_dialect('excel-semicolon', ExcelSemicolon)
+
+
+def sniff_dialect(uploaded_file):
+    """Guesses the dialect from the beginning of the file
+
+    Falls back to semicolons, which the upload page has always asked for.
+    """
+    uploaded_file.seek(0)
+    sample = uploaded_file.read(SAMPLE_SIZE).decode('utf-8-sig', 'ignore')
+    uploaded_file.seek(0)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS)
+    except csv.Error:
+        return 'excel-semicolon'
+
+
+def read_csv(uploaded_file):
+    """Yields the non-empty rows of an uploaded CSV file
+
+    The file is decoded as it is read, so it is never held in memory as a
+    whole.
+    """
+    dialect = sniff_dialect(uploaded_file)
+    lines = codecs.iterdecode(uploaded_file, 'utf-8-sig')
+    for row in csv.reader(lines, dialect):
+        row = [entry.strip() for entry in row]
+        if any(row):
+            yield row
+
+
+def stage_csv(uploaded_file):
+    """Parses an uploaded CSV file and returns the id of the staged rows"""
+    rows = list(read_csv(uploaded_file))
+    return staging.store(json.dumps(rows, separators=(',', ':')))
+
+
+def staged_rows(data_id):
+    """Returns the rows staged by stage_csv"""
+    return json.loads(staging.load(data_id))
+
+
+def phone_number(number):
+    if number and number[0] not in ['0', '+']:
+        return '0' + number
+    return number
+
+
+def student_values(result):
+    """Turns a row ({column: entry}) into values for the Student fields
+
+    Raises ValueError if an entry cannot be read.
+    """
+    values = {}
+    for field in TEXT_FIELDS:
+        if field in result:
+            values[field] = result[field]
+    if 'exam_id' in result:
+        values['exam_id'] = result['exam_id'] or None
+    if 'since' in result:
+        values['since'] = int(result['since']) if result['since'] else None
+    if 'year' in result:
+        # Can contain other entries, so necessary to parse
+        for part in result['year'].split():
+            if part in POSSIBLE_YEARS:
+                values['year'] = int(part)
+                break
+    for field in ['phone_number', 'cell_number']:
+        if field in result:
+            values[field] = phone_number(result[field])
+    if 'achieved_degree' in result:
+        if result['achieved_degree']:
+            values['achieved_degree'] = int(result['achieved_degree'])
+        else:
+            values['achieved_degree'] = None
+    for field, lines in [('address', ADDRESS_FIELDS),
+                         ('home_address', HOME_ADDRESS_FIELDS)]:
+        if any(line in result for line in lines):
+            values[field] = ''.join(
+                result[line] + '\n' for line in lines if line in result)
+    return values
+
+
+def import_values(rows, columns, excluded=()):
+    """Returns ({student id: values}, errors) for the staged rows
+
+    columns is a list with the field name (or 'ignore') for each column,
+    excluded contains the numbers of the rows to leave out, counting from
+    1. If a student appears more than once, the last row wins. errors is a
+    list of (row number, message).
+    """
+    by_student = OrderedDict()
+    errors = []
+    for number, row in enumerate(rows, 1):
+        if number in excluded:
+            continue
+        result = {}
+        for column, entry in zip(columns, row):
+            if column != 'ignore':
+                result[column] = entry
+        if not result.get('student_id'):
+            errors.append((number, 'No student ID'))
+            continue
+        try:
+            values = student_values(result)
+        except ValueError as error:
+            errors.append((number, str(error)))
+            continue
+        by_student.setdefault(result['student_id'], {}).update(values)
+    return by_student, errors
+
+
+class ImportDiff(object):
+    """The changes an import would make
+
+    new is a list of (student id, values), changed a list of
+    (student id, {field: (old value, new value)}) and unchanged a list of
+    student ids, all in the order of the file.
+    """
+
+    def __init__(self, by_student, errors=()):
+        self.by_student = by_student
+        self.errors = list(errors)
+        self.new = []
+        self.changed = []
+        self.unchanged = []
+        student_ids = list(by_student)
+        fields = set()
+        for values in by_student.values():
+            fields.update(values)
+        fields = sorted(fields)
+        existing = {}
+        for start in range(0, len(student_ids), CHUNK_SIZE):
+            chunk = student_ids[start:start + CHUNK_SIZE]
+            rows = Student.objects.filter(student_id__in=chunk).order_by()
+            for row in rows.values('student_id', *fields):
+                existing[row['student_id']] = row
+        for student_id in student_ids:
+            values = by_student[student_id]
+            if student_id not in existing:
+                self.new.append((student_id, values))
+                continue
+            changes = {}
+            for field, value in values.items():
+                old_value = existing[student_id][field]
+                if old_value != value:
+                    changes[field] = (old_value, value)
+            if changes:
+                self.changed.append((student_id, changes))
+            else:
+                self.unchanged.append(student_id)
+
+    def student_ids(self):
+        return list(self.by_student)
+
+    def error_summary(self, limit=10):
+        """Describes the rows that have been left out, or returns ''"""
+        if not self.errors:
+            return ''
+        described = '; '.join(
+            'row %s: %s' % (number, message)
+            for number, message in self.errors[:limit]
+        )
+        if len(self.errors) > limit:
+            described += '; and %s more' % (len(self.errors) - limit)
+        return '%s row%s could not be imported (%s).' % (
+            len(self.errors), 's' if len(self.errors) != 1 else '', described)
+
+    def apply(self):
+        """Writes the changes to the database in one transaction"""
+        with transaction.atomic():
+            Student.objects.bulk_create(
+                [Student(student_id=student_id, **values)
+                 for student_id, values in self.new],
+                batch_size=CHUNK_SIZE
+            )
+            updates = {}
+            for student_id, changes in self.changed:
+                updates[student_id] = {}
+                for field, (old_value, value) in changes.items():
+                    updates[student_id][field] = value
+            bulk_update(Student, updates)
+        index_students(self.student_ids())
+        # New students have no modules yet, but appear in the menubar
+        students_changed(modules_of_students(
+            [student_id for student_id, changes in self.changed]))
+        invalidate_progression()
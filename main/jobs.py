@@ -0,0 +1,178 @@
+"""Rendering long PDF exports in the background
+
+The export views only queue an ExportJob and redirect to its status page.
+Workers started with
+
+    python manage.py process_export_jobs
+
+take the oldest queued job, render the PDF into settings.EXPORT_ROOT
+and report their progress in the job, so that the status page can show
+it. Finished files are deleted again after settings.EXPORT_LIFETIME.
+
+A task is a function that writes the file (usually a PDF) into a file
+object. It is called as task(output, progress, *arguments), with
+progress(done, total) to be called now and then. The tasks are looked
+up in TASKS by name, so that this module does not have to import the
+views.
+"""
+import json
+import os
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from main.models import ExportJob
+
+TASKS = {
+    'all_marks': 'main.views.all_marks_pdf',
+    'all_marksheets': 'feedback.bulk.all_marksheets_pdf',
+    'all_marksheets_zip': 'feedback.bulk.all_marksheets_zip',
+    'exam_board_overview': 'main.views.exam_board_overview_pdf',
+    'nors': 'main.views.nors_pdf',
+    'problem_students': 'main.views.problem_students_pdf',
+    'resit_exam_board_overview': 'main.views.resit_exam_board_overview_pdf',
+}
+
+
+def queue_export(user, task, filename, *arguments):
+    """Queues a task and returns the new ExportJob
+
+    The arguments are stored as JSON, so they have to be simple values
+    like strings and numbers.
+    """
+    if task not in TASKS:
+        raise ValueError('Unknown export task "%s"' % (task))
+    return ExportJob.objects.create(
+        task=task,
+        arguments=json.dumps(arguments),
+        user=user,
+        filename=filename
+    )
+
+
+def result_path(job):
+    return os.path.join(settings.EXPORT_ROOT, job.result)
+
+
+def claim_job():
+    """Marks the oldest queued job as running and returns it
+
+    The status is only changed if the job is still queued, so several
+    workers can look at the queue at the same time without rendering a
+    job twice. Returns None if there is nothing to do.
+    """
+    queued = ExportJob.objects.filter(status='queued').order_by('created')
+    for pk in queued.values_list('pk', flat=True)[:10]:
+        claimed = ExportJob.objects.filter(pk=pk, status='queued').update(
+            status='running', started=timezone.now())
+        if claimed:
+            return ExportJob.objects.get(pk=pk)
+    return None
+
+
+def progress_reporter(job):
+    """Returns the progress(done, total) function for a task
+
+    The progress is stored as a percentage, and only written when it
+    changed.
+    """
+    last = [job.progress]
+
+    def progress(done, total):
+        if total:
+            percent = min(99, int(100 * done / total))
+        else:
+            percent = 0
+        if percent != last[0]:
+            ExportJob.objects.filter(pk=job.pk).update(progress=percent)
+            last[0] = percent
+    return progress
+
+
+def run_job(job):
+    """Renders a claimed job into its file and records the outcome
+
+    The PDF is written to a temporary file first and only renamed once it
+    is complete, so that a crashed worker never leaves a broken download.
+    """
+    if not os.path.isdir(settings.EXPORT_ROOT):
+        os.makedirs(settings.EXPORT_ROOT)
+    job.result = str(job.pk) + os.path.splitext(job.filename)[1]
+    path = result_path(job)
+    temporary_path = path + '.part'
+    lifetime = timedelta(seconds=settings.EXPORT_LIFETIME)
+    try:
+        task = import_string(TASKS[job.task])
+        with open(temporary_path, 'wb') as output:
+            task(output, progress_reporter(job), *json.loads(job.arguments))
+        os.rename(temporary_path, path)
+    except Exception:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        job.status = 'failed'
+        job.result = ''
+        job.error = traceback.format_exc()
+    else:
+        job.status = 'done'
+        job.progress = 100
+    job.finished = timezone.now()
+    job.expires = job.finished + lifetime
+    ExportJob.objects.filter(pk=job.pk).update(
+        status=job.status,
+        progress=job.progress,
+        result=job.result,
+        error=job.error,
+        finished=job.finished,
+        expires=job.expires
+    )
+    return job
+
+
+def purge_export_jobs(now=None):
+    """Deletes expired jobs with their files and fails stale ones
+
+    A job that has been running for longer than settings.EXPORT_TIMEOUT
+    belongs to a worker that died, so it is marked as failed. Returns the
+    number of deleted jobs.
+    """
+    if now is None:
+        now = timezone.now()
+    timeout = timedelta(seconds=settings.EXPORT_TIMEOUT)
+    lifetime = timedelta(seconds=settings.EXPORT_LIFETIME)
+    ExportJob.objects.filter(
+        status='running', started__lt=now - timeout).update(
+            status='failed',
+            error='The export took too long.',
+            finished=now,
+            expires=now + lifetime
+        )
+    expired = ExportJob.objects.filter(expires__lt=now)
+    for result in expired.exclude(result='').values_list('result', flat=True):
+        path = os.path.join(settings.EXPORT_ROOT, result)
+        if os.path.exists(path):
+            os.remove(path)
+    deleted = expired.count()
+    expired.delete()
+    return deleted
+
+
+def work(once=False, sleep=2):
+    """Processes queued jobs until stopped, or until the queue is empty
+
+    Returns the number of jobs that were processed.
+    """
+    processed = 0
+    while True:
+        close_old_connections()
+        purge_export_jobs()
+        job = claim_job()
+        if job is not None:
+            run_job(job)
+            processed += 1
+        elif once:
+            return processed
+        else:
+            time.sleep(sleep)
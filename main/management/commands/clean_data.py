@@ -1,12 +1,20 @@
 from django.core.management.base import BaseCommand
-from main.models import Data
-from datetime import datetime, timedelta
+from main.staging import purge_data
+
 
 class Command(BaseCommand):
-    
-    def clean_up_data(self):
-        time_threshold = datetime.now() - timedelta(days=14)
-        to_delete = Data.objects.filter(timestamp__lt=time_threshold)
-        for instance in to_delete:
-            instance.delete()
-        print("Huhu")
+
+    help = 'Delete expired data instances'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Delete at most this many data instances'
+        )
+
+    def handle(self, *args, **options):
+        deleted, chunks = purge_data(limit=options['limit'])
+        self.stdout.write(
+            'Deleted %s data instances (%s chunks)' % (deleted, chunks))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import (
+    Performance, ATTENDANCE_VALUES, decode_attendance, encode_attendance)
+
+
+class Command(BaseCommand):
+
+    help = 'Convert attendances from the old "week:presence/..." format'
+
+    def handle(self, *args, **options):
+        old_format = Performance.objects.filter(attendance__contains=':')
+        converted = 0
+        dropped = 0
+        with transaction.atomic():
+            for pk, attendance in old_format.values_list('pk', 'attendance'):
+                weeks = decode_attendance(attendance)
+                # The old format accepted anything, the new one does not
+                valid = {}
+                for week, presence in weeks.items():
+                    if presence in ATTENDANCE_VALUES:
+                        valid[week] = presence
+                dropped += len(weeks) - len(valid)
+                Performance.objects.filter(pk=pk).update(
+                    attendance=encode_attendance(valid))
+                converted += 1
+        self.stdout.write('Converted %s attendance records' % (converted))
+        if dropped:
+            self.stdout.write(
+                'Left out %s entries that were not p, a or e' % (dropped))
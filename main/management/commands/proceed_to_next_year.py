@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.db_settings import db_settings
+from main.rollover import Rollover, YearChanged, roll_over
+
+
+class Command(BaseCommand):
+
+    help = 'Move all students into the next academic year'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help='Only show what would change'
+        )
+
+    def progress(self, done, total):
+        self.stdout.write('Updated %s of %s students' % (done, total))
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            rollover = Rollover(db_settings.current_year)
+            for row in rollover.rows:
+                self.stdout.write(
+                    '%(student_id)s %(name)s: Year %(year)s -> '
+                    '%(new_year)s' % row)
+                if row['note']:
+                    self.stdout.write('    ' + row['note'])
+        else:
+            try:
+                rollover = roll_over(
+                    db_settings.current_year, progress=self.progress)
+            except YearChanged as error:
+                raise CommandError(str(error))
+        for decision, number in rollover.summary().items():
+            self.stdout.write('%s: %s' % (decision, number))
+        if options['dry_run']:
+            self.stdout.write('Nothing has been changed (dry run)')
+        else:
+            self.stdout.write(
+                'The current year is now %s' % (rollover.current_year + 1))
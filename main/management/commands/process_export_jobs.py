@@ -0,0 +1,46 @@
+from multiprocessing import Process
+from django.core.management.base import BaseCommand
+from django.db import connections
+from main.jobs import work
+
+
+class Command(BaseCommand):
+
+    help = 'Render the queued PDF exports in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Stop as soon as the queue is empty'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2,
+            help='Seconds to wait before looking at an empty queue again'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] <= 1:
+            processed = work(once=options['once'], sleep=options['sleep'])
+            self.stdout.write('Processed %s export jobs' % (processed))
+            return
+        # Every process needs its own database connection
+        connections.close_all()
+        workers = []
+        for number in range(options['workers']):
+            worker = Process(
+                target=work,
+                kwargs={'once': options['once'], 'sleep': options['sleep']}
+            )
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
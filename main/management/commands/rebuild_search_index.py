@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from main.models import SearchTerm
+from main.search import rebuild_index
+
+
+class Command(BaseCommand):
+
+    help = 'Index all students and modules for the search'
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(
+            'Indexed %s search terms' % (SearchTerm.objects.count()))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from main.alerts import send_alerts
+
+
+class Command(BaseCommand):
+
+    help = 'Email the queued attendance alerts to tutors and pastoral staff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Send at most this many alerts'
+        )
+
+    def handle(self, *args, **options):
+        emails, alerts = send_alerts(limit=options['limit'])
+        self.stdout.write('Sent %s emails about %s alerts' % (emails, alerts))
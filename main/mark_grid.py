@@ -0,0 +1,199 @@
+"""The student x assessment mark grid shown on the module page
+
+Calling all_assessment_results_with_feedback() for every performance
+queries the database several times per student and assessment. The
+grid below is built from five queries (four if the resit eligibility is
+cached), no matter how many students take the module, and follows the same
+rules as the methods in main.models:
+
+    - Module.resit_eligibility() for the resit flags
+    - result_with_feedback() for marks, edit and marksheet links
+    - capped_mark() for the module mark
+
+The finished grid only contains strings, numbers and dictionaries, so it
+is cached until anything in the module changes (see main.caching).
+"""
+from django.core.cache import cache
+from feedback.categories import AVAILABLE_MARKSHEETS
+from feedback.models import IndividualFeedback
+from main.caching import versioned_key, mark_grid_version
+from main.models import *
+from main.unisettings import PASSMARK
+
+MARK_GRID_TIMEOUT = 60 * 60 * 24
+
+
+def has_marksheet(marksheet_type):
+    return any(marksheet_type in x for x in AVAILABLE_MARKSHEETS)
+
+
+def module_mark_grid(module):
+    """Returns the cached mark grid for a module"""
+    key = versioned_key(mark_grid_version(module.pk))
+    grid = cache.get(key)
+    if grid is None:
+        grid = build_mark_grid(module)
+        cache.set(key, grid, MARK_GRID_TIMEOUT)
+    return grid
+
+
+def build_mark_grid(module):
+    """Builds the grid for all active students in a module
+
+    Returns a dictionary with the following keys:
+
+        rows: one dictionary per performance, see grid_row()
+        seminar_groups: sorted list of all seminar groups
+        resit_required: True if any result is eligible for a resit
+        qld_resit_required: True if any result is eligible for a QLD resit
+    """
+    assessments = module.all_assessments()
+    performances = list(
+        Performance.objects.filter(module=module, student__active=True)
+        .select_related('student')
+    )
+    results = {}
+    for performance in performances:
+        results[performance.pk] = {}
+    links = Performance.assessment_results.through.objects.filter(
+        performance__module=module,
+        performance__student__active=True
+    ).select_related('assessmentresult')
+    result_ids = []
+    for link in links:
+        result = link.assessmentresult
+        results[link.performance_id][result.assessment_id] = result
+        result_ids.append(result.pk)
+    feedback = {}
+    for result_id, attempt, completed in (
+            IndividualFeedback.objects.filter(
+                assessment_result__in=result_ids)
+            .values_list('assessment_result', 'attempt', 'completed')):
+        feedback.setdefault((result_id, attempt), []).append(completed)
+    rows = []
+    seminar_groups = set()
+    resit_required = False
+    qld_resit_required = False
+    eligibility = module.resit_eligibility()
+    for performance in performances:
+        row = grid_row(
+            performance,
+            assessments,
+            results[performance.pk],
+            eligibility.get(performance.pk, {}),
+            feedback
+        )
+        if 'r' in row['resits']:
+            resit_required = True
+        if 'q' in row['resits']:
+            qld_resit_required = True
+        if performance.seminar_group:
+            seminar_groups.add(performance.seminar_group)
+        rows.append(row)
+    return {
+        'rows': rows,
+        'seminar_groups': sorted(seminar_groups),
+        'resit_required': resit_required,
+        'qld_resit_required': qld_resit_required,
+    }
+
+
+def grid_row(performance, assessments, results, eligibility, feedback):
+    """Returns the data for one student in the module
+
+    results maps assessment ids to the AssessmentResult of the student,
+    eligibility is the entry of Module.resit_eligibility() for the student
+    and feedback maps (result id, attempt) to the completion of the
+    marksheets.
+    """
+    student = performance.student
+    first_attempt = 0
+    for assessment in assessments:
+        result = results.get(assessment.pk)
+        if result is not None and result.mark:
+            first_attempt += result.mark * assessment.value
+    first_attempt = int(round(float(first_attempt) / 100))
+    resits = {}
+    for result_id, (flag, assessment_id) in eligibility.items():
+        resits[result_id] = flag
+    cells = []
+    for assessment in assessments:
+        result = results.get(assessment.pk)
+        if result is None:
+            if assessment.group_assessment and assessment.title != 'Exam':
+                edit = None
+            else:
+                edit = attempt_url(
+                    assessment, assessment.marksheet_type, student, 'first')
+            cells.append({'first': (None, edit, None)})
+        else:
+            cells.append(
+                grid_cell(assessment, result, student, resits, feedback))
+    return {
+        'student_id': student.student_id,
+        'student_link': student.get_link(),
+        'lsp': bool(student.lsp),
+        'seminar_group': performance.seminar_group,
+        'attendance': performance.count_attendance(),
+        'results': cells,
+        'module_mark': capped_mark(performance, results, first_attempt),
+        'resits': set(resits.values()),
+    }
+
+
+def grid_cell(assessment, result, student, resits, feedback):
+    """The marks and links for one result, see result_with_feedback()"""
+    cell = {}
+    cell['first'] = (
+        result.mark,
+        attempt_url(assessment, assessment.marksheet_type, student, 'first'),
+        marksheet_url(assessment, result, student, 'first', feedback)
+    )
+    for flag, attempt, mark in [
+            ('r', 'resit', result.resit_mark),
+            ('q', 'qld_resit', result.qld_resit)]:
+        if resits.get(result.pk) == flag:
+            edit = attempt_url(
+                assessment, assessment.resit_marksheet_type, student, attempt)
+            if edit or mark:
+                cell[attempt] = (
+                    mark,
+                    edit,
+                    marksheet_url(
+                        assessment, result, student, attempt, feedback)
+                )
+    return cell
+
+
+def attempt_url(assessment, marksheet_type, student, attempt):
+    if has_marksheet(marksheet_type):
+        return (
+            assessment.get_blank_feedback_url() +
+            student.student_id +
+            '/' + attempt + '/'
+        )
+    return None
+
+
+def marksheet_url(assessment, result, student, attempt, feedback):
+    completed = feedback.get((result.pk, attempt), [])
+    if len(completed) == 1 and completed[0]:
+        return (
+            assessment.get_blank_marksheet_url() +
+            student.student_id +
+            '/' + attempt + '/'
+        )
+    return None
+
+
+def capped_mark(performance, results, first_attempt):
+    """Same as Performance.capped_mark without further queries"""
+    if not performance.average:
+        return None
+    mark = str(performance.average)
+    if first_attempt < PASSMARK and performance.average > PASSMARK:
+        for result in results.values():
+            if result.mark is None or result.mark < PASSMARK:
+                if result.concessions not in ['G', 'P']:
+                    return mark + ' (capped at ' + str(PASSMARK) + ')'
+    return mark
@@ -0,0 +1,199 @@
+"""Entering the marks of a whole module at once
+
+Performance.set_assessment_result() is fine for a single mark, but calling
+it for every student of a module means several queries per student. The
+functions here load everything for one assessment in a few queries, write
+the changed marks with bulk updates and recalculate the affected averages
+in one go, all in a single transaction.
+
+Single mark changes update the average incrementally instead, see
+Performance.update_average().
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case, ExpressionWrapper, F, IntegerField, Max, Q, Sum, Value, When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from main.caching import invalidate_mark_grids, invalidate_resits
+from main.functions import bulk_update
+from main.models import *
+
+BATCH_SIZE = 500
+
+MARK_FIELDS = {
+    'first': 'mark',
+    'resit': 'resit_mark',
+    'second_resit': 'second_resit_mark',
+    'qld_resit': 'qld_resit',
+}
+
+
+def counting_mark():
+    """The mark that counts for the average as an SQL expression
+
+    This is the same as AssessmentResult.result(): the best of the first
+    attempt and the resits, where the second resit only counts if there
+    was a first resit.
+    """
+    no_mark = Q(mark__isnull=True)
+    resit = Q(resit_mark__gt=0)
+    second_resit = (
+        resit &
+        Q(second_resit_mark__gt=0) &
+        Q(second_resit_mark__gt=F('resit_mark')) &
+        (no_mark | Q(second_resit_mark__gt=F('mark')))
+    )
+    return Case(
+        When(second_resit, then=F('second_resit_mark')),
+        When(resit & (no_mark | Q(resit_mark__gt=F('mark'))),
+             then=F('resit_mark')),
+        default=Coalesce(F('mark'), Value(0)),
+        output_field=IntegerField()
+    )
+
+
+def recalculate_averages(performance_ids):
+    """Recalculates the averages of the given performances
+
+    The weighted sums of all performances are calculated by the database
+    in one aggregate query grouped by performance, and the averages are
+    written with one bulk update. The weighting is the same as in
+    Performance.calculate_average(). Returns {performance id: average}.
+    """
+    sums = {}
+    for pk in performance_ids:
+        sums[pk] = 0
+    rows = AssessmentResult.objects.filter(
+        part_of__in=list(sums),
+        assessment__module=F('part_of__module')
+    ).order_by().values('part_of').annotate(
+        weighted=Sum(
+            ExpressionWrapper(
+                counting_mark() * F('assessment__value'),
+                output_field=IntegerField()
+            )
+        )
+    ).values_list('part_of', 'weighted')
+    for pk, weighted in rows:
+        sums[pk] = weighted or 0
+    values = {}
+    averages = {}
+    for pk, sum_of_marks in sums.items():
+        real_average = float(sum_of_marks) / 100
+        average = int(round(real_average))
+        values[pk] = {'average': average, 'real_average': real_average}
+        averages[pk] = average
+    bulk_update(Performance, values)
+    return averages
+
+
+def recalculate_module_averages(module):
+    """Recalculates all averages of a module, e.g. after weights changed"""
+    with transaction.atomic():
+        averages = recalculate_averages(
+            module.performances.order_by().values_list('pk', flat=True))
+    invalidate_mark_grids([module.pk])
+    return averages
+
+
+def create_results(results):
+    """Inserts new AssessmentResults and returns their ids in order
+
+    bulk_create() does not set the ids, so the new rows are read back:
+    they are the results above the highest id before the insert that do
+    not belong to a performance yet. This has to be called inside a
+    transaction, and the results have to be linked before it ends.
+    """
+    if not results:
+        return []
+    highest = AssessmentResult.objects.aggregate(
+        highest=Coalesce(Max('pk'), Value(0)))['highest']
+    AssessmentResult.objects.bulk_create(results, batch_size=BATCH_SIZE)
+    result_ids = list(AssessmentResult.objects.filter(
+        pk__gt=highest, part_of=None
+    ).order_by('pk').values_list('pk', flat=True))
+    if len(result_ids) != len(results):
+        raise IntegrityError('The new results could not be found')
+    return result_ids
+
+
+def enter_marks(assessment, marks, attempt='first', anonymous=False):
+    """Saves the marks for one assessment and attempt
+
+    marks is a dictionary of {student_id: mark}, or {exam_id: mark} if
+    anonymous is True. Marks for inactive or unknown students are ignored.
+    Missing results are created with the mark with bulk inserts, changed
+    results are written with bulk updates and the averages of all changed
+    performances are recalculated. No signals are sent, so the caches are
+    invalidated once at the end. Returns the number of changed marks.
+    """
+    field = MARK_FIELDS[attempt]
+    if anonymous:
+        key = 'student__exam_id'
+    else:
+        key = 'student__student_id'
+    now = timezone.now()
+    with transaction.atomic():
+        performances = dict(
+            Performance.objects.filter(
+                module=assessment.module_id,
+                student__active=True,
+                **{key + '__in': list(marks)}
+            ).values_list(key, 'pk')
+        )
+        through = Performance.assessment_results.through
+        results = {}
+        for link in through.objects.filter(
+                performance__in=list(performances.values()),
+                assessmentresult__assessment=assessment
+        ).select_related('assessmentresult'):
+            results[link.performance_id] = link.assessmentresult
+        new_performances = []
+        new_results = []
+        changes = {}
+        changed_performances = []
+        for student, performance_id in performances.items():
+            mark = marks[student]
+            if performance_id not in results:
+                new_performances.append(performance_id)
+                new_results.append(AssessmentResult(
+                    assessment=assessment,
+                    last_modified=now,
+                    **{field: mark}
+                ))
+                changed_performances.append(performance_id)
+            elif getattr(results[performance_id], field) != mark:
+                changes[results[performance_id].pk] = {
+                    field: mark, 'last_modified': now}
+                changed_performances.append(performance_id)
+        through.objects.bulk_create(
+            [
+                through(performance_id=performance_id, assessmentresult_id=pk)
+                for performance_id, pk in zip(
+                    new_performances, create_results(new_results))
+            ],
+            batch_size=BATCH_SIZE
+        )
+        bulk_update(AssessmentResult, changes)
+        recalculate_averages(changed_performances)
+    invalidate_mark_grids([assessment.module_id])
+    invalidate_resits([assessment.module_id])
+    return len(changes) + len(new_results)
+
+
+def marks_from_post(post, prefix='mark_'):
+    """Reads the marks from a submitted form
+
+    Returns {key: mark} for all fields called prefix + key that contain a
+    mark from 0 to 99.
+    """
+    marks = {}
+    for name, raw in post.items():
+        if name.startswith(prefix) and raw:
+            try:
+                mark = int(raw)
+            except ValueError:
+                continue
+            if mark in range(0, 100):
+                marks[name[len(prefix):]] = mark
+    return marks
@@ -1,12 +1,12 @@
 # This is essentially just a file to save longer strings, for example sample emails.
 from main.unisettings import *
-from main.models import Setting
+from main.db_settings import db_settings
 
 def new_staff_email(name, username, password):
-    uni_name = Setting.objects.get(name='uni_name').value
-    nomosdb_url = Setting.objects.get(name='nomosdb_url').value
-    admin_email = Setting.objects.get(name='admin_email').value
-    admin_name = Setting.objects.get(name='admin_name').value
+    uni_name = db_settings.uni_name
+    nomosdb_url = db_settings.nomosdb_url
+    admin_email = db_settings.admin_email
+    admin_name = db_settings.admin_name
     message = """
 Dear %s,
 
@@ -36,10 +36,10 @@ Enjoy the experience,
     return message
 
 def new_student_email(name, username, password):
-    uni_name = Setting.objects.get(name='uni_name').value
-    nomosdb_url = Setting.objects.get(name='nomosdb_url').value
-    admin_email = Setting.objects.get(name='admin_email').value
-    admin_name = Setting.objects.get(name='admin_name').value
+    uni_name = db_settings.uni_name
+    nomosdb_url = db_settings.nomosdb_url
+    admin_email = db_settings.admin_email
+    admin_name = db_settings.admin_name
     message = """
 Dear %s,
 
@@ -70,9 +70,9 @@ Best wishes,
     return message
 
 def password_reset_email(name, username, password):
-    uni_name = Setting.objects.get(name='uni_name').value
-    admin_name = Setting.objects.get(name='admin_name').value
-    admin_email = Setting.objects.get(name='admin_email').value
+    uni_name = db_settings.uni_name
+    admin_name = db_settings.admin_name
+    admin_email = db_settings.admin_email
     message = """
 Dear %s,
 
@@ -187,3 +187,28 @@ def attendance_email(student, modules, admin_name):
     lines.append('Many thanks and best wishes,')
     lines.append(admin_name)
     return lines
+
+
+def attendance_alert_email(name, alerts):
+    """The digest of attendance alerts for one member of staff
+
+    alerts is a list of dictionaries with the student, the module, the
+    number of missed sessions (streak) and the reason (tutee or pastoral).
+    """
+    lines = ['Dear %s,' % (name)]
+    lines.append(
+        'According to the registers, the following students have ' +
+        'recently stopped attending sessions:'
+    )
+    for alert in alerts:
+        if alert['reason'] == 'tutee':
+            reason = ' (your tutee)'
+        else:
+            reason = ''
+        lines.append('- %s%s missed the last %s sessions in %s' % (
+            alert['student'], reason, alert['streak'], alert['module']))
+    lines.append(
+        'Please get in touch with them to find out if everything is ok.')
+    lines.append('Many thanks and best wishes,')
+    lines.append(db_settings.admin_name)
+    return '\n\n'.join(lines)
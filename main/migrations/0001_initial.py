@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 10:01
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Assessment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('slug', models.CharField(blank=True, max_length=100, null=True)),
+                ('value', models.IntegerField(blank=True, null=True, verbose_name='Value')),
+                ('submission_date', models.DateField(blank=True, null=True, verbose_name='Submission Date')),
+                ('resit_submission_date', models.DateField(blank=True, null=True, verbose_name='Submission Date for Resit')),
+                ('max_word_count', models.IntegerField(blank=True, null=True, verbose_name='Word Count')),
+                ('resit_max_word_count', models.IntegerField(blank=True, null=True, verbose_name='Word Count for Resit')),
+                ('group_assessment', models.BooleanField(default=False)),
+                ('resit_group_assessment', models.BooleanField(default=False)),
+                ('same_marksheet_for_all', models.BooleanField(default=False, verbose_name='Group Assessment with identical Marksheets')),
+                ('resit_same_marksheet_for_all', models.BooleanField(default=False, verbose_name='Group Assessment with identical Marksheets in Resit')),
+                ('marksheet_type', models.CharField(blank=True, choices=[('PRESENTATION', 'Oral Presentation'), ('ESSAY', 'Essay'), ('LEGAL_PROBLEM', 'Legal Problem'), ('MEDIATION_ROLE_PLAY', 'Mediation Role Play'), ('NEGOTIATION_CRITICAL_REFLECTION', 'Negotiation and Critical Reflection'), ('GROUP_PRESENTATION', 'Group Presentation')], max_length=50, null=True, verbose_name='Marksheet Type')),
+                ('resit_marksheet_type', models.CharField(blank=True, choices=[('PRESENTATION', 'Oral Presentation'), ('ESSAY', 'Essay'), ('LEGAL_PROBLEM', 'Legal Problem'), ('MEDIATION_ROLE_PLAY', 'Mediation Role Play'), ('NEGOTIATION_CRITICAL_REFLECTION', 'Negotiation and Critical Reflection'), ('GROUP_PRESENTATION', 'Group Presentation')], max_length=50, null=True, verbose_name='Marksheet Type for Resit')),
+                ('co_marking', models.BooleanField(default=False, verbose_name='Co-Marking (all teachers on this module appear on the marksheet)')),
+                ('resit_co_marking', models.BooleanField(default=False, verbose_name='Co-Marking for Resit')),
+                ('available', models.BooleanField(default=False, verbose_name='Students can see the mark/feedback')),
+                ('resit_available', models.BooleanField(default=False, verbose_name='Students can see the mark/feedback for the resit')),
+                ('second_resit_available', models.BooleanField(default=False, verbose_name='Students can see the mark/feedback for the second resit')),
+                ('qld_resit_available', models.BooleanField(default=False, verbose_name='Students can see the mark/feedback for the QLD resit')),
+            ],
+            options={
+                'ordering': ['title'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AssessmentResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mark', models.IntegerField(blank=True, null=True)),
+                ('resit_mark', models.IntegerField(blank=True, null=True)),
+                ('concessions', models.CharField(blank=True, choices=[('N', 'No Concession'), ('N', 'Concession Pending'), ('G', 'Concession Granted')], default='N', max_length=1, null=True)),
+                ('second_resit_mark', models.IntegerField(blank=True, null=True)),
+                ('second_concessions', models.CharField(blank=True, choices=[('N', 'No Concession'), ('N', 'Concession Pending'), ('G', 'Concession Granted')], default='N', max_length=1, null=True)),
+                ('assessment_group', models.IntegerField(blank=True, null=True)),
+                ('resit_assessment_group', models.IntegerField(blank=True, null=True)),
+                ('qld_resit', models.IntegerField(blank=True, null=True)),
+                ('last_modified', models.DateTimeField(blank=True, null=True)),
+                ('assessment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.Assessment')),
+            ],
+            options={
+                'ordering': ['assessment'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Course',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100, unique=True)),
+                ('short_title', models.CharField(blank=True, max_length=50, null=True, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Data',
+            fields=[
+                ('id', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('value', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Module',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('code', models.CharField(max_length=20)),
+                ('year', models.IntegerField(choices=[(2010, '2010/11'), (2011, '2011/12'), (2012, '2012/13'), (2013, '2013/14'), (2014, '2014/15'), (2015, '2015/16'), (2016, '2016/17'), (2017, '2017/18'), (2018, '2018/19'), (2019, '2019/20'), (2020, '2020/21'), (2021, '2021/22'), (2022, '2022/23'), (2023, '2023/24'), (2024, '2024/25')], default=2026)),
+                ('foundational', models.BooleanField(default=False, verbose_name='Foundational Module')),
+                ('nalp', models.BooleanField(default=False, verbose_name='Module is required for the NALP Qualification')),
+                ('credits', models.IntegerField(choices=[(10, '10'), (20, '20'), (30, '20'), (40, '40')], default=20)),
+                ('eligible', models.CharField(blank=True, choices=[('1', 'Year 1 only'), ('2', 'Year 2 only'), ('3', 'Year 3 only'), ('7', 'Masters Students only'), ('8', 'PhD Students only'), ('123', 'All years'), ('12', 'Years 1 and 2'), ('23', 'Years 2 and 3')], default='1', max_length=3, null=True, verbose_name='Which students can (or have to) take this module?')),
+                ('first_session', models.IntegerField(blank=True, choices=[(1, 'Week 1'), (2, 'Week 2'), (3, 'Week 3'), (4, 'Week 4'), (5, 'Week 5'), (6, 'Week 6'), (7, 'Week 7'), (8, 'Week 8'), (9, 'Week 9'), (10, 'Week 10'), (11, 'Week 11'), (12, 'Week 12'), (13, 'Week 13'), (14, 'Week 14'), (15, 'Week 15'), (16, 'Week 16'), (17, 'Week 17'), (18, 'Week 18'), (19, 'Week 19'), (20, 'Week 20'), (21, 'Week 21'), (22, 'Week 22'), (23, 'Week 23'), (24, 'Week 24'), (25, 'Week 25'), (26, 'Week 26'), (27, 'Week 27'), (28, 'Week 28'), (29, 'Week 29'), (30, 'Week 30'), (31, 'Week 31'), (32, 'Week 32'), (33, 'Week 33'), (34, 'Week 34'), (35, 'Week 35'), (36, 'Week 36'), (37, 'Week 37'), (38, 'Week 38'), (39, 'Week 39'), (40, 'Week 40'), (41, 'Week 41'), (42, 'Week 42'), (43, 'Week 43'), (44, 'Week 44'), (45, 'Week 45'), (46, 'Week 46'), (47, 'Week 47'), (48, 'Week 48'), (49, 'Week 49'), (50, 'Week 50'), (51, 'Week 51'), (52, 'Week 52')], default=5, null=True, verbose_name='Week of first seminar')),
+                ('no_teaching_in', models.CharField(blank=True, max_length=100, null=True, verbose_name='No teaching in these weeks (reading weeks, cancelled seminars etc, separated by a comma)')),
+                ('last_session', models.IntegerField(blank=True, choices=[(1, 'Week 1'), (2, 'Week 2'), (3, 'Week 3'), (4, 'Week 4'), (5, 'Week 5'), (6, 'Week 6'), (7, 'Week 7'), (8, 'Week 8'), (9, 'Week 9'), (10, 'Week 10'), (11, 'Week 11'), (12, 'Week 12'), (13, 'Week 13'), (14, 'Week 14'), (15, 'Week 15'), (16, 'Week 16'), (17, 'Week 17'), (18, 'Week 18'), (19, 'Week 19'), (20, 'Week 20'), (21, 'Week 21'), (22, 'Week 22'), (23, 'Week 23'), (24, 'Week 24'), (25, 'Week 25'), (26, 'Week 26'), (27, 'Week 27'), (28, 'Week 28'), (29, 'Week 29'), (30, 'Week 30'), (31, 'Week 31'), (32, 'Week 32'), (33, 'Week 33'), (34, 'Week 34'), (35, 'Week 35'), (36, 'Week 36'), (37, 'Week 37'), (38, 'Week 38'), (39, 'Week 39'), (40, 'Week 40'), (41, 'Week 41'), (42, 'Week 42'), (43, 'Week 43'), (44, 'Week 44'), (45, 'Week 45'), (46, 'Week 46'), (47, 'Week 47'), (48, 'Week 48'), (49, 'Week 49'), (50, 'Week 50'), (51, 'Week 51'), (52, 'Week 52')], default=15, null=True, verbose_name='Week of last seminar')),
+            ],
+            options={
+                'ordering': ['title', 'year'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Performance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seminar_group', models.IntegerField(blank=True, null=True)),
+                ('belongs_to_year', models.IntegerField(blank=True, null=True)),
+                ('average', models.IntegerField(blank=True, null=True)),
+                ('real_average', models.FloatField(blank=True, null=True)),
+                ('attendance', models.CharField(blank=True, max_length=250, null=True)),
+                ('assessment_results', models.ManyToManyField(related_name='part_of', to='main.AssessmentResult')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='performances', to='main.Module')),
+            ],
+            options={
+                'ordering': ['module', 'student'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Setting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Staff',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('admin', 'Admin'), ('teacher', 'Teacher')], default='teacher', max_length=10)),
+                ('pastoral_care', models.BooleanField(default=False)),
+                ('programme_director', models.BooleanField(default=False)),
+                ('main_admin', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['user'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Student',
+            fields=[
+                ('student_id', models.CharField(max_length=25, primary_key=True, serialize=False, verbose_name='Student ID')),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('exam_id', models.CharField(blank=True, default=None, max_length=25, null=True, unique=True, verbose_name='Exam ID')),
+                ('since', models.IntegerField(blank=True, choices=[(2010, '2010/11'), (2011, '2011/12'), (2012, '2012/13'), (2013, '2013/14'), (2014, '2014/15'), (2015, '2015/16'), (2016, '2016/17'), (2017, '2017/18'), (2018, '2018/19'), (2019, '2019/20'), (2020, '2020/21'), (2021, '2021/22'), (2022, '2022/23'), (2023, '2023/24'), (2024, '2024/25')], null=True, verbose_name='Studying since')),
+                ('year', models.IntegerField(blank=True, choices=[(1, '1'), (2, '2'), (3, '3'), (7, 'Masters'), (8, 'PhD'), (9, 'Alumni')], null=True)),
+                ('is_part_time', models.BooleanField(default=False, verbose_name='Part Time')),
+                ('second_part_time_year', models.BooleanField(default=False, verbose_name='Second part of the year (for part time students only)')),
+                ('email', models.CharField(blank=True, max_length=100)),
+                ('qld', models.BooleanField(default=True, verbose_name='QLD Status')),
+                ('notes', models.TextField(blank=True)),
+                ('active', models.BooleanField(default=True)),
+                ('lsp', models.TextField(blank=True, null=True, verbose_name='Learning Support Plan')),
+                ('permanent_email', models.CharField(blank=True, max_length=100, null=True)),
+                ('address', models.TextField(blank=True, verbose_name='Term Time Address')),
+                ('phone_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('cell_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('home_address', models.TextField(blank=True)),
+                ('nalp', models.BooleanField(default=False, verbose_name='Paralegal Pathway')),
+                ('tier_4', models.BooleanField(default=False, verbose_name='Tier 4 Student')),
+                ('achieved_degree', models.IntegerField(blank=True, choices=[(1, '1st'), (21, '2:1'), (22, '2:2'), (3, '3rd'), (4, 'Fail'), (5, 'Ord. Degree'), (6, 'Dip HE'), (7, 'Cert HE'), (8, 'No Degree')], null=True)),
+                ('graduated_in', models.IntegerField(blank=True, choices=[(2010, '2010/11'), (2011, '2011/12'), (2012, '2012/13'), (2013, '2013/14'), (2014, '2014/15'), (2015, '2015/16'), (2016, '2016/17'), (2017, '2017/18'), (2018, '2018/19'), (2019, '2019/20'), (2020, '2020/21'), (2021, '2021/22'), (2022, '2022/23'), (2023, '2023/24'), (2024, '2024/25')], null=True)),
+                ('next_year', models.CharField(blank=True, choices=[('PP', 'Pass and Proceed'), ('PQ', 'Pass and Proceed with QLD Resit(s)'), ('PT', 'Proceed and Trail Failed Module'), ('PC', 'Pass and Proceed with Compensation'), ('R', 'Repeat Year or Failed Modules'), ('ABSJ', 'Repeat ABSJ'), ('1', 'Graduate with First'), ('21', 'Graduate with 2:1'), ('22', 'Graduate with 2:2'), ('3', 'Graduate with 3rd'), ('C', 'Award Certificate of Higher Education'), ('D', 'Award Diploma of Higher Education'), ('O', 'Award Ordinary Degree'), ('WD', 'Withdrawal with no Award')], max_length=40, null=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='main.Course')),
+                ('modules', models.ManyToManyField(blank=True, related_name='students', to='main.Module')),
+                ('tutor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tutees', to='main.Staff')),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['last_name', 'first_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubjectArea',
+            fields=[
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Add...')),
+                ('slug', models.CharField(max_length=100, primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TuteeSession',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_of_meet', models.DateField(verbose_name='Date')),
+                ('notes', models.TextField()),
+                ('meeting_took_place', models.BooleanField(default=True)),
+                ('tutee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.Student')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.Staff')),
+            ],
+            options={
+                'ordering': ['date_of_meet', 'tutor'],
+            },
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='subject_areas',
+            field=models.ManyToManyField(blank=True, null=True, to='main.SubjectArea'),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='performance',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='performances', to='main.Student'),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='subject_areas',
+            field=models.ManyToManyField(to='main.SubjectArea', verbose_name='Open for'),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='teachers',
+            field=models.ManyToManyField(related_name='modules', to='main.Staff'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='subject_areas',
+            field=models.ManyToManyField(blank=True, related_name='courses', to='main.SubjectArea'),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='module',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assessments', to='main.Module'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='performance',
+            unique_together=set([('student', 'module')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='module',
+            unique_together=set([('code', 'year')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='assessment',
+            unique_together=set([('module', 'title')]),
+        ),
+    ]
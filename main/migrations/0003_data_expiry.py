@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='data',
+            name='chunks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='data',
+            name='expires',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='data',
+            name='timestamp',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='data',
+            name='value',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='DataChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_id', models.CharField(db_index=True, max_length=20)),
+                ('number', models.PositiveIntegerField()),
+                ('payload', models.BinaryField()),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='datachunk',
+            unique_together=set([('data_id', 'number')]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_searchterm'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='student',
+            index_together=set([('last_name', 'first_name', 'student_id')]),
+        ),
+    ]
@@ -1,11 +1,15 @@
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.db import models
 from django.utils.text import slugify
 from django.utils import timezone
 from feedback.categories import AVAILABLE_MARKSHEETS
+from main.caching import versioned_key, resits_version
 from main.unisettings import TEACHING_WEEKS, PASSMARK
 
+RESITS_TIMEOUT = 60 * 60 * 24
+
 ACADEMIC_YEARS = (
     [(i, str(i) + "/" + str(i+1)[-2:]) for i in range(2010, 2025)]
 )
@@ -31,12 +35,29 @@ class Setting(models.Model):
 class Data(models.Model):
     """Allows to save some data for passing it between functions
 
-    A management function set by a Cron job will delete data instances
-    older than 14 days to save space.
+    Use main.staging to store and load values: large values are
+    compressed and kept in DataChunks, and expired instances are purged
+    from time to time (or with the clean_data command).
     """
     id = models.CharField(max_length=20, primary_key=True)
-    value = models.TextField()
-    timestamp = models.DateTimeField(auto_now=True)
+    value = models.TextField(blank=True)
+    timestamp = models.DateTimeField(auto_now=True, db_index=True)
+    expires = models.DateTimeField(blank=True, null=True, db_index=True)
+    chunks = models.PositiveIntegerField(default=0)
+
+
+class DataChunk(models.Model):
+    """A part of the compressed value of a large Data instance
+
+    This refers to the Data instance by its id instead of a foreign key,
+    so that both can be deleted with one statement each.
+    """
+    data_id = models.CharField(max_length=20, db_index=True)
+    number = models.PositiveIntegerField()
+    payload = models.BinaryField()
+
+    class Meta:
+        unique_together = ('data_id', 'number')
 
 
 class SubjectArea(models.Model):
@@ -391,19 +412,22 @@ class Module(models.Model):
 
     def resit_assessment_sub_menu(self):
         returnlist = []
+        resit_ids = set()
+        qld_ids = set()
+        for results in self.resit_eligibility().values():
+            for flag, assessment_id in results.values():
+                if flag == 'r':
+                    resit_ids.add(assessment_id)
+                elif flag == 'q':
+                    qld_ids.add(assessment_id)
         resit = []
         qld = []
-        for performance in self.performances.all():
-            eligible = performance.results_eligible_for_resit()
-            for result in eligible:
-                if eligible[result] == 'r':
-                    if result.assessment not in resit:
-                        resit.append(result.assessment)
-                if eligible[result] == 'q':
-                    if result.assessment not in qld:
-                        qld.append(result.assessment)
-                if result.assessment in resit and result.assessment in qld:
-                    break
+        if resit_ids or qld_ids:
+            for assessment in self.assessments.all():
+                if assessment.pk in resit_ids:
+                    resit.append(assessment)
+                if assessment.pk in qld_ids:
+                    qld.append(assessment)
         if len(resit) > 0:
             returnlist.append('<li><b>Resit</b></li>')
             for assessment in resit:
@@ -535,6 +559,81 @@ class Module(models.Model):
                 returnlist.append(html)
         return returnlist
 
+    def resit_eligibility(self):
+        """Returns all results in the module that are eligible for resits
+
+        The dictionary looks like this:
+
+            {performance id: {result id: (flag, assessment id)}}
+
+        The flag is 'r' for a resit and 'q' for a QLD resit, following the
+        rules in Performance.results_eligible_for_resit(). The whole module
+        is calculated with one query and cached until marks, concessions,
+        assessments, the QLD status of a student or the module change
+        (see main.signals).
+        """
+        key = versioned_key(resits_version(self.pk))
+        eligibility = cache.get(key)
+        if eligibility is None:
+            eligibility = self.calculate_resit_eligibility()
+            cache.set(key, eligibility, RESITS_TIMEOUT)
+        return eligibility
+
+    def calculate_resit_eligibility(self):
+        rows = Performance.assessment_results.through.objects.filter(
+            performance__module=self
+        ).order_by().values_list(
+            'performance',
+            'performance__student__qld',
+            'assessmentresult',
+            'assessmentresult__mark',
+            'assessmentresult__concessions',
+            'assessmentresult__assessment',
+            'assessmentresult__assessment__module',
+            'assessmentresult__assessment__value'
+        )
+        first_attempt = {}
+        qld = {}
+        results = {}
+        for (performance_id, student_qld, result_id, mark, concessions,
+                assessment_id, module_id, value) in rows:
+            first_attempt.setdefault(performance_id, 0)
+            if module_id == self.pk and mark:
+                first_attempt[performance_id] += mark * value
+            qld[performance_id] = student_qld
+            results.setdefault(performance_id, []).append(
+                (result_id, mark, concessions, assessment_id))
+        eligibility = {}
+        for performance_id, performance_results in results.items():
+            average = int(round(float(first_attempt[performance_id]) / 100))
+            eligible = {}
+            for result_id, mark, concessions, assessment_id in (
+                    performance_results):
+                if average < PASSMARK:
+                    if mark is not None and mark < PASSMARK:
+                        eligible[result_id] = ('r', assessment_id)
+                if concessions in ['G', 'P']:
+                    if result_id not in eligible:
+                        eligible[result_id] = ('r', assessment_id)
+                if self.foundational and qld[performance_id]:
+                    if result_id not in eligible:
+                        if mark is not None and mark < PASSMARK:
+                            eligible[result_id] = ('q', assessment_id)
+            if eligible:
+                eligibility[performance_id] = eligible
+        return eligibility
+
+    def performances_with_resit(self, assessment, flag='r'):
+        """All performances with a resit (or 'q': QLD resit) for assessment"""
+        performance_ids = []
+        for performance_id, results in self.resit_eligibility().items():
+            if (flag, assessment.pk) in results.values():
+                performance_ids.append(performance_id)
+        return list(
+            Performance.objects.filter(pk__in=performance_ids)
+            .select_related('student')
+        )
+
     def all_group_assessments(self):
         returnlist = []
         for assessment in self.assessments.all():
@@ -743,6 +842,26 @@ class Assessment(models.Model):
             )
 
 
+class StudentQuerySet(models.QuerySet):
+    """Common selections of students, available as Student.objects"""
+
+    def cohort(self, subject_area, year=None, active=True):
+        """The students of a subject area, optionally only of one year
+
+        subject_area can be a SubjectArea or its slug. The subject areas
+        of the courses are joined in SQL, so students without a course are
+        left out. With active=None, active and inactive students are
+        included.
+        """
+        students = self.filter(
+            course__subject_areas=subject_area).select_related('course')
+        if year is not None:
+            students = students.filter(year=year)
+        if active is not None:
+            students = students.filter(active=active)
+        return students
+
+
 class Student(models.Model):
     """The class representing a student"""
 
@@ -863,8 +982,18 @@ class Student(models.Model):
         null=True
     )
 
+    objects = StudentQuerySet.as_manager()
+
     class Meta:
         ordering = ['last_name', 'first_name']
+        index_together = [['last_name', 'first_name', 'student_id']]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Student, cls).from_db(db, field_names, values)
+        # Compared on save to find the changed fields, see main.signals
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return "%s, %s" % (self.last_name, self.first_name)
@@ -994,23 +1123,22 @@ class AssessmentResult(models.Model):
                 returnstring += ' (' + add + ')'
         return returnstring
 
+    def resit_flag(self):
+        """Returns 'r' for a resit, 'q' for a QLD resit or None"""
+        performance = self.part_of.select_related('module').first()
+        if performance is None:
+            return None
+        eligible = performance.module.resit_eligibility().get(
+            performance.pk, {})
+        if self.pk in eligible:
+            return eligible[self.pk][0]
+        return None
+
     def eligible_for_resit(self):
-        eligible = False
-        performance = self.part_of.first()
-        all_results = performance.results_eligible_for_resit()
-        if self in all_results:
-            if all_results[self] == 'r':
-                eligible = True
-        return eligible
+        return self.resit_flag() == 'r'
 
     def eligible_for_qld_resit(self):
-        eligible = False
-        performance = self.part_of.first()
-        all_results = performance.results_eligible_for_resit()
-        if self in all_results:
-            if all_results[self] == 'q':
-                eligible = True
-        return eligible
+        return self.resit_flag() == 'q'
 
         #        if self.mark:
         #            if self.mark < PASSMARK:
@@ -1055,7 +1183,8 @@ class AssessmentResult(models.Model):
             pass
         first = (self.mark, edit, marksheet)
         returndict['first'] = first
-        if self.eligible_for_resit():
+        resit_flag = self.resit_flag()
+        if resit_flag == 'r':
             ms = self.assessment.resit_marksheet_type
             if any(ms in x for x in AVAILABLE_MARKSHEETS):
                 edit = (
@@ -1079,7 +1208,7 @@ class AssessmentResult(models.Model):
             resit = (self.resit_mark, edit, marksheet)
             if edit or self.resit_mark:
                 returndict['resit'] = resit
-        if self.eligible_for_qld_resit():
+        if resit_flag == 'q':
             ms = self.assessment.resit_marksheet_type
             if any(ms in x for x in AVAILABLE_MARKSHEETS):
                 edit = (
@@ -1210,6 +1339,57 @@ class AssessmentResult(models.Model):
         self.save()
 
 
+NOT_RECORDED = '-'
+ATTENDANCE_VALUES = ('p', 'a', 'e')
+
+
+def decode_attendance(attendance):
+    """Turns the attendance string into a dictionary (week: presence)
+
+    The attendance is stored with one character per week: the character
+    at position week - 1 is 'p' (present), 'a' (absent), 'e' (excused) or
+    '-' if nothing has been recorded for that week. The old format
+    ("5:p/6:a/...") is still understood, see the convert_attendance command.
+    """
+    weeks = {}
+    if not attendance:
+        return weeks
+    if ':' in attendance:
+        for entry in attendance.split('/'):
+            if ':' in entry:
+                week, presence = entry.split(':', 1)
+                weeks[int(week)] = presence
+        return weeks
+    for index, presence in enumerate(attendance):
+        if presence != NOT_RECORDED:
+            weeks[index + 1] = presence
+    return weeks
+
+
+def encode_attendance(weeks):
+    """Turns a dictionary (week: presence) into the attendance string
+
+    A presence of None or '' means that nothing was recorded for the week,
+    any other value than those in ATTENDANCE_VALUES raises a ValueError.
+    """
+    recorded = {}
+    for week, presence in weeks.items():
+        week = int(week)
+        if week < 1:
+            raise ValueError('Week %s is not a valid week' % (week))
+        if presence in ATTENDANCE_VALUES:
+            recorded[week] = presence
+        elif presence not in (None, ''):
+            raise ValueError(
+                '%s is not a valid attendance entry' % (presence))
+    if not recorded:
+        return None
+    characters = [NOT_RECORDED] * max(recorded)
+    for week, presence in recorded.items():
+        characters[week - 1] = presence
+    return ''.join(characters)
+
+
 class Performance(models.Model):
     """The Performance class connects a student with a module"""
     ATTENDANCE_ENTRIES = (
@@ -1227,7 +1407,7 @@ class Performance(models.Model):
     # Average
     average = models.IntegerField(blank=True, null=True)  # For display
     real_average = models.FloatField(blank=True, null=True)  # For calculation
-    # Attendance: week:string/week/string...
+    # Attendance: one character per week, see decode_attendance()
     attendance = models.CharField(max_length=250, blank=True, null=True)
 
     class Meta:
@@ -1346,28 +1526,13 @@ class Performance(models.Model):
         return return_list
 
     def results_eligible_for_resit(self):
+        """Returns {result: 'r' or 'q'}, see Module.resit_eligibility()"""
+        eligible = self.module.resit_eligibility().get(self.pk, {})
         eligible_results = {}
-        average = self.average_from_first_attempt()
-        for result in self.assessment_results.all():
-            try:
-                if average < PASSMARK:
-                    if result.mark < PASSMARK:
-                        eligible_results[result] = 'r'
-                        # eligible_results.append(result)
-            except TypeError:
-                pass
-            if result.concessions in ['G', 'P']:
-                if result not in eligible_results:
-                    eligible_results[result] = 'r'
-                    # eligible_results.append(result)
-            if self.module.foundational and self.student.qld:
-                try:
-                    if result not in eligible_results:
-                        if result.mark < PASSMARK:
-                            eligible_results[result] = 'q'
-                            # eligible_results.append(result)
-                except TypeError:
-                    pass
+        if eligible:
+            for result in self.assessment_results.filter(
+                    pk__in=list(eligible)).select_related('assessment'):
+                eligible_results[result] = eligible[result.pk][0]
         return eligible_results
 
     def failures_after_resit(self):
@@ -1406,32 +1571,39 @@ class Performance(models.Model):
 
     def calculate_average(self):
         sum_of_marks = 0
-        for assessment in self.module.assessments.all():
-            try:
-                assessment_result = AssessmentResult.objects.get(
-                    assessment=assessment, part_of=self)
-                if assessment_result.result():
-                    this = assessment_result.result() * assessment.value
-                    sum_of_marks += this
-            except AssessmentResult.DoesNotExist:
-                pass
+        for result in self.assessment_results.filter(
+                assessment__module=self.module_id).select_related(
+                    'assessment'):
+            if result.result():
+                sum_of_marks += result.result() * result.assessment.value
         sum_of_marks = float(sum_of_marks)
         average = sum_of_marks / 100
         self.real_average = average
         self.average = int(round(average))
         self.save()
 
+    def update_average(self, value, old_result, new_result):
+        """Adjusts the average after one result has changed
+
+        Only the difference between the old and the new result is added,
+        so no other results need to be loaded.
+        """
+        if self.real_average is None:
+            return self.calculate_average()
+        sum_of_marks = int(round(self.real_average * 100))
+        sum_of_marks += (new_result - old_result) * (value or 0)
+        average = float(sum_of_marks) / 100
+        self.real_average = average
+        self.average = int(round(average))
+        self.save()
+
     def average_from_first_attempt(self):
         sum_of_marks = 0
-        for assessment in self.module.assessments.all():
-            try:
-                assessment_result = AssessmentResult.objects.get(
-                    assessment=assessment, part_of=self)
-                if assessment_result.mark:
-                    this = assessment_result.mark * assessment.value
-                    sum_of_marks += this
-            except AssessmentResult.DoesNotExist:
-                pass
+        for result in self.assessment_results.filter(
+                assessment__module=self.module_id).select_related(
+                    'assessment'):
+            if result.mark:
+                sum_of_marks += result.mark * result.assessment.value
         sum_of_marks = float(sum_of_marks)
         average = sum_of_marks / 100
         return int(round(average))
@@ -1450,8 +1622,10 @@ class Performance(models.Model):
                 assessment_result = AssessmentResult.objects.create(
                     assessment=assessment)
                 self.assessment_results.add(assessment_result)
+            old_result = assessment_result.result()
             assessment_result.set_one_mark(attempt, mark)
-            self.calculate_average()
+            self.update_average(
+                assessment.value, old_result, assessment_result.result())
         except TypeError:
             pass
 
@@ -1543,45 +1717,31 @@ class Performance(models.Model):
             
     def attendance_as_dict(self):
         return_dict = {}
-        if self.attendance:
-            if '/' in self.attendance:
-                p_list = self.attendance.split('/')
-                for entry in p_list:
-                    entry_list = entry.split(':')
-                    return_dict[entry_list[0]] = entry_list[1]
-            else:
-                if ':' in self.attendance:
-                    entry = self.attendance.split(':')
-                    return_dict[entry[0]] = entry[1]
+        for week, presence in decode_attendance(self.attendance).items():
+            return_dict[str(week)] = presence
         return return_dict
 
     def attendance_for(self, week):
-        week = str(week)
-        attendance = self.attendance_as_dict()
-        if week in attendance:
-            return attendance[week]
-        else:
+        """Reads the character of one week, without decoding the rest"""
+        week = int(week)
+        attendance = self.attendance
+        if attendance and ':' in attendance:
+            return decode_attendance(attendance).get(week)
+        if not attendance or week < 1 or week > len(attendance):
+            return None
+        presence = attendance[week - 1]
+        if presence == NOT_RECORDED:
             return None
+        return presence
 
     def save_attendance(self, week, presence):
-        week = str(week)
-        attendance = self.attendance_as_dict()
-        attendance[week] = presence
-        attendance_string = ''
-        first_run = True
-        for week_no in attendance:
-            if not first_run:
-                attendance_string += '/'
-            else:
-                first_run = False
-            attendance_string += week_no
-            attendance_string += ':'
-            attendance_string += attendance[week_no]
-        self.attendance = attendance_string
+        weeks = decode_attendance(self.attendance)
+        weeks[int(week)] = presence
+        self.attendance = encode_attendance(weeks)
         self.save()
 
     def count_attendance(self):
-        attendance = self.attendance_as_dict()
+        attendance = decode_attendance(self.attendance)
         present = 0
         absent = 0
         for week, presence in attendance.items():
@@ -1593,14 +1753,10 @@ class Performance(models.Model):
         return returnstring
 
     def attendance_as_list(self):
-        attendance = self.attendance_as_dict()
+        attendance = decode_attendance(self.attendance)
         returnlist = []
-        weeklist = []
-        for week in attendance:
-            weeklist.append(int(week))  # Otherwise 10 will be before 2!
-        weeklist.sort()
-        for week in weeklist:
-            returnlist.append(attendance[str(week)])
+        for week in sorted(attendance):
+            returnlist.append(attendance[week])
         return returnlist
 
     def missed_the_last_two_sessions(self):
@@ -1695,3 +1851,76 @@ class TuteeSession(models.Model):
 
     def get_delete_url(self):
         return reverse('delete_tutee_meeting', args=[self.id])
+
+
+class ExportJob(models.Model):
+    """A PDF export that is rendered in the background
+
+    Exporting the marks of a whole cohort takes too long to happen within
+    a request. The view queues a job instead, a worker started with the
+    process_export_jobs command renders the file (see main.jobs) and the
+    user downloads it from the status page until the job expires.
+    """
+    STATUSES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    task = models.CharField(max_length=100)
+    arguments = models.TextField()
+    user = models.ForeignKey(User)
+    filename = models.CharField(max_length=200)
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default='queued', db_index=True)
+    progress = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    result = models.CharField(max_length=200, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+    expires = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        ordering = ['created']
+
+    def __str__(self):
+        return self.filename
+
+    def get_absolute_url(self):
+        return reverse('export_job', args=[self.id])
+
+    def get_download_url(self):
+        return reverse('download_export', args=[self.id])
+
+
+class SearchTerm(models.Model):
+    """A word under which a student or a module can be found
+
+    The terms are kept up to date by main.search and searched by prefix,
+    which can use the index on term.
+    """
+    term = models.CharField(max_length=50, db_index=True)
+    weight = models.PositiveSmallIntegerField()
+    student = models.ForeignKey(
+        Student, blank=True, null=True, related_name='search_terms')
+    module = models.ForeignKey(
+        Module, blank=True, null=True, related_name='search_terms')
+
+
+class AttendanceAlert(models.Model):
+    """A student who has just started missing sessions in a module
+
+    Saving a register queues an alert whenever a student reaches the
+    absence streak that counts as at risk (see main.attendance). The
+    send_attendance_alerts command sends the queued alerts as digests to
+    the tutors and the pastoral care staff and marks them as sent.
+    """
+    performance = models.ForeignKey(
+        Performance, related_name='attendance_alerts')
+    streak = models.PositiveSmallIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        ordering = ['created']
@@ -0,0 +1,131 @@
+"""Building blocks shared by all PDF exports
+
+The logo is read from the local disk (or, if it is not there and
+LOGO_URL is set, downloaded) and decoded only once per process. All marksheets and lists then draw the
+same ImageReader, so exporting the marksheets of a whole module does not
+mean opening (or downloading) the image again for every page.
+"""
+import os
+import threading
+from io import BytesIO
+from urllib.request import urlopen
+from main.db_settings import db_settings
+from main.unisettings import LOGO_PATH, LOGO_URL, UNI_NAME
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable, Paragraph
+
+LOGO_WIDTH = 2.45*inch
+LOGO_HEIGHT = 1*inch
+LOGO_TIMEOUT = 10
+
+_logos = {}
+_draw_lock = threading.Lock()
+
+
+class SharedImage(Flowable):
+    """A flowable that draws an ImageReader that has already been decoded
+
+    The Image flowable in ReportLab wants a file and decodes it itself.
+    This one takes the reader and draws it with canvas.drawImage(), so
+    that many flowables can share it.
+    """
+
+    def __init__(self, reader, width, height, hAlign='CENTER'):
+        Flowable.__init__(self)
+        self.reader = reader
+        self.imageWidth, self.imageHeight = reader.getSize()
+        self.drawWidth = width
+        self.drawHeight = height
+        self.hAlign = hAlign
+
+    def wrap(self, available_width, available_height):
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        # The reader rewinds and reads the same buffer for every document
+        with _draw_lock:
+            self.canv.drawImage(
+                self.reader, 0, 0, self.drawWidth, self.drawHeight,
+                mask='auto')
+
+
+def logo_path():
+    """Returns the path of the logo, the 'logo_path' Setting or LOGO_PATH
+
+    The Setting can also be a URL.
+    """
+    path = db_settings.get('logo_path', '') or LOGO_PATH
+    if is_url(path):
+        return path
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), path)
+    return path
+
+
+def is_url(path):
+    return path.startswith(('http://', 'https://', 'file://'))
+
+
+def read_image(path):
+    if is_url(path):
+        response = urlopen(path, timeout=LOGO_TIMEOUT)
+        try:
+            return response.read()
+        finally:
+            response.close()
+    with open(path, 'rb') as image_file:
+        return image_file.read()
+
+
+def logo_reader(path):
+    """Returns the decoded image in path, or None if it cannot be read
+
+    The result is kept for the lifetime of the process - a missing or
+    broken file is not tried again either.
+    """
+    if path not in _logos:
+        try:
+            reader = ImageReader(BytesIO(read_image(path)))
+            reader.getSize()
+        except (IOError, ValueError):
+            reader = None
+        _logos[path] = reader
+    return _logos[path]
+
+
+def logo_source():
+    """Returns the path or URL of the logo that is printed, or None
+
+    If the logo in logo_path() cannot be read, the logo is downloaded from
+    LOGO_URL instead, if that is set (once per process).
+    """
+    path = logo_path()
+    if logo_reader(path) is not None:
+        return path
+    if LOGO_URL and logo_reader(LOGO_URL) is not None:
+        return LOGO_URL
+    return None
+
+
+def current_logo():
+    """Returns the ImageReader of the logo, or None"""
+    source = logo_source()
+    if source is None:
+        return None
+    return logo_reader(source)
+
+
+def institution_name():
+    """The name printed instead of the logo"""
+    return db_settings.get('uni_name', '') or UNI_NAME
+
+
+def logo():
+    """Returns the university logo, unless it is not available"""
+    reader = current_logo()
+    if reader is None:
+        styles = getSampleStyleSheet()
+        return Paragraph(institution_name(), styles['Heading1'])
+    return SharedImage(reader, LOGO_WIDTH, LOGO_HEIGHT)
@@ -0,0 +1,204 @@
+"""The progression board: what happens to every student next year
+
+For one cohort, the board lists every student's modules of the current
+year with the (capped) marks, the failed modules, the failed modules that
+could be compensated and the foundational modules with assessments that
+have to be resat for QLD purposes. It also recommends one of the
+Student.NEXT_YEAR_OPTIONS for students who have not been decided yet.
+
+Everything is read in three queries (students, their performances and
+the assessment results of those performances) and the board is cached
+until a mark, a module or a student changes - every change that
+invalidates a mark grid also invalidates the boards.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from main.caching import invalidate_progression, versioned_key
+from main.functions import bulk_update
+from main.models import Performance, Student
+from main.unisettings import COMPENSATION_MARK, PASSMARK
+
+PROGRESSION_TIMEOUT = 60 * 60 * 24
+YEARS = [1, 2, 3]
+
+# Options that make no sense in a year of study
+EXCLUDED_OPTIONS = {
+    1: ['1', '21', '22', '3', 'C', 'D'],
+    2: ['1', '21', '22', '3', 'D'],
+    3: ['PP', 'PT', 'PC', 'C'],
+}
+CONCESSIONS_GRANTED = ['G', 'P']
+
+
+def options_for(year):
+    """Returns the NEXT_YEAR_OPTIONS that can be chosen in a year"""
+    if year not in EXCLUDED_OPTIONS:
+        return []
+    return [
+        (code, label) for code, label in Student.NEXT_YEAR_OPTIONS
+        if code not in EXCLUDED_OPTIONS[year]
+    ]
+
+
+def recommendation(year, failed, compensable, qld_problems):
+    """Returns the recommended next_year code, or None
+
+    Only progression within the degree is recommended - degrees and
+    repeated years always need a decision. A student who passed everything
+    proceeds (with QLD resits if necessary), and a student with one failed
+    module that can be compensated proceeds with compensation.
+    """
+    if year not in [1, 2]:
+        return None
+    if not failed:
+        if qld_problems:
+            return 'PQ'
+        return 'PP'
+    if len(failed) == 1 and compensable and not qld_problems:
+        return 'PC'
+    return None
+
+
+def results_of(performances):
+    """Returns {performance id: [result values]}
+
+    performances can be a list of ids or a queryset of performance ids.
+    """
+    through = Performance.assessment_results.through
+    found = {}
+    links = through.objects.filter(
+        performance__in=performances,
+        assessmentresult__assessment__module=F('performance__module')
+    ).order_by().values_list(
+        'performance',
+        'assessmentresult__assessment__value',
+        'assessmentresult__mark',
+        'assessmentresult__resit_mark',
+        'assessmentresult__concessions'
+    )
+    for performance_id, value, mark, resit_mark, concessions in links:
+        found.setdefault(performance_id, []).append({
+            'value': value,
+            'mark': mark,
+            'resit_mark': resit_mark,
+            'concessions': concessions
+        })
+    return found
+
+
+def capped_mark(average, results):
+    """The same as Performance.capped_mark(), from preloaded results"""
+    if not average:
+        return None
+    first_attempt = sum(
+        result['mark'] * result['value']
+        for result in results if result['mark']
+    )
+    if int(round(float(first_attempt) / 100)) >= PASSMARK:
+        return str(average)
+    for result in results:
+        if result['mark'] is None or result['mark'] < PASSMARK:
+            if result['concessions'] not in CONCESSIONS_GRANTED:
+                if average > PASSMARK:
+                    return '%s (capped at %s)' % (average, PASSMARK)
+    return str(average)
+
+
+def qld_failure(results):
+    """Whether an assessment has been failed after the resit"""
+    for result in results:
+        if result['mark'] is not None and result['mark'] < PASSMARK:
+            if not result['resit_mark'] or result['resit_mark'] < PASSMARK:
+                return True
+    return False
+
+
+def module_name(title, year):
+    return '%s (%s/%s)' % (title, year, str(year + 1)[-2:])
+
+
+def cohort(subject_area, year=None):
+    """The active students of a subject area
+
+    Without a year, these are the students in years 1 to 3 who have not
+    been decided yet.
+    """
+    if year:
+        return Student.objects.cohort(subject_area, year)
+    return Student.objects.cohort(subject_area).filter(
+        year__in=YEARS, next_year=None)
+
+
+def build_board(students):
+    """Returns a list with one dictionary per student
+
+    Each dictionary contains the student's details, failed and passed
+    (lists of {'module', 'mark'}), compensable and qld_problems (lists of
+    module names), recommended and selected (next_year codes or None) and
+    options (a list of (code, label)).
+    """
+    board = []
+    rows = {}
+    values = students.order_by(
+        'last_name', 'first_name', 'student_id'
+    ).values(
+        'student_id', 'first_name', 'last_name', 'year', 'qld', 'notes',
+        'next_year', 'course__short_title'
+    ).distinct()
+    for row in values:
+        row['course'] = row.pop('course__short_title')
+        row['failed'] = []
+        row['passed'] = []
+        row['compensable'] = []
+        row['qld_problems'] = []
+        rows[row['student_id']] = row
+        board.append(row)
+    performances = Performance.objects.filter(
+        student__in=students.order_by().values('student_id'),
+        belongs_to_year=F('student__year')
+    )
+    results = results_of(performances.order_by().values('pk'))
+    for (pk, student_id, average, title, year,
+            foundational) in performances.order_by(
+                'module__title', 'module__year').values_list(
+                    'pk', 'student', 'average', 'module__title',
+                    'module__year', 'module__foundational'):
+        row = rows[student_id]
+        name = module_name(title, year)
+        entry = {
+            'module': name,
+            'mark': capped_mark(average, results.get(pk, []))
+        }
+        if average is None or average < PASSMARK:
+            row['failed'].append(entry)
+            if average is not None and average >= COMPENSATION_MARK:
+                row['compensable'].append(name)
+        else:
+            row['passed'].append(entry)
+        if foundational and row['qld'] and qld_failure(results.get(pk, [])):
+            row['qld_problems'].append(name)
+    for row in board:
+        row['recommended'] = recommendation(
+            row['year'], row['failed'], row['compensable'],
+            row['qld_problems'])
+        row['selected'] = row['next_year'] or row['recommended']
+        row['options'] = options_for(row['year'])
+    return board
+
+
+def progression_board(subject_area, year=None):
+    """Returns the cached board for a cohort, see build_board()"""
+    key = versioned_key('progression', subject_area.slug, year)
+    board = cache.get(key)
+    if board is None:
+        board = build_board(cohort(subject_area, year))
+        cache.set(key, board, PROGRESSION_TIMEOUT)
+    return board
+
+
+def save_decisions(decisions):
+    """Saves {student id: {'next_year': code}} with one UPDATE per batch"""
+    with transaction.atomic():
+        bulk_update(Student, decisions)
+    invalidate_progression()
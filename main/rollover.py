@@ -0,0 +1,273 @@
+"""Moving all students into the next academic year
+
+The decisions for every student (the next_year field) are taken in
+enter_student_progression. Rollover reads everything it needs for all
+students at once - the students themselves, the failed assessments of
+those who proceed with resits or trailed modules and the compensated
+modules - with one query per table, and works out the new year, degree
+and notes for everybody before anything is written. The dry run shows
+exactly this plan.
+
+roll_over() then writes the plan with one UPDATE per batch of students
+and advances current_year in the same transaction, so that an error or a
+timeout halfway leaves everything as it was. The Setting row for the
+current year is locked while this happens. The caller passes the year it
+wants to leave (the one shown in the preview), so a second rollover
+started at the same time - for example a form submitted twice - waits
+for the lock, finds that the year has already changed and stops with
+YearChanged instead of advancing the year again.
+"""
+from collections import OrderedDict
+from django.db import transaction
+from django.db.models import F
+from main.db_settings import db_settings
+from main.functions import bulk_update
+from main.models import Performance, Setting, Student
+from main.search import invalidate_search
+from main.student_actions import modules_of_students, students_changed
+from main.unisettings import PASSMARK
+
+BATCH_SIZE = 500
+YEARS = [1, 2, 3]
+
+# The degree awarded for each decision that ends the studies
+GRADUATIONS = {
+    '1': 1,
+    '21': 21,
+    '22': 22,
+    '3': 3,
+    'D': 6,
+    'C': 7,
+    'O': 5,
+    'WD': 8,
+}
+PROCEEDING = ['PP', 'PQ', 'PT', 'PC']
+REPEATING = {
+    'R': 'Repeated Year %s',
+    'ABSJ': 'Repeated Year %s ABSJ',
+}
+NEXT_YEAR_LABELS = dict(Student.NEXT_YEAR_OPTIONS)
+
+
+def batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def failed(mark, resit_mark):
+    """Whether an assessment is failed after the resit
+
+    A missing mark or resit mark counts as failed, like in
+    Performance.failures_after_resit().
+    """
+    return (
+        (not mark or mark < PASSMARK) and
+        (not resit_mark or resit_mark < PASSMARK)
+    )
+
+
+def resits(students):
+    """Returns {student id: [resit]} for students who proceed with resits
+
+    students is a dictionary of {student id: values}. A resit is a string
+    like "Module (Assessment)". Students with PQ only resit failed
+    assessments in foundational modules (and only if they are on the QLD
+    track), students with PT all failed assessments in failed modules.
+    Only modules of the year the student is leaving count.
+    """
+    student_ids = [
+        student_id for student_id, values in students.items()
+        if values['next_year'] == 'PT' or
+        (values['next_year'] == 'PQ' and values['qld'])
+    ]
+    through = Performance.assessment_results.through
+    found = {}
+    for batch in batches(student_ids):
+        links = through.objects.filter(
+            performance__student__in=batch,
+            performance__belongs_to_year=F('performance__student__year')
+        ).order_by(
+            'performance__module__title',
+            'performance__module__year',
+            'assessmentresult__assessment__title'
+        ).values_list(
+            'performance__student',
+            'performance__module__title',
+            'performance__module__foundational',
+            'performance__average',
+            'assessmentresult__assessment__title',
+            'assessmentresult__mark',
+            'assessmentresult__resit_mark'
+        )
+        for (student_id, module, foundational, average, assessment, mark,
+                resit_mark) in links:
+            if students[student_id]['next_year'] == 'PQ':
+                if not foundational or mark is None or mark >= PASSMARK:
+                    continue
+            elif average is None or average >= PASSMARK:
+                continue
+            if failed(mark, resit_mark):
+                found.setdefault(student_id, []).append(
+                    '%s (%s)' % (module, assessment))
+    return found
+
+
+def compensations(students):
+    """Returns {student id: [note]} for students who proceed with PC"""
+    student_ids = [
+        student_id for student_id, values in students.items()
+        if values['next_year'] == 'PC'
+    ]
+    found = {}
+    for batch in batches(student_ids):
+        performances = Performance.objects.filter(
+            student__in=batch,
+            belongs_to_year=F('student__year'),
+            average__lt=PASSMARK
+        ).order_by('module__title', 'module__year').values_list(
+            'student', 'module__title', 'real_average')
+        for student_id, module, real_average in performances:
+            found.setdefault(student_id, []).append(
+                'Failure in %s (%s) has been compensated' % (
+                    module, real_average))
+    return found
+
+
+class Rollover(object):
+    """The changes that moving into the next year would make
+
+    changes is an ordered dictionary of {student id: {field: new value}}
+    and rows a list with one dictionary per student for the report
+    (student id, name, year, decision, new year and note).
+    """
+
+    def __init__(self, current_year):
+        self.current_year = current_year
+        students = OrderedDict()
+        rows = Student.objects.filter(
+            active=True, year__in=YEARS
+        ).order_by('-year', 'last_name', 'first_name').values(
+            'student_id', 'first_name', 'last_name', 'year', 'is_part_time',
+            'second_part_time_year', 'qld', 'notes', 'next_year'
+        )
+        for values in rows:
+            students[values['student_id']] = values
+        self.resits = resits(students)
+        self.compensations = compensations(students)
+        self.changes = OrderedDict()
+        self.rows = []
+        for student_id, values in students.items():
+            changes, note = self.changes_for(values)
+            if changes:
+                self.changes[student_id] = changes
+            name = '%s, %s' % (values['last_name'], values['first_name'])
+            self.rows.append({
+                'student_id': student_id,
+                'name': name,
+                'year': values['year'],
+                'decision': NEXT_YEAR_LABELS.get(values['next_year'], ''),
+                'new_year': changes.get('year', values['year']),
+                'note': note
+            })
+
+    def note(self, values, new_year):
+        """Returns the note to add for a student who proceeds or repeats"""
+        student_id = values['student_id']
+        next_year = values['next_year']
+        if next_year in REPEATING:
+            return REPEATING[next_year] % (values['year'])
+        if next_year in ['PQ', 'PT'] and student_id in self.resits:
+            note = 'In Year %s, %s will have to resit %s' % (
+                new_year,
+                values['first_name'],
+                '; '.join(self.resits[student_id])
+            )
+            if next_year == 'PQ':
+                return note + ' for QLD purposes'
+            return note + ' (trailed)'
+        if next_year == 'PC' and student_id in self.compensations:
+            return '; '.join(self.compensations[student_id])
+        return ''
+
+    def changes_for(self, values):
+        """Returns ({field: new value}, added note) for one student"""
+        next_year = values['next_year']
+        changes = {}
+        if next_year is not None:
+            changes['next_year'] = None
+        if next_year in GRADUATIONS:
+            changes['achieved_degree'] = GRADUATIONS[next_year]
+            changes['year'] = 9
+            changes['graduated_in'] = self.current_year
+        elif next_year in PROCEEDING:
+            new_year = values['year']
+            if not values['is_part_time']:
+                new_year += 1
+            elif values['second_part_time_year']:
+                new_year += 1
+                changes['second_part_time_year'] = False
+            else:
+                changes['second_part_time_year'] = True
+            if new_year != values['year']:
+                changes['year'] = new_year
+        note = self.note(values, changes.get('year', values['year']))
+        if note:
+            if values['notes']:
+                changes['notes'] = values['notes'] + '\n\n' + note
+            else:
+                changes['notes'] = note
+        return changes, note
+
+    def summary(self):
+        """Returns {decision: number of students}"""
+        found = OrderedDict()
+        for row in self.rows:
+            decision = row['decision'] or 'No decision'
+            found[decision] = found.get(decision, 0) + 1
+        return found
+
+    def apply(self, progress=None):
+        """Writes the changes, calling progress(done, total) per batch
+
+        This has to be called inside a transaction, see roll_over().
+        """
+        student_ids = list(self.changes)
+        done = 0
+        for batch in batches(student_ids):
+            done += bulk_update(
+                Student,
+                dict((student_id, self.changes[student_id])
+                     for student_id in batch)
+            )
+            if progress is not None:
+                progress(done, len(student_ids))
+        return done
+
+
+class YearChanged(Exception):
+    """The current year is not the one the rollover was meant for"""
+
+
+def roll_over(expected_year, progress=None):
+    """Moves all students from expected_year into the next year
+
+    Everything happens in one transaction. Raises YearChanged if the
+    current year is no longer expected_year. Returns the Rollover that has
+    been applied.
+    """
+    with transaction.atomic():
+        setting = Setting.objects.select_for_update().get(
+            name='current_year')
+        current_year = int(setting.value)
+        if current_year != expected_year:
+            raise YearChanged(
+                'The current year is %s, not %s' % (
+                    current_year, expected_year))
+        rollover = Rollover(current_year)
+        rollover.apply(progress)
+        Setting.objects.filter(pk=setting.pk).update(
+            value=str(rollover.current_year + 1))
+    db_settings.invalidate()
+    students_changed(modules_of_students(list(rollover.changes)))
+    invalidate_search()
+    return rollover
@@ -0,0 +1,195 @@
+"""Searching students and modules
+
+Names, student IDs, exam IDs and module codes and titles are split into
+lower case words and saved as SearchTerms. A query matches everything
+that has, for every word of the query, a term starting with that word.
+Prefixes are looked up as a range (term >= word and term < word + the
+highest character), which can use the index on term in every database,
+and all words are matched and ranked in one grouped query.
+
+The receivers in main.signals keep the terms up to date. Bulk changes do
+not send signals, so they have to call index_students() themselves.
+Results are cached per query and page until the terms change.
+"""
+import hashlib
+import re
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+from main.caching import new_version, versioned_key
+from main.models import Module, SearchTerm, Student
+
+SEARCH_TIMEOUT = 60 * 60
+RESULTS_PER_PAGE = 50
+AUTOCOMPLETE_RESULTS = 10
+MAX_WORDS = 5
+CHUNK_SIZE = 500
+TERM_LENGTH = 50
+HIGHEST_CHARACTER = '\U0010ffff'
+
+# How much a matching term counts, depending on where it comes from
+STUDENT_WEIGHTS = (
+    ('student_id', 10),
+    ('exam_id', 10),
+    ('last_name', 8),
+    ('first_name', 6),
+)
+MODULE_WEIGHTS = (
+    ('code', 10),
+    ('title', 5),
+)
+# Current students are more likely to be looked for than alumni
+ACTIVE_BONUS = 3
+# A word that matches a term completely counts more than a prefix
+EXACT_BONUS = 20
+
+
+def words(text):
+    """Splits a text into lower case words"""
+    if not text:
+        return []
+    return [word[:TERM_LENGTH] for word in re.findall(r'\w+', text.lower())]
+
+
+def terms(values, weights, bonus=0):
+    """Returns {term: weight} for the values of one object"""
+    found = {}
+    for field, weight in weights:
+        value = values[field]
+        field_words = words(value)
+        if value and len(field_words) > 1:
+            # IDs like "ab-123" can also be found as "ab123"
+            field_words.append(''.join(field_words)[:TERM_LENGTH])
+        for word in field_words:
+            found[word] = max(found.get(word, 0), weight + bonus)
+    return found
+
+
+def invalidate_search():
+    new_version('search')
+
+
+def index_students(student_ids):
+    """Replaces the search terms of the given students"""
+    student_ids = list(student_ids)
+    fields = [field for field, weight in STUDENT_WEIGHTS]
+    for start in range(0, len(student_ids), CHUNK_SIZE):
+        chunk = student_ids[start:start + CHUNK_SIZE]
+        SearchTerm.objects.filter(student__in=chunk).delete()
+        new_terms = []
+        students = Student.objects.filter(
+            pk__in=chunk).order_by().values('pk', 'active', *fields)
+        for values in students:
+            bonus = ACTIVE_BONUS if values['active'] else 0
+            for term, weight in terms(values, STUDENT_WEIGHTS, bonus).items():
+                new_terms.append(SearchTerm(
+                    term=term, weight=weight, student_id=values['pk']))
+        SearchTerm.objects.bulk_create(new_terms)
+    invalidate_search()
+
+
+def index_modules(module_ids):
+    """Replaces the search terms of the given modules"""
+    module_ids = list(module_ids)
+    fields = [field for field, weight in MODULE_WEIGHTS]
+    for start in range(0, len(module_ids), CHUNK_SIZE):
+        chunk = module_ids[start:start + CHUNK_SIZE]
+        SearchTerm.objects.filter(module__in=chunk).delete()
+        new_terms = []
+        modules = Module.objects.filter(
+            pk__in=chunk).order_by().values('pk', *fields)
+        for values in modules:
+            for term, weight in terms(values, MODULE_WEIGHTS).items():
+                new_terms.append(SearchTerm(
+                    term=term, weight=weight, module_id=values['pk']))
+        SearchTerm.objects.bulk_create(new_terms)
+    invalidate_search()
+
+
+def rebuild_index():
+    """Indexes all students and modules from scratch"""
+    SearchTerm.objects.all().delete()
+    index_students(Student.objects.values_list('pk', flat=True))
+    index_modules(Module.objects.values_list('pk', flat=True))
+
+
+def matches(query, start, number):
+    """Returns [(student id, module id)] of the best matches for a query"""
+    query_words = words(query)[:MAX_WORDS]
+    if not query_words:
+        return []
+    any_word = Q()
+    scores = {}
+    for number_of_word, word in enumerate(query_words):
+        prefix = Q(term__gte=word, term__lt=word + HIGHEST_CHARACTER)
+        any_word |= prefix
+        scores['word%s' % number_of_word] = Max(Case(
+            When(term=word, then=F('weight') + EXACT_BONUS),
+            When(prefix, then=F('weight')),
+            default=Value(0),
+            output_field=IntegerField()
+        ))
+    total = None
+    for name in scores:
+        total = F(name) if total is None else total + F(name)
+    every_word = dict((name + '__gt', 0) for name in scores)
+    rows = SearchTerm.objects.filter(any_word).values(
+        'student', 'module'
+    ).annotate(**scores).filter(**every_word).annotate(
+        score=total
+    ).order_by('-score', 'student_id', 'module_id')
+    return [
+        (row['student'], row['module'])
+        for row in rows[start:start + number]
+    ]
+
+
+def result(student=None, module=None):
+    if student is not None:
+        if student.active:
+            detail = student.student_id
+            if student.year:
+                detail += ', ' + student.get_year_display()
+        else:
+            detail = student.student_id + ', inactive'
+        return {
+            'type': 'student',
+            'label': str(student),
+            'detail': detail,
+            'url': student.get_absolute_url()
+        }
+    return {
+        'type': 'module',
+        'label': str(module),
+        'detail': module.code,
+        'url': module.get_absolute_url()
+    }
+
+
+def search(query, page=1, per_page=RESULTS_PER_PAGE):
+    """Returns (results, has_next) for one page of a search
+
+    Every result is a dictionary with type ('student' or 'module'),
+    label, detail and url, which can be sent as JSON.
+    """
+    normalized = ' '.join(words(query)[:MAX_WORDS])
+    # The query itself could be too long or contain spaces for memcached
+    digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    key = versioned_key('search', digest, page, per_page)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    found = matches(normalized, (page - 1) * per_page, per_page + 1)
+    has_next = len(found) > per_page
+    found = found[:per_page]
+    students = Student.objects.in_bulk(
+        [student_id for student_id, module_id in found if student_id])
+    modules = Module.objects.in_bulk(
+        [module_id for student_id, module_id in found if module_id])
+    results = []
+    for student_id, module_id in found:
+        if student_id in students:
+            results.append(result(student=students[student_id]))
+        elif module_id in modules:
+            results.append(result(module=modules[module_id]))
+    cache.set(key, (results, has_next), SEARCH_TIMEOUT)
+    return results, has_next
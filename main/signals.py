@@ -0,0 +1,161 @@
+"""Signal receivers that keep the cached data up to date
+
+The receivers are connected in MainConfig.ready(). Bulk updates do not send
+signals, so the functions that use them invalidate the caches themselves.
+"""
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from feedback.models import IndividualFeedback
+from main.caching import (
+    invalidate_attendance, invalidate_menubar, invalidate_mark_grids,
+    invalidate_progression, invalidate_resits)
+from main.models import *
+from main.search import index_modules, index_students, invalidate_search
+
+
+def modules_of_results(result_ids):
+    return Assessment.objects.filter(
+        assessmentresult__in=result_ids).values_list('module', flat=True)
+
+
+# Menubar
+
+
+def menubar_changed(sender, **kwargs):
+    invalidate_menubar()
+
+
+for model in [Setting, SubjectArea, Course, Staff, Module, Student]:
+    post_save.connect(menubar_changed, sender=model)
+    post_delete.connect(menubar_changed, sender=model)
+
+for through in [
+        Course.subject_areas.through,
+        Staff.subject_areas.through,
+        Module.subject_areas.through,
+        Module.teachers.through,
+        Student.modules.through]:
+    m2m_changed.connect(menubar_changed, sender=through)
+
+
+# Mark grids and resit eligibility of modules
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def module_changed(sender, instance, **kwargs):
+    invalidate_mark_grids([instance.pk])
+    invalidate_resits([instance.pk])
+    invalidate_attendance()
+
+
+@receiver(post_save, sender=Assessment)
+@receiver(post_delete, sender=Assessment)
+def assessment_changed(sender, instance, **kwargs):
+    invalidate_mark_grids([instance.module_id])
+    invalidate_resits([instance.module_id])
+
+
+@receiver(post_save, sender=Performance)
+@receiver(post_delete, sender=Performance)
+def performance_changed(sender, instance, **kwargs):
+    invalidate_mark_grids([instance.module_id])
+    invalidate_attendance()
+
+
+@receiver(post_save, sender=AssessmentResult)
+@receiver(post_delete, sender=AssessmentResult)
+def assessment_result_changed(sender, instance, **kwargs):
+    # After a delete, the result can no longer be found in the database
+    module_ids = [instance.assessment.module_id]
+    invalidate_mark_grids(module_ids)
+    invalidate_resits(module_ids)
+
+
+@receiver(post_save, sender=IndividualFeedback)
+@receiver(post_delete, sender=IndividualFeedback)
+def feedback_changed(sender, instance, **kwargs):
+    invalidate_mark_grids(modules_of_results([instance.assessment_result_id]))
+
+
+# The fields of Student that each cache depends on
+MARK_GRID_FIELDS = {'first_name', 'last_name', 'active', 'lsp', 'qld'}
+RESIT_FIELDS = {'qld'}
+PROGRESSION_FIELDS = {
+    'first_name', 'last_name', 'year', 'qld', 'notes', 'next_year',
+    'course_id', 'active'}
+ATTENDANCE_FIELDS = {'year', 'course_id', 'active'}
+STUDENT_FIELDS = (
+    MARK_GRID_FIELDS | RESIT_FIELDS | PROGRESSION_FIELDS | ATTENDANCE_FIELDS)
+
+
+def changed_student_fields(instance, created, update_fields):
+    """Returns the names of the STUDENT_FIELDS that a save has changed
+
+    Students loaded from the database remember their values (see
+    Student.from_db), so only fields that differ count. New students and
+    fields that have not been loaded always count as changed.
+    """
+    loaded = getattr(instance, '_loaded_values', None)
+    if created or loaded is None:
+        changed = set(STUDENT_FIELDS)
+    else:
+        changed = set(
+            name for name in STUDENT_FIELDS
+            if name not in loaded or loaded[name] != getattr(instance, name)
+        )
+    if update_fields is not None:
+        saved = set(
+            Student._meta.get_field(name).attname for name in update_fields)
+        changed &= saved
+    return changed
+
+
+@receiver(post_save, sender=Student)
+def student_changed(sender, instance, created, update_fields, **kwargs):
+    changed = changed_student_fields(instance, created, update_fields)
+    if changed & (MARK_GRID_FIELDS | RESIT_FIELDS):
+        module_ids = list(
+            instance.performances.values_list('module', flat=True))
+        if changed & MARK_GRID_FIELDS:
+            invalidate_mark_grids(module_ids)
+        if changed & RESIT_FIELDS:
+            invalidate_resits(module_ids)
+    if changed & PROGRESSION_FIELDS:
+        invalidate_progression()
+    if changed & ATTENDANCE_FIELDS:
+        invalidate_attendance()
+    instance._loaded_values = dict(
+        (name, instance.__dict__[name])
+        for name in STUDENT_FIELDS if name in instance.__dict__
+    )
+
+
+@receiver(m2m_changed, sender=Performance.assessment_results.through)
+def performance_results_changed(sender, instance, **kwargs):
+    if isinstance(instance, Performance):
+        module_ids = [instance.module_id]
+    else:
+        module_ids = [instance.assessment.module_id]
+    invalidate_mark_grids(module_ids)
+    invalidate_resits(module_ids)
+
+
+# Search index
+
+
+@receiver(post_save, sender=Student)
+def student_search_terms_changed(sender, instance, **kwargs):
+    index_students([instance.pk])
+
+
+@receiver(post_save, sender=Module)
+def module_search_terms_changed(sender, instance, **kwargs):
+    index_modules([instance.pk])
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Module)
+def search_result_deleted(sender, instance, **kwargs):
+    # The search terms have been deleted with the instance
+    invalidate_search()
@@ -0,0 +1,123 @@
+"""Keeping data between requests, for example an uploaded CSV file
+
+Values are stored in Data instances under a random id and expire after
+settings.DATA_LIFETIME seconds. Small values are kept as they are, larger
+ones are compressed and split into DataChunks, so that no single row gets
+too large for the database.
+
+Expired instances are deleted with one statement per table. Every call to
+store() does this with a small probability and for a limited number of
+instances, which spreads the work evenly instead of piling it up for a
+nightly cron job. The clean_data command purges everything at once.
+"""
+import zlib
+from datetime import timedelta
+from random import choice, random
+from string import ascii_letters, digits
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from main.models import Data, DataChunk
+
+# Values longer than this are compressed
+INLINE_LIMIT = 64 * 1024
+CHUNK_SIZE = 512 * 1024
+BATCH_SIZE = 500
+
+
+def random_data_id(prefix, length):
+    chars = ascii_letters + digits
+    return prefix + ''.join(choice(chars) for x in range(length))
+
+
+def split_payload(value):
+    payload = zlib.compress(value.encode('utf-8'))
+    return [
+        payload[start:start + CHUNK_SIZE]
+        for start in range(0, len(payload), CHUNK_SIZE)
+    ]
+
+
+def store(value, prefix='', length=16, lifetime=None):
+    """Saves a string and returns the id to load it with
+
+    lifetime is given in seconds and defaults to settings.DATA_LIFETIME.
+    """
+    if random() < settings.DATA_PURGE_PROBABILITY:
+        purge_data(limit=settings.DATA_PURGE_LIMIT)
+    if lifetime is None:
+        lifetime = settings.DATA_LIFETIME
+    expires = timezone.now() + timedelta(seconds=lifetime)
+    if len(value) > INLINE_LIMIT:
+        chunks = split_payload(value)
+        value = ''
+    else:
+        chunks = []
+    while True:
+        data_id = random_data_id(prefix, length)
+        try:
+            with transaction.atomic():
+                Data.objects.create(
+                    id=data_id,
+                    value=value,
+                    expires=expires,
+                    chunks=len(chunks)
+                )
+                DataChunk.objects.bulk_create([
+                    DataChunk(data_id=data_id, number=number, payload=chunk)
+                    for number, chunk in enumerate(chunks)
+                ])
+            return data_id
+        except IntegrityError:
+            pass
+
+
+def load(data_id):
+    """Returns a stored string
+
+    Raises Data.DoesNotExist if there is no such value or if it expired.
+    """
+    data = Data.objects.get(
+        Q(expires=None) | Q(expires__gte=timezone.now()), id=data_id)
+    if not data.chunks:
+        return data.value
+    chunks = DataChunk.objects.filter(
+        data_id=data_id).order_by('number').values_list('payload', flat=True)
+    return zlib.decompress(b''.join(chunks)).decode('utf-8')
+
+
+def expired_data(now=None):
+    """Returns the expired Data instances
+
+    Instances from before there was an expiry date count from their
+    timestamp.
+    """
+    if now is None:
+        now = timezone.now()
+    legacy_threshold = now - timedelta(seconds=settings.DATA_LIFETIME)
+    return Data.objects.filter(
+        Q(expires__lt=now) |
+        Q(expires=None, timestamp__lt=legacy_threshold)
+    )
+
+
+def purge_data(now=None, limit=None):
+    """Deletes expired data, at most limit instances if given
+
+    Returns (number of Data instances, number of DataChunks) deleted.
+    """
+    expired = expired_data(now)
+    if limit is None:
+        chunks = DataChunk.objects.filter(
+            data_id__in=expired.values('id')).delete()[0]
+        return expired.delete()[0], chunks
+    data_ids = list(expired.order_by('expires').values_list(
+        'id', flat=True)[:limit])
+    deleted = 0
+    chunks = 0
+    for start in range(0, len(data_ids), BATCH_SIZE):
+        batch = data_ids[start:start + BATCH_SIZE]
+        chunks += DataChunk.objects.filter(data_id__in=batch).delete()[0]
+        deleted += Data.objects.filter(id__in=batch).delete()[0]
+    return deleted, chunks
@@ -0,0 +1,39 @@
+// Suggestions for the search box in the navbar, from the autocomplete view
+$(function() {
+    var box = $('#search-box');
+    var suggestions = $('#search-suggestions');
+    var timer = null;
+    var lastQuery = '';
+
+    function show(results) {
+        suggestions.empty();
+        $.each(results, function(i, result) {
+            var link = $('<a>').attr('href', result.url).text(result.label);
+            link.append(' ').append($('<small class="text-muted">').text(result.detail));
+            suggestions.append($('<li>').append(link));
+        });
+        suggestions.toggle(results.length > 0);
+    }
+
+    box.on('input', function() {
+        var query = $.trim(box.val());
+        clearTimeout(timer);
+        if (query.length < 2) {
+            show([]);
+            return;
+        }
+        timer = setTimeout(function() {
+            lastQuery = query;
+            $.getJSON(box.data('autocomplete-url'), {q: query}, function(data) {
+                if (query === lastQuery) {
+                    show(data.results);
+                }
+            });
+        }, 150);
+    });
+
+    box.on('blur', function() {
+        // Leaves time to click on a suggestion
+        setTimeout(function() { suggestions.hide(); }, 200);
+    });
+});
@@ -0,0 +1,132 @@
+"""The bulk actions for whole groups of students in year_view
+
+Every action changes all selected students with one UPDATE, and deleting
+students removes everything that belongs to them (performances,
+assessment results, feedback, tutee meetings) with one DELETE per table,
+all in one transaction. No signals are sent, so the caches and the
+search index are updated here.
+
+The actions come from the year_view form as "<action>_<value>", for
+example "year_2" or "course_BA in Evil Plotting".
+"""
+from django.db import transaction
+from django.utils.text import capfirst
+from feedback.models import IndividualFeedback
+from main.caching import (
+    invalidate_attendance, invalidate_mark_grids, invalidate_menubar,
+    invalidate_resits)
+from main.functions import delete_rows
+from main.models import *
+from main.search import index_students, invalidate_search
+
+BATCH_SIZE = 500
+
+SWITCHES = {
+    'on': True,
+    'off': False,
+    'yes': True,
+    'no': False,
+}
+
+
+def batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def changed_value(action, value):
+    """Returns (field name, new value) for an action of the form"""
+    if action == 'tutor':
+        return 'tutor', Staff.objects.get(user__id=value)
+    if action == 'course':
+        return 'course', Course.objects.get(title=value)
+    if action in ['since', 'year']:
+        return action, int(value)
+    if action in ['qld', 'nalp', 'active']:
+        return action, SWITCHES[value]
+    raise ValueError('Unknown action: ' + action)
+
+
+def modules_of_students(student_ids):
+    return set(Performance.objects.filter(
+        student__in=student_ids).order_by().values_list('module', flat=True))
+
+
+def students_changed(module_ids):
+    invalidate_menubar()
+    invalidate_mark_grids(module_ids)
+    invalidate_resits(module_ids)
+    invalidate_attendance()
+
+
+def update_students(student_ids, field, value):
+    """Sets one field for all students, returns the number of students"""
+    with transaction.atomic():
+        updated = Student.objects.filter(
+            student_id__in=student_ids).update(**{field: value})
+    students_changed(modules_of_students(student_ids))
+    if field == 'active':
+        # Current students are ranked higher in the search
+        index_students(student_ids)
+    return updated
+
+
+def delete_students(student_ids):
+    """Deletes students with everything that belongs to them
+
+    Returns a dictionary with the number of deleted rows.
+    """
+    from feedback.marksheets import invalidate_marksheets
+    through = Performance.assessment_results.through
+    links = through.objects.filter(performance__student__in=student_ids)
+    result_ids = list(links.values_list('assessmentresult', flat=True))
+    module_ids = modules_of_students(student_ids)
+    deleted = {'feedback': 0, 'results': 0}
+    with transaction.atomic():
+        for batch in batches(result_ids):
+            feedback = IndividualFeedback.objects.filter(
+                assessment_result__in=batch)
+            delete_rows(IndividualFeedback.markers.through.objects.filter(
+                individualfeedback__in=feedback))
+            deleted['feedback'] += delete_rows(feedback)
+        delete_rows(links)
+        delete_rows(AttendanceAlert.objects.filter(
+            performance__student__in=student_ids))
+        for batch in batches(result_ids):
+            deleted['results'] += delete_rows(
+                AssessmentResult.objects.filter(pk__in=batch))
+        deleted['performances'] = delete_rows(
+            Performance.objects.filter(student__in=student_ids))
+        delete_rows(Student.modules.through.objects.filter(
+            student__in=student_ids))
+        deleted['meetings'] = delete_rows(
+            TuteeSession.objects.filter(tutee__in=student_ids))
+        delete_rows(SearchTerm.objects.filter(student__in=student_ids))
+        deleted['students'] = delete_rows(
+            Student.objects.filter(student_id__in=student_ids))
+    invalidate_marksheets(result_ids)
+    students_changed(module_ids)
+    invalidate_search()
+    return deleted
+
+
+def apply_action(student_ids, option):
+    """Applies an option of the year_view form to the students
+
+    Returns a summary of what has been changed, to be shown to the user.
+    """
+    action, value = option.split('_', 1)
+    student_ids = list(student_ids)
+    if action == 'delete':
+        if not SWITCHES[value]:
+            return 'Nothing has been deleted.'
+        deleted = delete_students(student_ids)
+        return (
+            'Deleted %(students)s students with %(performances)s '
+            'performances, %(results)s assessment results, %(feedback)s '
+            'feedback sheets and %(meetings)s tutee meetings.' % deleted
+        )
+    field, new_value = changed_value(action, value)
+    updated = update_students(student_ids, field, new_value)
+    verbose_name = Student._meta.get_field(field).verbose_name
+    return '%s changed for %s students.' % (capfirst(verbose_name), updated)
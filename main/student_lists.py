@@ -0,0 +1,173 @@
+"""Filtering, sorting and paging the student lists of year_view
+
+Everything happens in the database: the filters from the query string
+are added to the queryset, the list is sorted by the chosen column (with
+the student ID to break ties) and only one page is loaded. Pages are
+found by keyset pagination - the query string contains the sort values
+of the last (or first) student on the current page, and the next page
+starts right after them. Unlike an OFFSET, this costs the same on every
+page, however far into the alumni list it goes.
+
+Nullable columns are sorted with empty values first (as '' or 0), so
+that the keys can always be compared.
+"""
+import base64
+import json
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.utils.http import urlencode
+
+PAGE_SIZE = 100
+
+# Sort keys for each column: (name, expression or None for a field)
+SORTS = {
+    'name': [('last_name', None), ('first_name', None)],
+    'id': [],
+    'year': [('sort_year', Coalesce('year', Value(0)))],
+    'course': [('sort_course', Coalesce('course__title', Value('')))],
+    'tutor': [
+        ('sort_tutor', Coalesce('tutor__user__last_name', Value(''))),
+        ('last_name', None),
+    ],
+    'degree': [
+        ('sort_degree', Coalesce('achieved_degree', Value(0))),
+        ('last_name', None),
+    ],
+}
+
+SWITCHES = {'yes': True, 'no': False}
+
+
+def filter_students(students, params):
+    """Applies the filters in the query string
+
+    Returns the filtered queryset and a dictionary of the active filters.
+    """
+    filters = {}
+    if params.get('course', '').isdigit():
+        filters['course'] = params['course']
+        students = students.filter(course_id=int(params['course']))
+    if params.get('tutor') == 'none':
+        filters['tutor'] = 'none'
+        students = students.filter(tutor=None)
+    elif params.get('tutor', '').isdigit():
+        filters['tutor'] = params['tutor']
+        students = students.filter(tutor_id=int(params['tutor']))
+    for field in ['qld', 'tier_4']:
+        if params.get(field) in SWITCHES:
+            filters[field] = params[field]
+            students = students.filter(**{field: SWITCHES[params[field]]})
+    if params.get('since', '').isdigit():
+        filters['since'] = params['since']
+        students = students.filter(since=int(params['since']))
+    return students, filters
+
+
+def encode_cursor(values):
+    encoded = json.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(encoded).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Returns the values in a cursor, or None if it cannot be read"""
+    try:
+        values = json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list):
+        return None
+    if any(isinstance(value, (list, dict)) for value in values):
+        return None
+    return values
+
+
+def beyond(fields, values, descending):
+    """Returns a Q object for the rows after values in the sort order"""
+    lookup = '__lt' if descending else '__gt'
+    condition = Q(**{fields[-1] + lookup: values[-1]})
+    for field, value in reversed(list(zip(fields[:-1], values[:-1]))):
+        condition = (
+            Q(**{field + lookup: value}) |
+            (Q(**{field: value}) & condition)
+        )
+    return condition
+
+
+class StudentPage(object):
+    """One page of a sorted student list
+
+    after and before are cursors from a previous page, at most one of them
+    should be given.
+    """
+
+    def __init__(self, students, sort='name', descending=False,
+                 after=None, before=None, size=PAGE_SIZE):
+        if sort not in SORTS:
+            sort = 'name'
+        self.sort = sort
+        self.descending = descending
+        annotations = {}
+        self.fields = []
+        for name, expression in SORTS[sort]:
+            self.fields.append(name)
+            if expression is not None:
+                annotations[name] = expression
+        self.fields.append('student_id')
+        students = students.annotate(**annotations).select_related(
+            'course', 'tutor__user')
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        backwards = before is not None
+        order = [
+            '-' + field if descending != backwards else field
+            for field in self.fields
+        ]
+        students = students.order_by(*order)
+        cursor = before if backwards else after
+        if cursor is not None and len(cursor) == len(self.fields):
+            students = students.filter(
+                beyond(self.fields, cursor, descending != backwards))
+        else:
+            cursor = None
+        rows = list(students[:size + 1])
+        more = len(rows) > size
+        rows = rows[:size]
+        if backwards:
+            rows.reverse()
+            self.has_previous = more
+            self.has_next = True
+        else:
+            self.has_previous = cursor is not None
+            self.has_next = more
+        self.students = rows
+
+    def cursor(self, student):
+        return encode_cursor(
+            [getattr(student, field) for field in self.fields])
+
+    def next_cursor(self):
+        if self.has_next and self.students:
+            return self.cursor(self.students[-1])
+
+    def previous_cursor(self):
+        if self.has_previous and self.students:
+            return self.cursor(self.students[0])
+
+
+def query_url(path, params, **changes):
+    """Returns path with the query string params, changed by changes
+
+    A change to None removes the parameter.
+    """
+    query = {}
+    for key in params:
+        query[key] = params[key]
+    for key, value in changes.items():
+        if value is None:
+            query.pop(key, None)
+        else:
+            query[key] = value
+    if not query:
+        return path
+    return path + '?' + urlencode(sorted(query.items()))
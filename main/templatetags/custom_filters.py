@@ -46,9 +46,14 @@ def remove_spacebars(words):
     return result
 
 @register.filter
-def get_attendance(performance, week):
-    result = performance.attendance_for(week)
-    return result
+def checked(presence, value):
+    """Checks a radio button if the attendance is the same as its value
+
+    Usage: <input type="radio" value="p"{{ presence|checked:'p' }}>
+    """
+    if presence == value:
+        return ' checked'
+    return ''
 
 @register.filter
 def joinby(value, arg):
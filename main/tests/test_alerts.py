@@ -0,0 +1,93 @@
+from .base import *
+import os
+import tempfile
+from django.core import mail
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+from main.alerts import queue_alerts, send_alerts
+from main.attendance import save_register
+
+
+class AttendanceAlertTest(TeacherUnitTest):
+    """Tests for queueing and sending attendance alerts"""
+
+    def setUp(self):
+        super(AttendanceAlertTest, self).setUp()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.tutor = self.user.staff
+        subject_area = create_subject_area()
+        self.tutor.subject_areas.add(subject_area)
+        course = create_course()
+        course.subject_areas.add(subject_area)
+        pastoral_user = User.objects.create_user(
+            username='eh42',
+            email='elmar.hunt@acme.edu',
+            password='hunt',
+            first_name='Elmar',
+            last_name='Hunt'
+        )
+        pastoral = Staff.objects.create(
+            user=pastoral_user, role='teacher', pastoral_care=True)
+        pastoral.subject_areas.add(subject_area)
+        Student.objects.filter(student_id__in=['bb23', 'dd42']).update(
+            course=course)
+        Student.objects.filter(student_id='bb23').update(tutor=self.tutor)
+        self.performances = dict(
+            (performance.student_id, performance)
+            for performance in Performance.objects.filter(module=self.module)
+        )
+
+    def register(self, student_ids, weeks=None):
+        weeks = weeks or {'5': 'a', '6': 'a'}
+        return dict(
+            (self.performances[student_id].pk, weeks)
+            for student_id in student_ids
+        )
+
+    def test_only_students_who_become_at_risk_are_queued(self):
+        save_register(self.register(['bb23'], weeks={'5': 'a'}))
+        self.assertEqual(AttendanceAlert.objects.count(), 0)
+        save_register(self.register(['bb23'], weeks={'6': 'a'}))
+        alert = AttendanceAlert.objects.get()
+        self.assertEqual(alert.performance, self.performances['bb23'])
+        self.assertEqual(alert.streak, 2)
+        save_register(self.register(['bb23'], weeks={'7': 'a'}))
+        self.assertEqual(AttendanceAlert.objects.count(), 1)
+
+    def test_waiting_alerts_are_not_queued_twice(self):
+        pk = self.performances['bb23'].pk
+        self.assertEqual(queue_alerts({pk: 2}), 1)
+        self.assertEqual(queue_alerts({pk: 3}), 0)
+        self.assertEqual(AttendanceAlert.objects.count(), 1)
+
+    def test_digests_go_to_tutors_and_pastoral_staff(self):
+        save_register(self.register(['bb23', 'dd42', 'pp2323']))
+        self.assertEqual(AttendanceAlert.objects.count(), 3)
+        with self.assertNumQueries(5):
+            emails, alerts = send_alerts()
+        self.assertEqual((emails, alerts), (2, 3))
+        self.assertEqual(len(mail.outbox), 2)
+        messages = dict((message.to[0], message) for message in mail.outbox)
+        tutor = messages['marvin.the.martian@acme.edu'].body
+        self.assertIn('Bugs Bunny (your tutee)', tutor)
+        self.assertNotIn('Daffy', tutor)
+        pastoral = messages['elmar.hunt@acme.edu'].body
+        self.assertIn('Bugs Bunny missed the last 2 sessions', pastoral)
+        self.assertIn('Daffy Duck', pastoral)
+        self.assertNotIn('Porky', pastoral)
+        self.assertEqual(
+            AttendanceAlert.objects.filter(sent=None).count(), 0)
+        self.assertEqual(send_alerts(), (0, 0))
+
+    @override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend')
+    def test_command_sends_the_alerts_to_a_file(self):
+        save_register(self.register(['bb23']))
+        with tempfile.TemporaryDirectory() as path:
+            with self.settings(EMAIL_FILE_PATH=path):
+                out = StringIO()
+                call_command('send_attendance_alerts', stdout=out)
+                self.assertEqual(len(os.listdir(path)), 1)
+        self.assertIn('Sent 2 emails about 1 alerts', out.getvalue())
@@ -0,0 +1,157 @@
+from .base import *
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+from main.attendance import (
+    absence_streak, attendance_summary, cohort_attendance, read_attendance,
+    save_register, write_attendance)
+
+
+class AttendanceStorageTest(TestCase):
+    """Tests for reading and writing whole registers"""
+
+    def setUp(self):
+        set_initial_values()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.performances = list(
+            Performance.objects.filter(module=self.module))
+
+    def test_whole_register_is_read_with_one_query(self):
+        self.performances[0].save_attendance(5, 'p')
+        self.performances[1].save_attendance(6, 'a')
+        with self.assertNumQueries(1):
+            attendance = read_attendance(
+                Performance.objects.filter(module=self.module))
+        self.assertEqual(attendance[self.performances[0].pk], {5: 'p'})
+        self.assertEqual(attendance[self.performances[1].pk], {6: 'a'})
+        self.assertEqual(attendance[self.performances[2].pk], {})
+
+    def test_whole_register_can_be_written(self):
+        register = {}
+        for performance in self.performances:
+            register[performance.pk] = {5: 'p', 6: 'a', 8: 'e'}
+        self.assertEqual(write_attendance(register), 5)
+        for performance in Performance.objects.filter(module=self.module):
+            self.assertEqual(performance.attendance, '----pa-e')
+            self.assertEqual(performance.count_attendance(), '2/3')
+
+    def test_old_attendance_strings_can_be_converted(self):
+        performance = self.performances[0]
+        performance.attendance = '5:p/6:a/12:e'
+        performance.save()
+        out = StringIO()
+        call_command('convert_attendance', stdout=out)
+        self.assertIn('Converted 1', out.getvalue())
+        performance = Performance.objects.get(pk=performance.pk)
+        self.assertEqual(performance.attendance, '----pa-----e')
+
+    def test_invalid_attendance_entries_are_rejected(self):
+        performance = self.performances[0]
+        with self.assertRaises(ValueError):
+            write_attendance({performance.pk: {5: 'p', 6: 'x'}})
+        self.assertEqual(
+            Performance.objects.get(pk=performance.pk).attendance, None)
+
+    def test_unknown_entries_are_left_out_when_converting(self):
+        performance = self.performances[0]
+        performance.attendance = '5:p/6:x/7:a'
+        performance.save()
+        out = StringIO()
+        call_command('convert_attendance', stdout=out)
+        self.assertIn('Left out 1', out.getvalue())
+        performance = Performance.objects.get(pk=performance.pk)
+        self.assertEqual(performance.attendance, '----p-a')
+
+    def test_register_only_writes_changed_cells(self):
+        self.performances[0].save_attendance(5, 'p')
+        self.performances[0].save_attendance(6, 'a')
+        register = {
+            self.performances[0].pk: {'5': 'p', '6': 'e', '7': ''},
+            self.performances[1].pk: {'5': 'a'},
+            self.performances[2].pk: {},
+        }
+        self.assertEqual(save_register(register), 2)
+        attendance = read_attendance(
+            Performance.objects.filter(module=self.module))
+        self.assertEqual(attendance[self.performances[0].pk], {5: 'p', 6: 'e'})
+        self.assertEqual(attendance[self.performances[1].pk], {5: 'a'})
+        self.assertEqual(save_register(register), 0)
+
+    def test_unchanged_register_is_not_written(self):
+        self.performances[0].save_attendance(5, 'p')
+        with CaptureQueriesContext(connection) as queries:
+            changes = save_register({self.performances[0].pk: {'5': 'p'}})
+        self.assertEqual(changes, 0)
+        for query in queries.captured_queries:
+            self.assertNotIn('UPDATE', query['sql'])
+
+
+class CohortAttendanceTest(TeacherUnitTest):
+    """Tests for the attendance of a whole cohort"""
+
+    def setUp(self):
+        super(CohortAttendanceTest, self).setUp()
+        self.subject_area = create_subject_area()
+        course = create_course()
+        course.subject_areas.add(self.subject_area)
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.module.year = 1900
+        self.module.save()
+        for student in stuff[1:]:
+            student.course = course
+            student.save()
+        self.performances = dict(
+            (performance.student_id, performance)
+            for performance in Performance.objects.filter(module=self.module)
+        )
+
+    def test_summary_is_computed_from_the_decoded_attendance(self):
+        summary = attendance_summary(
+            {5: 'p', 6: 'e', 8: 'a', 9: 'a'}, [5, 7, 9])
+        self.assertEqual(summary['weeks'], ['p', '', 'a'])
+        self.assertEqual(summary['present'], 2)
+        self.assertEqual(summary['sessions'], 4)
+        self.assertEqual(summary['percentage'], 50)
+        self.assertEqual(summary['streak'], 2)
+        self.assertTrue(summary['at_risk'])
+        self.assertEqual(absence_streak({5: 'a', 6: 'e'}), 0)
+        self.assertIsNone(attendance_summary({}, [5])['percentage'])
+
+    def test_cohort_is_read_with_one_query_and_cached(self):
+        write_attendance({
+            self.performances['bb23'].pk: {5: 'p', 6: 'a', 7: 'a'},
+            self.performances['dd42'].pk: {5: 'p', 6: 'p'},
+        })
+        # Loading the URLconf the first time needs a query of its own
+        self.module.get_absolute_url()
+        with self.assertNumQueries(1):
+            attendance = cohort_attendance(
+                self.subject_area, 1, 1900, [5, 6, 7])
+        # td2323 has no year of study
+        self.assertEqual(len(attendance), 4)
+        self.assertTrue(attendance['bb23'][0]['at_risk'])
+        self.assertFalse(attendance['dd42'][0]['at_risk'])
+        self.assertEqual(attendance['dd42'][0]['weeks'], ['p', 'p', ''])
+        self.assertEqual(attendance['dd42'][0]['url'], '/module/hp23/1900/')
+        with self.assertNumQueries(0):
+            cohort_attendance(self.subject_area, 1, 1900, [5, 6, 7])
+
+    def test_saved_attendance_invalidates_the_cache(self):
+        cohort_attendance(self.subject_area, 1, 1900, [5])
+        save_register({self.performances['bb23'].pk: {'5': 'a'}})
+        attendance = cohort_attendance(self.subject_area, 1, 1900, [5])
+        self.assertEqual(attendance['bb23'][0]['weeks'], ['a'])
+        self.performances['dd42'].save_attendance(5, 'e')
+        attendance = cohort_attendance(self.subject_area, 1, 1900, [5])
+        self.assertEqual(attendance['dd42'][0]['weeks'], ['e'])
+
+    def test_students_at_risk_get_a_message(self):
+        write_attendance({
+            self.performances['bb23'].pk: {5: 'p', 6: 'a', 7: 'a'}})
+        response = self.client.get('/all_attendances/cartoon-studies/1/')
+        self.assertContains(response, 'class="problem"')
+        self.assertContains(response, 'only attended 1 of 3 sessions')
+        self.assertContains(response, '33%')
@@ -1,6 +1,11 @@
 from .base import *
 from bs4 import BeautifulSoup
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+from main.caching import versioned_key
 from main.views import home
+from main.context_processors import menubar
 
 class TeacherMenubarTest(TeacherUnitTest):
     """Tests if the right models are contained in the teacher's menubar"""
@@ -213,3 +218,71 @@ class AdminMenubarTest(AdminUnitTest):
         self.assertTrue('<a href="/students/9/">' in student_categories)
         self.assertTrue('Inactive Students' in student_categories)
         self.assertTrue('<a href="/students/inactive/">' in student_categories)
+
+
+class MenubarCacheTest(TeacherUnitTest):
+    """Tests if the menubar is cached and rebuilt after changes"""
+
+    def render_menu(self):
+        request = self.factory.get('/')
+        request.user = self.user
+        return menubar(request)
+
+    def test_menubar_is_only_built_once(self):
+        module = create_module()
+        self.user.staff.modules.add(module)
+        self.render_menu()
+        with self.assertNumQueries(0):
+            menu = self.render_menu()
+        self.assertEqual(menu['module_dict']['current'], [module])
+
+    def test_menubar_is_rebuilt_when_a_module_changes(self):
+        module = create_module()
+        self.user.staff.modules.add(module)
+        self.assertEqual(
+            self.render_menu()['module_dict']['current'][0].title,
+            module.title
+        )
+        module.title = 'Advanced Anvil Dropping'
+        module.save()
+        self.assertEqual(
+            self.render_menu()['module_dict']['current'][0].title,
+            'Advanced Anvil Dropping'
+        )
+
+    def test_menubar_is_rebuilt_when_tutees_change(self):
+        student = create_student()
+        self.assertFalse(self.render_menu()['menu_tutees'])
+        student.tutor = self.user.staff
+        student.save()
+        self.assertTrue(self.render_menu()['menu_tutees'])
+
+
+class MenubarCommitTest(TransactionTestCase):
+    """Tests that menus cached during a transaction are not kept"""
+
+    def setUp(self):
+        set_initial_values()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(
+            username="mtm23", password="zapp", first_name="Marvin")
+        Staff.objects.create(user=self.user, role='teacher')
+
+    def render_menu(self):
+        request = self.factory.get('/')
+        request.user = self.user
+        return menubar(request)
+
+    def test_menus_cached_before_the_commit_are_rebuilt(self):
+        module = create_module()
+        self.user.staff.modules.add(module)
+        with transaction.atomic():
+            module.title = 'Advanced Anvil Dropping'
+            module.save()
+            # Another process caches the menu before the commit
+            key = versioned_key('menubar', self.user.staff.pk)
+            cache.set(key, {'module_dict': {'current': []}})
+        self.assertEqual(
+            self.render_menu()['module_dict']['current'][0].title,
+            'Advanced Anvil Dropping'
+        )
@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from main.caching import version
+from main.db_settings import DBSettings, db_settings
+from main.models import Setting
+
+
+class DBSettingsTest(TestCase):
+    """Testing the in-memory cache for the Setting table"""
+
+    def setUp(self):
+        db_settings.invalidate()
+        Setting.objects.create(name="current_year", value="1900")
+        Setting.objects.create(name="uni_name", value="Acme University")
+
+    def test_settings_are_returned_with_the_right_type(self):
+        self.assertEqual(db_settings.current_year, 1900)
+        self.assertEqual(db_settings.uni_name, 'Acme University')
+
+    def test_settings_are_only_loaded_once(self):
+        db_settings.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(db_settings.current_year, 1900)
+            self.assertEqual(db_settings.uni_name, 'Acme University')
+
+    def test_saving_a_setting_updates_the_cache(self):
+        self.assertEqual(db_settings.current_year, 1900)
+        setting = Setting.objects.get(name="current_year")
+        setting.value = "1901"
+        setting.save()
+        self.assertEqual(db_settings.current_year, 1901)
+
+    def test_deleting_a_setting_updates_the_cache(self):
+        self.assertEqual(db_settings.uni_name, 'Acme University')
+        Setting.objects.get(name="uni_name").delete()
+        with self.assertRaises(Setting.DoesNotExist):
+            db_settings.uni_name
+
+    def test_missing_setting_returns_default(self):
+        self.assertEqual(
+            db_settings.get('admin_name', 'Chuck Jones'), 'Chuck Jones')
+        with self.assertRaises(Setting.DoesNotExist):
+            db_settings.admin_name
+
+
+class SettingsInvalidationTest(TransactionTestCase):
+    """Testing that other processes cannot keep uncommitted settings"""
+
+    def test_settings_are_invalidated_again_on_commit(self):
+        Setting.objects.create(name="current_year", value="1900")
+        other_process = DBSettings()
+        with transaction.atomic():
+            setting = Setting.objects.get(name="current_year")
+            setting.value = "1901"
+            setting.save()
+            # Another process reads before the commit
+            other_process.all()
+            stamp = version('db_settings')
+        self.assertNotEqual(version('db_settings'), stamp)
+        self.assertEqual(other_process.current_year, 1901)
@@ -0,0 +1,145 @@
+import csv
+import json
+from django.core.urlresolvers import reverse
+from .base import *
+from main import exports
+from main.attendance import write_attendance
+from main.marks import enter_marks
+
+
+def streamed_csv(response):
+    content = b''.join(response.streaming_content).decode('utf-8')
+    return list(csv.reader(content.splitlines()))
+
+
+def streamed_json(response):
+    content = b''.join(response.streaming_content).decode('utf-8')
+    return [json.loads(line) for line in content.splitlines()]
+
+
+class StreamingExportTest(AdminUnitTest):
+    """Testing the CSV and NDJSON versions of the reports"""
+
+    def setUp(self):
+        super(StreamingExportTest, self).setUp()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.module.eligible = '1'
+        self.module.save()
+        self.subject_area = create_subject_area()
+        self.module.subject_areas.add(self.subject_area)
+        course = create_course()
+        course.subject_areas.add(self.subject_area)
+        Student.objects.update(course=course)
+        essay = Assessment.objects.create(
+            module=self.module, title="Essay", value=40)
+        exam = Assessment.objects.create(
+            module=self.module, title="Exam", value=60)
+        enter_marks(essay, {'bb23': 60, 'dd42': 35})
+        enter_marks(exam, {'bb23': 51})
+        student = Student.objects.get(student_id='pp2323')
+        student.active = False
+        student.save()
+
+    def test_module_marks_are_streamed_as_csv(self):
+        url = reverse('export_marks_for_module', args=['hp23', '2014'])
+        response = self.client.get(url + '?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('Hunting_Practice_Marks_2014.csv',
+                      response['Content-Disposition'])
+        rows = streamed_csv(response)
+        self.assertEqual(
+            rows[0],
+            ['Name', 'ID', 'Course', 'Essay (40%)', 'Exam (60%)', 'Average']
+        )
+        rows_by_id = {}
+        for row in rows[1:]:
+            rows_by_id[row[1]] = row
+        self.assertNotIn('pp2323', rows_by_id)
+        self.assertEqual(
+            rows_by_id['bb23'], ['Bugs Bunny', 'bb23', 'CS', '60', '51', '55'])
+        self.assertEqual(rows_by_id['dd42'][3:], ['35', '0', '14'])
+
+    def test_module_marks_are_streamed_as_ndjson(self):
+        url = reverse('export_marks_for_module', args=['hp23', '2014'])
+        response = self.client.get(url + '?format=json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = streamed_json(response)
+        self.assertEqual(len(rows), 4)
+        bugs = [row for row in rows if row['ID'] == 'bb23'][0]
+        self.assertEqual(bugs['Essay (40%)'], 60)
+        self.assertEqual(bugs['Average'], 55)
+
+    def test_module_marks_are_sorted_by_name(self):
+        student = Student.objects.create(
+            student_id='zz99', first_name='Aaron', last_name='Aardvark')
+        Performance.objects.create(student=student, module=self.module)
+        header, rows = exports.module_marks(self.module)
+        students = Student.objects.filter(
+            performances__module=self.module, active=True
+        ).order_by('last_name', 'first_name')
+        self.assertEqual(
+            [row[0] for row in rows],
+            [student.name() for student in students]
+        )
+        self.assertEqual(students[0], student)
+
+    def test_all_marks_have_one_row_per_mark(self):
+        url = reverse(
+            'export_all_marks', args=[self.subject_area.slug, '2014', '1'])
+        response = self.client.get(url + '?format=csv')
+        rows = streamed_csv(response)
+        self.assertEqual(rows[0][-2:], ['Assessment', 'Mark'])
+        bugs = [row[-2:] for row in rows[1:] if row[3] == 'bb23']
+        self.assertEqual(
+            bugs,
+            [['Essay (40%)', '60'], ['Exam (60%)', '51'], ['Average', '55']]
+        )
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_attendance_sheet_is_streamed(self):
+        performance = Performance.objects.get(
+            module=self.module, student__student_id='bb23')
+        write_attendance({performance.pk: {1: 'p', 2: 'a', 3: 'e'}})
+        url = reverse('export_attendance_sheet', args=['hp23', '2014'])
+        response = self.client.get(url + '?format=csv')
+        rows = streamed_csv(response)
+        self.assertEqual(
+            rows[0][:6], ['Name', 'ID', 'Seminar Group', '1', '2', '3'])
+        self.assertNotIn('7', rows[0])
+        bugs = [row for row in rows if row[1] == 'bb23'][0]
+        self.assertEqual(bugs[3:7], ['p', 'a', 'e', ''])
+
+    def test_tier_4_attendance_is_streamed(self):
+        student = Student.objects.get(student_id='bb23')
+        student.tier_4 = True
+        student.save()
+        performance = Performance.objects.get(
+            module=self.module, student=student)
+        write_attendance({performance.pk: {1: 'p', 2: 'a'}})
+        url = reverse(
+            'export_tier_4_attendance', args=[self.subject_area.slug, '2014'])
+        rows = streamed_json(self.client.get(url + '?format=json'))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1]['Module'], 'Hunting Practice')
+        self.assertEqual(rows[1]['Week starting'], '2014-09-08')
+        self.assertEqual(rows[1]['Attendance'], 'a')
+
+    def test_rows_are_read_in_chunks(self):
+        performances = Performance.objects.filter(module=self.module)
+        chunks = list(exports.chunked(performances, 2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(
+            [performance.pk for chunk in chunks for performance in chunk],
+            [performance.pk for performance in performances]
+        )
+
+    def test_chunks_keep_the_order_of_the_queryset(self):
+        performances = Performance.objects.filter(
+            module=self.module).order_by('-student__student_id')
+        chunks = list(exports.chunked(performances, 2))
+        self.assertEqual(
+            [performance.student.student_id
+                for chunk in chunks for performance in chunk],
+            sorted(['bb23', 'dd42', 'pp2323', 'plp42', 'td2323'], reverse=True)
+        )
@@ -0,0 +1,178 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .base import *
+from main import importer, staging
+from main.caching import mark_grid_version, version
+
+
+def upload(content, name='students.csv'):
+    return SimpleUploadedFile(name, content.encode('utf-8'))
+
+
+class StudentImportTest(AdminUnitTest):
+    """Testing the import of students from CSV files"""
+
+    def test_semicolons_are_recognised(self):
+        rows = list(importer.read_csv(upload(
+            'ID;Last Name;First Name\r\nbb42;Bunny;Bugs\r\n;;\r\n')))
+        self.assertEqual(
+            rows, [['ID', 'Last Name', 'First Name'], ['bb42', 'Bunny', 'Bugs']])
+
+    def test_commas_and_quoted_entries_are_recognised(self):
+        content = (
+            '﻿ID,Name,Address\n'
+            'bb42,Bunny,"1 Rabbit Hole, Burrow"\n'
+            'dd23,Duck,"2 Pond Street\nDuckburg"\n'
+        )
+        rows = list(importer.read_csv(upload(content)))
+        self.assertEqual(rows[0], ['ID', 'Name', 'Address'])
+        self.assertEqual(rows[1][2], '1 Rabbit Hole, Burrow')
+        self.assertEqual(rows[2][2], '2 Pond Street\nDuckburg')
+
+    def test_upload_stages_the_rows(self):
+        response = self.client.post(
+            reverse('upload_csv'),
+            {'csvfile': upload('bb42;Bunny;Bugs\ndd23;Duck;Daffy\n')}
+        )
+        data = Data.objects.get()
+        self.assertRedirects(
+            response, reverse('parse_csv', args=[data.id]),
+            fetch_redirect_response=False)
+        self.assertEqual(
+            importer.staged_rows(data.id),
+            [['bb42', 'Bunny', 'Bugs'], ['dd23', 'Duck', 'Daffy']]
+        )
+
+    def test_entries_are_turned_into_field_values(self):
+        values = importer.student_values({
+            'student_id': 'bb42',
+            'year': 'Year 2 (full time)',
+            'since': '2013',
+            'cell_number': '7712345',
+            'phone_number': '+4412345',
+            'exam_id': '',
+            'address1': '1 Rabbit Hole',
+            'address2': 'Burrow'
+        })
+        self.assertEqual(values['year'], 2)
+        self.assertEqual(values['since'], 2013)
+        self.assertEqual(values['cell_number'], '07712345')
+        self.assertEqual(values['phone_number'], '+4412345')
+        self.assertIsNone(values['exam_id'])
+        self.assertEqual(values['address'], '1 Rabbit Hole\nBurrow\n')
+
+    def test_diff_shows_new_changed_and_unchanged_students(self):
+        Student.objects.create(
+            student_id='bb42', last_name='Bunny', first_name='Bugs')
+        Student.objects.create(
+            student_id='dd23', last_name='Duck', first_name='Daffy')
+        rows = [
+            ['ID', 'Last Name', 'First Name', 'Since'],
+            ['bb42', 'Bunny', 'Bugs', ''],
+            ['dd23', 'Duck', 'Donald', ''],
+            ['pp42', 'Pig', 'Porky', '2014'],
+            ['', 'No', 'ID', ''],
+            ['ef1', 'Fudd', 'Elmar', 'soon'],
+        ]
+        columns = ['student_id', 'last_name', 'first_name', 'since']
+        by_student, errors = importer.import_values(rows, columns, {1})
+        diff = importer.ImportDiff(by_student, errors)
+        self.assertEqual(
+            [student_id for student_id, values in diff.new], ['pp42'])
+        self.assertEqual(
+            diff.changed, [('dd23', {'first_name': ('Daffy', 'Donald')})])
+        self.assertEqual(diff.unchanged, ['bb42'])
+        self.assertEqual([number for number, error in diff.errors], [5, 6])
+
+    def test_preview_does_not_change_anything(self):
+        Student.objects.create(
+            student_id='bb42', last_name='Bunny', first_name='Bugs')
+        data_id = importer.stage_csv(
+            upload('bb42;Bunny;Bugsy\npp42;Pig;Porky\n'))
+        response = self.client.post(
+            reverse('parse_csv', args=[data_id]),
+            {
+                'column1': 'student_id',
+                'column2': 'last_name',
+                'column3': 'first_name',
+                'preview': 'Preview Changes'
+            }
+        )
+        self.assertTemplateUsed(response, 'import_preview.html')
+        self.assertEqual(len(response.context['diff'].new), 1)
+        self.assertEqual(len(response.context['diff'].changed), 1)
+        self.assertIn(('column2', 'last_name'), response.context['choices'])
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertEqual(Student.objects.get().first_name, 'Bugs')
+
+    def test_import_creates_and_updates_students_in_bulk(self):
+        Student.objects.create(
+            student_id='bb42', last_name='Bunny', first_name='Bugs')
+        lines = ['bb42;Bunny;Bugsy']
+        for number in range(50):
+            lines.append('s%s;Student;Number %s' % (number, number))
+        data_id = importer.stage_csv(upload('\n'.join(lines)))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('parse_csv', args=[data_id]),
+                {
+                    'column1': 'student_id',
+                    'column2': 'last_name',
+                    'column3': 'first_name',
+                }
+            )
+        writes = [
+            query['sql'].split(' ')[0] for query in queries
+            if query['sql'].startswith(('INSERT INTO "main_student"',
+                                        'UPDATE "main_student"'))
+        ]
+        self.assertEqual(writes, ['INSERT', 'UPDATE'])
+        self.assertTrue(SearchTerm.objects.filter(term='s49').exists())
+        self.assertEqual(Student.objects.count(), 51)
+        self.assertEqual(
+            Student.objects.get(student_id='bb42').first_name, 'Bugsy')
+        imported = Data.objects.get(id__startswith='imported_')
+        self.assertRedirects(
+            response, reverse('year_view', args=[imported.id]),
+            fetch_redirect_response=False)
+        self.assertEqual(len(imported.value.split(',')), 51)
+
+    def test_import_invalidates_the_menubar_and_the_mark_grids(self):
+        stuff = set_up_stuff()
+        module = stuff[0]
+        menubar = version('menubar')
+        grid = version(mark_grid_version(module.pk))
+        data_id = importer.stage_csv(upload('bb23;Bunny;Bugsy'))
+        self.client.post(
+            reverse('parse_csv', args=[data_id]),
+            {
+                'column1': 'student_id',
+                'column2': 'last_name',
+                'column3': 'first_name',
+            }
+        )
+        self.assertNotEqual(version('menubar'), menubar)
+        self.assertNotEqual(version(mark_grid_version(module.pk)), grid)
+
+    def test_rows_left_out_of_an_import_are_reported(self):
+        data_id = importer.stage_csv(upload('bb42;Bunny\n;Nobody\ndd42;Duck'))
+        response = self.client.post(
+            reverse('parse_csv', args=[data_id]),
+            {'column1': 'student_id', 'column2': 'last_name'},
+            follow=True
+        )
+        self.assertEqual(Student.objects.count(), 2)
+        self.assertContains(
+            response, '1 row could not be imported (row 2: No student ID).')
+
+    def test_expired_imports_send_the_user_back_to_the_upload(self):
+        data_id = staging.store('[["bb23"]]', lifetime=-1)
+        response = self.client.get(reverse('parse_csv', args=[data_id]))
+        self.assertRedirects(
+            response, reverse('upload_csv'), fetch_redirect_response=False)
+        imported = staging.store('bb23', prefix='imported_', lifetime=-1)
+        response = self.client.get(reverse('year_view', args=[imported]))
+        self.assertRedirects(
+            response, reverse('upload_csv'), fetch_redirect_response=False)
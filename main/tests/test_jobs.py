@@ -0,0 +1,154 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import override_settings
+from django.utils import timezone
+from io import StringIO
+from .base import *
+from main.jobs import (
+    claim_job, purge_export_jobs, queue_export, result_path, run_job, work)
+
+
+class ExportJobTest(TeacherUnitTest):
+    """Testing the background exports"""
+
+    def setUp(self):
+        super(ExportJobTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            EXPORT_ROOT=self.directory)
+        self.settings_override.enable()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.module.eligible = '1'
+        self.module.save()
+        self.subject_area = create_subject_area()
+        self.module.subject_areas.add(self.subject_area)
+        course = create_course()
+        course.subject_areas.add(self.subject_area)
+        Student.objects.update(course=course)
+        self.url = reverse(
+            'export_exam_board_overview',
+            args=[self.subject_area.slug, '2014', '1']
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory)
+
+    def test_export_view_queues_a_job_and_redirects(self):
+        response = self.client.get(self.url)
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, job.get_absolute_url())
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.task, 'exam_board_overview')
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(
+            job.filename,
+            'Exam_Board_Module_Overview_Year_2014/15_Level_4.pdf'
+        )
+        self.assertFalse(os.listdir(self.directory))
+
+    def test_worker_renders_the_queued_job(self):
+        self.client.get(self.url)
+        self.assertEqual(work(once=True), 1)
+        job = ExportJob.objects.get()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.progress, 100)
+        self.assertTrue(job.expires > timezone.now())
+        with open(result_path(job), 'rb') as result:
+            self.assertTrue(result.read().startswith(b'%PDF'))
+
+    def test_finished_export_can_be_downloaded(self):
+        self.client.get(self.url)
+        work(once=True)
+        job = ExportJob.objects.get()
+        response = self.client.get(job.get_absolute_url())
+        self.assertContains(response, job.get_download_url())
+        response = self.client.get(job.get_download_url())
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(
+            b'%PDF'))
+
+    def test_status_can_be_polled(self):
+        self.client.get(self.url)
+        job = ExportJob.objects.get()
+        response = self.client.get(job.get_absolute_url() + '?format=json')
+        self.assertEqual(response.json(), {'status': 'queued', 'progress': 0})
+
+    def test_unfinished_export_cannot_be_downloaded(self):
+        self.client.get(self.url)
+        job = ExportJob.objects.get()
+        response = self.client.get(job.get_download_url())
+        self.assertRedirects(response, job.get_absolute_url())
+
+    def test_other_users_cannot_see_the_job(self):
+        other = create_teacher()
+        job = queue_export(
+            other.user, 'all_marks', 'marks.pdf',
+            self.subject_area.slug, 2014, 1)
+        response = self.client.get(job.get_absolute_url())
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(job.get_download_url())
+        self.assertEqual(response.status_code, 404)
+
+    def test_a_job_is_only_claimed_once(self):
+        job = queue_export(
+            self.user, 'all_marks', 'marks.pdf',
+            self.subject_area.slug, 2014, 1)
+        self.assertEqual(claim_job().pk, job.pk)
+        self.assertEqual(claim_job(), None)
+
+    def test_failing_job_is_recorded(self):
+        queue_export(self.user, 'all_marks', 'marks.pdf', 'nothing', 2014, 1)
+        job = run_job(claim_job())
+        job = ExportJob.objects.get(pk=job.pk)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('DoesNotExist', job.error)
+        self.assertFalse(os.listdir(self.directory))
+
+    def test_expired_jobs_are_deleted_with_their_files(self):
+        self.client.get(self.url)
+        work(once=True)
+        job = ExportJob.objects.get()
+        path = result_path(job)
+        later = job.expires + timedelta(seconds=1)
+        self.assertEqual(purge_export_jobs(later), 1)
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+        response = self.client.get(job.get_absolute_url())
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(job.get_download_url())
+        self.assertEqual(response.status_code, 404)
+
+    def test_stale_running_jobs_fail(self):
+        job = queue_export(
+            self.user, 'all_marks', 'marks.pdf',
+            self.subject_area.slug, 2014, 1)
+        claim_job()
+        purge_export_jobs(timezone.now() + timedelta(days=1))
+        self.assertEqual(ExportJob.objects.get(pk=job.pk).status, 'failed')
+
+    def test_all_marksheets_are_exported_in_the_background(self):
+        assessment = Assessment.objects.create(
+            module=self.module, title="Essay", value=100)
+        url = reverse(
+            'export_feedback',
+            args=['hp23', '2014', assessment.slug, 'all', 'first']
+        )
+        response = self.client.get(url)
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, job.get_absolute_url())
+        self.assertEqual(job.task, 'all_marksheets')
+        run_job(claim_job())
+        self.assertEqual(ExportJob.objects.get().status, 'done')
+
+    def test_management_command_processes_the_queue(self):
+        self.client.get(self.url)
+        output = StringIO()
+        call_command('process_export_jobs', once=True, stdout=output)
+        self.assertEqual(output.getvalue().strip(), 'Processed 1 export jobs')
+        self.assertEqual(ExportJob.objects.get().status, 'done')
@@ -0,0 +1,109 @@
+from .base import *
+from feedback.models import IndividualFeedback
+from main.mark_grid import build_mark_grid, module_mark_grid
+
+
+class MarkGridTest(TestCase):
+    """Tests for the mark grid on the module page"""
+
+    def setUp(self):
+        set_initial_values()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.students = stuff[1:]
+        self.essay = Assessment.objects.create(
+            module=self.module,
+            title="Essay",
+            value=40,
+            marksheet_type="ESSAY",
+            resit_marksheet_type="ESSAY"
+        )
+        self.exam = Assessment.objects.create(
+            module=self.module,
+            title="Exam",
+            value=60
+        )
+        self.module.foundational = True
+        self.module.save()
+        student = self.students[1]
+        student.qld = True
+        student.save()
+        marks = [(60, 38), (45, 38), (20, 30), (None, None), (80, 70)]
+        for student, (essay, exam) in zip(self.students, marks):
+            performance = Performance.objects.get(
+                student=student, module=self.module)
+            if essay is not None:
+                performance.set_assessment_result('essay', essay)
+                performance.set_assessment_result('exam', exam)
+        result = Performance.objects.get(
+            student=self.students[0], module=self.module
+        ).assessment_results.get(assessment=self.essay)
+        IndividualFeedback.objects.create(
+            assessment_result=result, attempt='first', completed=True)
+
+    def row_for(self, grid, student):
+        for row in grid['rows']:
+            if row['student_id'] == student.student_id:
+                return row
+
+    def test_grid_matches_the_performance_methods(self):
+        grid = build_mark_grid(self.module)
+        self.assertEqual(len(grid['rows']), 5)
+        for row in grid['rows']:
+            performance = Performance.objects.get(
+                student=row['student_id'], module=self.module)
+            self.assertEqual(
+                row['results'],
+                performance.all_assessment_results_with_feedback()
+            )
+            self.assertEqual(row['module_mark'], performance.capped_mark())
+            self.assertEqual(
+                row['resits'],
+                set(performance.results_eligible_for_resit().values())
+            )
+        self.assertTrue(grid['resit_required'])
+        self.assertTrue(grid['qld_resit_required'])
+
+    def test_number_of_queries_does_not_depend_on_students(self):
+        with self.assertNumQueries(5):
+            build_mark_grid(self.module)
+        for number in range(10):
+            student = Student.objects.create(
+                first_name="Student",
+                last_name=str(number),
+                student_id="s" + str(number)
+            )
+            performance = Performance.objects.create(
+                student=student, module=self.module)
+            performance.set_assessment_result('essay', 50)
+        with self.assertNumQueries(5):
+            build_mark_grid(self.module)
+
+    def test_grid_is_cached_until_a_mark_changes(self):
+        module_mark_grid(self.module)
+        with self.assertNumQueries(0):
+            module_mark_grid(self.module)
+        performance = Performance.objects.get(
+            student=self.students[4], module=self.module)
+        performance.set_assessment_result('essay', 75)
+        row = self.row_for(module_mark_grid(self.module), self.students[4])
+        self.assertEqual(row['results'][0]['first'][0], 75)
+
+    def test_grid_is_rebuilt_when_feedback_is_completed(self):
+        performance = Performance.objects.get(
+            student=self.students[1], module=self.module)
+        result = performance.assessment_results.get(assessment=self.essay)
+        module_mark_grid(self.module)
+        IndividualFeedback.objects.create(
+            assessment_result=result, attempt='first', completed=True)
+        grid = module_mark_grid(self.module)
+        row = self.row_for(grid, self.students[1])
+        self.assertIsNotNone(row['results'][0]['first'][2])
+
+    def test_grid_is_rebuilt_when_a_result_is_deleted(self):
+        performance = Performance.objects.get(
+            student=self.students[4], module=self.module)
+        module_mark_grid(self.module)
+        performance.assessment_results.get(assessment=self.exam).delete()
+        row = self.row_for(module_mark_grid(self.module), self.students[4])
+        self.assertIsNone(row['results'][1]['first'][0])
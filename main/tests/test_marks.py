@@ -0,0 +1,177 @@
+from .base import *
+from main.marks import (
+    enter_marks, marks_from_post, recalculate_module_averages)
+
+
+class EnterMarksTest(TestCase):
+    """Tests for entering the marks of a whole module at once"""
+
+    def setUp(self):
+        set_initial_values()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.students = stuff[1:]
+        self.essay = Assessment.objects.create(
+            module=self.module, title="Essay", value=40)
+        self.exam = Assessment.objects.create(
+            module=self.module, title="Exam", value=60)
+
+    def test_marks_are_saved_and_averages_calculated(self):
+        enter_marks(self.essay, {'bb23': 60, 'dd42': 35})
+        changes = enter_marks(self.exam, {'bb23': 51, 'dd42': 45})
+        self.assertEqual(changes, 2)
+        performance = Performance.objects.get(
+            student=self.students[0], module=self.module)
+        self.assertEqual(performance.get_assessment_result('essay'), 60)
+        self.assertEqual(performance.get_assessment_result('exam'), 51)
+        self.assertEqual(performance.average, 55)
+        self.assertEqual(performance.real_average, 54.6)
+        performance.calculate_average()
+        self.assertEqual(performance.average, 55)
+        self.assertEqual(performance.real_average, 54.6)
+        performance = Performance.objects.get(
+            student=self.students[1], module=self.module)
+        self.assertEqual(performance.average, 41)
+
+    def test_resit_marks_count_for_the_average(self):
+        enter_marks(self.essay, {'bb23': 20})
+        enter_marks(self.exam, {'bb23': 30})
+        enter_marks(self.essay, {'bb23': 50}, 'resit')
+        performance = Performance.objects.get(
+            student=self.students[0], module=self.module)
+        self.assertEqual(
+            performance.get_assessment_result('essay', 'first'), 20)
+        self.assertEqual(
+            performance.get_assessment_result('essay', 'resit'), 50)
+        self.assertEqual(performance.average, 38)
+
+    def test_unchanged_marks_are_not_counted(self):
+        enter_marks(self.essay, {'bb23': 60, 'dd42': 35})
+        self.assertEqual(enter_marks(self.essay, {'bb23': 60, 'dd42': 36}), 1)
+
+    def test_inactive_and_unknown_students_are_ignored(self):
+        student = self.students[0]
+        student.active = False
+        student.save()
+        changes = enter_marks(self.essay, {'bb23': 60, 'xx99': 50})
+        self.assertEqual(changes, 0)
+        self.assertFalse(AssessmentResult.objects.exists())
+
+    def test_marks_can_be_entered_anonymously(self):
+        student = self.students[0]
+        student.exam_id = '1234'
+        student.save()
+        enter_marks(self.exam, {'1234': 70}, anonymous=True)
+        performance = Performance.objects.get(
+            student=student, module=self.module)
+        self.assertEqual(performance.get_assessment_result('exam'), 70)
+
+    def test_number_of_queries_does_not_depend_on_students(self):
+        marks = {}
+        for student in self.students:
+            marks[student.student_id] = 50
+        enter_marks(self.essay, marks)
+        for student in self.students:
+            marks[student.student_id] = 60
+        with self.assertNumQueries(7):
+            enter_marks(self.essay, marks)
+
+    def test_first_marks_are_created_with_a_constant_number_of_queries(self):
+        marks = dict((student.student_id, 50) for student in self.students)
+        with self.assertNumQueries(10):
+            self.assertEqual(enter_marks(self.essay, marks), 5)
+        for number in range(10):
+            student = Student.objects.create(
+                first_name="Student",
+                last_name=str(number),
+                student_id="s" + str(number)
+            )
+            Performance.objects.create(student=student, module=self.module)
+            marks[student.student_id] = 40
+        with self.assertNumQueries(10):
+            self.assertEqual(enter_marks(self.exam, marks), 15)
+        self.assertEqual(AssessmentResult.objects.count(), 20)
+        for student_id, mark in marks.items():
+            performance = Performance.objects.get(
+                student=student_id, module=self.module)
+            self.assertEqual(
+                performance.get_assessment_result('exam'), mark)
+            self.assertEqual(performance.average, 50 if mark == 50 else 24)
+
+    def test_marks_are_read_from_the_form(self):
+        post = {
+            'mark_bb23': '60',
+            'mark_dd42': '',
+            'mark_pp2323': 'abc',
+            'mark_plp42': '100',
+            'save': 'Save'
+        }
+        self.assertEqual(marks_from_post(post), {'bb23': 60})
+
+
+class AverageTest(TestCase):
+    """Tests for the incremental and the module wide average calculation"""
+
+    def setUp(self):
+        set_initial_values()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.essay = Assessment.objects.create(
+            module=self.module, title="Essay", value=40)
+        self.exam = Assessment.objects.create(
+            module=self.module, title="Exam", value=60)
+        # (essay, essay resit, essay second resit, exam, exam resit)
+        marks = [
+            (60, None, None, 51, None),
+            (20, 45, None, 30, 0),
+            (None, 30, 50, 38, 55),
+            (35, 0, 70, None, None),
+            (None, None, None, None, None),
+        ]
+        self.performances = list(
+            Performance.objects.filter(module=self.module))
+        for performance, row in zip(self.performances, marks):
+            essay = AssessmentResult.objects.create(
+                assessment=self.essay,
+                mark=row[0],
+                resit_mark=row[1],
+                second_resit_mark=row[2]
+            )
+            exam = AssessmentResult.objects.create(
+                assessment=self.exam, mark=row[3], resit_mark=row[4])
+            performance.assessment_results.add(essay, exam)
+
+    def test_module_averages_match_the_performance_method(self):
+        averages = recalculate_module_averages(self.module)
+        for performance in self.performances:
+            stored = Performance.objects.get(pk=performance.pk)
+            performance.calculate_average()
+            self.assertEqual(averages[performance.pk], performance.average)
+            self.assertEqual(stored.average, performance.average)
+            self.assertEqual(stored.real_average, performance.real_average)
+
+    def test_module_averages_need_a_constant_number_of_queries(self):
+        with self.assertNumQueries(5):
+            recalculate_module_averages(self.module)
+
+    def test_changed_weights_are_picked_up(self):
+        recalculate_module_averages(self.module)
+        self.essay.value = 60
+        self.essay.save()
+        self.exam.value = 40
+        self.exam.save()
+        recalculate_module_averages(self.module)
+        performance = Performance.objects.get(pk=self.performances[0].pk)
+        self.assertEqual(performance.real_average, 56.4)
+
+    def test_single_marks_update_the_average_incrementally(self):
+        recalculate_module_averages(self.module)
+        performance = Performance.objects.get(pk=self.performances[0].pk)
+        self.assertEqual(performance.real_average, 54.6)
+        performance.set_assessment_result('exam', 71)
+        self.assertEqual(performance.real_average, 66.6)
+        self.assertEqual(performance.average, 67)
+        performance.set_assessment_result('essay', 48, 'resit')
+        self.assertEqual(performance.real_average, 66.6)
+        performance.calculate_average()
+        self.assertEqual(performance.real_average, 66.6)
@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from django.test import TestCase
 from django.utils import timezone
 from .base import *
+from main.marks import enter_marks
 from main.unisettings import PASSMARK
 
 
@@ -113,6 +114,36 @@ class StudentTest(TeacherUnitTest):
         self.assertEqual(Student.objects.count(), 0)
         self.assertEqual(Performance.objects.count(), 0)
 
+    def test_cohort_joins_the_subject_areas_of_the_course(self):
+        subject_area = create_subject_area()
+        other_subject_area = SubjectArea.objects.create(name='Hunting')
+        course = create_course()
+        course.subject_areas.add(subject_area, other_subject_area)
+        other_course = Course.objects.create(title='BA in Hunting')
+        other_course.subject_areas.add(other_subject_area)
+        Student.objects.create(
+            student_id='bb23', last_name='Bunny', year=1, course=course)
+        Student.objects.create(
+            student_id='dd42', last_name='Duck', year=2, course=course)
+        Student.objects.create(
+            student_id='ef12', last_name='Fudd', year=1, course=other_course)
+        Student.objects.create(
+            student_id='pp23', last_name='Pig', year=1, course=course,
+            active=False)
+        Student.objects.create(student_id='td23', last_name='Devil', year=1)
+        with self.assertNumQueries(1):
+            cohort = [
+                (student.student_id, student.course.title)
+                for student in Student.objects.cohort(subject_area, 1)
+            ]
+        self.assertEqual(cohort, [('bb23', 'BA in Cartoon Studies')])
+        self.assertEqual(
+            set(Student.objects.cohort(
+                'cartoon-studies', active=None).values_list(
+                    'student_id', flat=True)),
+            set(['bb23', 'dd42', 'pp23'])
+        )
+
 
 class StaffTest(AdminUnitTest):
     """Tests for the Staff class"""
@@ -608,6 +639,46 @@ class PerformanceTest(TeacherUnitTest):
         )
         self.assertTrue(performance.missed_the_last_two_sessions())
 
+    def test_attendance_is_stored_with_one_character_per_week(self):
+        module = create_module()
+        student = create_student()
+        performance = Performance.objects.create(
+            module=module,
+            student=student
+        )
+        performance.save_attendance(2, 'p')
+        performance.save_attendance(5, 'a')
+        performance.save_attendance(4, 'e')
+        self.assertEqual(performance.attendance, '-p-ea')
+        performance.save_attendance(52, 'p')
+        self.assertEqual(len(performance.attendance), 52)
+
+    def test_attendance_for_weeks_outside_the_string_is_none(self):
+        module = create_module()
+        student = create_student()
+        performance = Performance.objects.create(
+            module=module,
+            student=student,
+            attendance='-p'
+        )
+        self.assertEqual(performance.attendance_for(1), None)
+        self.assertEqual(performance.attendance_for(2), 'p')
+        self.assertEqual(performance.attendance_for(3), None)
+        self.assertEqual(performance.attendance_for(0), None)
+
+    def test_attendance_in_the_old_format_can_still_be_read(self):
+        module = create_module()
+        student = create_student()
+        performance = Performance.objects.create(
+            module=module,
+            student=student,
+            attendance='10:a/2:p/3:e'
+        )
+        self.assertEqual(performance.attendance_for(10), 'a')
+        self.assertEqual(performance.attendance_as_list(), ['p', 'e', 'a'])
+        performance.save_attendance(4, 'a')
+        self.assertEqual(performance.attendance, '-pea-----a')
+
     def test_marks_can_be_set_over_performance_functions(self):
         module = Module.objects.create(code="ML3", year=2014, title="ML")
         module.teachers.add(self.user.staff)
@@ -2089,3 +2160,81 @@ class ConsistencyTest(TeacherUnitTest):
         for assessment in all_assessments:
             self.assertEqual(assessment[0], all_results[counter][0])
             counter += 1
+
+
+class ResitEligibilityTest(TeacherUnitTest):
+    """Tests for the cached resit eligibility of a module"""
+
+    def setUp(self):
+        super(ResitEligibilityTest, self).setUp()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.student = stuff[1]
+        self.essay = Assessment.objects.create(
+            module=self.module, title="Essay", value=50)
+        self.exam = Assessment.objects.create(
+            module=self.module, title="Exam", value=50)
+        self.performance = Performance.objects.get(
+            student=self.student, module=self.module)
+        self.performance.set_assessment_result('essay', 30)
+        self.performance.set_assessment_result('exam', 45)
+
+    def test_failed_results_are_eligible_for_resits(self):
+        eligible = self.performance.results_eligible_for_resit()
+        self.assertEqual(len(eligible), 1)
+        result = list(eligible)[0]
+        self.assertEqual(result.assessment, self.essay)
+        self.assertEqual(eligible[result], 'r')
+        self.assertTrue(result.eligible_for_resit())
+        self.assertEqual(
+            self.module.performances_with_resit(self.essay),
+            [self.performance]
+        )
+        self.assertEqual(self.module.performances_with_resit(self.exam), [])
+
+    def test_eligibility_is_cached_for_the_whole_module(self):
+        self.module.resit_eligibility()
+        with self.assertNumQueries(0):
+            self.module.resit_eligibility()
+
+    def test_eligibility_changes_with_marks(self):
+        self.assertTrue(self.module.resit_eligibility())
+        self.performance.set_assessment_result('essay', 40)
+        self.assertEqual(self.module.resit_eligibility(), {})
+        enter_marks(self.essay, {self.student.student_id: 20})
+        self.assertTrue(self.module.resit_eligibility())
+
+    def test_eligibility_changes_with_qld_status_and_foundational_flag(self):
+        self.performance.set_assessment_result('essay', 60)
+        self.performance.set_assessment_result('exam', 35)
+        self.student.qld = False
+        self.student.save()
+        self.assertEqual(self.module.resit_eligibility(), {})
+        self.module.foundational = True
+        self.module.save()
+        self.assertEqual(self.module.resit_eligibility(), {})
+        self.student.qld = True
+        self.student.save()
+        result = self.performance.assessment_results.get(
+            assessment=self.exam)
+        self.assertEqual(
+            self.module.resit_eligibility(),
+            {self.performance.pk: {result.pk: ('q', self.exam.pk)}}
+        )
+        self.assertTrue(result.eligible_for_qld_resit())
+
+    def test_only_relevant_student_changes_invalidate_the_cache(self):
+        self.module.foundational = True
+        self.module.save()
+        self.performance.set_assessment_result('essay', 60)
+        self.performance.set_assessment_result('exam', 35)
+        Student.objects.filter(pk=self.student.pk).update(qld=False)
+        self.assertEqual(self.module.resit_eligibility(), {})
+        student = Student.objects.get(student_id=self.student.student_id)
+        student.phone_number = '01234 567890'
+        student.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.module.resit_eligibility(), {})
+        student.qld = True
+        student.save()
+        self.assertTrue(self.module.resit_eligibility())
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+from django.test import TestCase
+from io import BytesIO
+from main import pdf
+from main.db_settings import db_settings
+from main.models import Setting
+from PIL import Image as PILImage
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+
+class LogoTest(TestCase):
+    """Testing the logo shared by all PDF exports"""
+
+    def setUp(self):
+        db_settings.invalidate()
+        pdf._logos.clear()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'logo.jpg')
+        PILImage.new('RGB', (49, 20), (200, 0, 0)).save(self.path)
+        Setting.objects.create(name='logo_path', value=self.path)
+        self.logo_url, pdf.LOGO_URL = pdf.LOGO_URL, ''
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        pdf._logos.clear()
+        pdf.LOGO_URL = self.logo_url
+
+    def test_logo_is_read_from_the_setting(self):
+        logo = pdf.logo()
+        self.assertIsInstance(logo, pdf.SharedImage)
+        self.assertEqual(logo.imageWidth, 49)
+        self.assertEqual(logo.drawWidth, pdf.LOGO_WIDTH)
+
+    def test_logo_is_only_read_once(self):
+        first = pdf.logo()
+        os.remove(self.path)
+        second = pdf.logo()
+        self.assertIsInstance(second, pdf.SharedImage)
+        self.assertIs(first.reader, second.reader)
+
+    def test_logo_falls_back_to_the_url(self):
+        pdf.LOGO_URL = 'file://' + self.path
+        Setting.objects.filter(name='logo_path').update(
+            value=os.path.join(self.directory, 'nothing.jpg'))
+        db_settings.invalidate()
+        logo = pdf.logo()
+        self.assertIsInstance(logo, pdf.SharedImage)
+        self.assertEqual(logo.imageHeight, 20)
+
+    def test_logo_is_only_downloaded_if_a_url_is_set(self):
+        pdf.LOGO_URL = self.logo_url
+        os.remove(self.path)
+        self.assertIsInstance(pdf.logo(), Paragraph)
+        self.assertEqual(list(pdf._logos), [self.path])
+
+    def test_missing_logo_is_replaced_by_the_university_name(self):
+        os.remove(self.path)
+        Setting.objects.create(name='uni_name', value='Acme University')
+        logo = pdf.logo()
+        self.assertIsInstance(logo, Paragraph)
+        self.assertEqual(logo.text, 'Acme University')
+
+    def test_name_falls_back_to_the_configured_default(self):
+        Setting.objects.filter(name='logo_path').update(
+            value=os.path.join(self.directory, 'nothing.jpg'))
+        db_settings.invalidate()
+        self.assertEqual(pdf.logo().text, pdf.UNI_NAME)
+
+    def test_shared_logo_can_be_drawn_in_several_documents(self):
+        for i in range(2):
+            output = BytesIO()
+            document = SimpleDocTemplate(output)
+            document.build([pdf.logo(), pdf.logo()])
+            self.assertTrue(output.getvalue().startswith(b'%PDF'))
@@ -0,0 +1,113 @@
+from django.core.urlresolvers import reverse
+from .base import *
+from main.progression import (
+    build_board, cohort, options_for, progression_board, recommendation)
+
+
+class ProgressionBoardTest(MainAdminUnitTest):
+    """Testing the precomputed progression board"""
+
+    def setUp(self):
+        super(ProgressionBoardTest, self).setUp()
+        self.subject_area = create_subject_area()
+        self.course = create_course()
+        self.course.subject_areas.add(self.subject_area)
+        self.modules = []
+        for number, foundational in enumerate([True, False, False]):
+            module = Module.objects.create(
+                title='Module %s' % number,
+                code='m%s' % number,
+                year=1900,
+                foundational=foundational
+            )
+            Assessment.objects.create(module=module, title='Exam', value=100)
+            self.modules.append(module)
+
+    def create_student(self, student_id, marks, **kwargs):
+        student = Student.objects.create(
+            student_id=student_id,
+            first_name='Bugs',
+            last_name=student_id,
+            year=1,
+            course=self.course,
+            **kwargs
+        )
+        for module, mark in zip(self.modules, marks):
+            performance = Performance.objects.create(
+                student=student, module=module, belongs_to_year=1)
+            performance.set_assessment_result('exam', mark)
+        return student
+
+    def board_row(self, student_id):
+        for row in build_board(cohort(self.subject_area, 1)):
+            if row['student_id'] == student_id:
+                return row
+
+    def test_board_is_built_with_three_queries(self):
+        for number in range(10):
+            self.create_student('s%s' % number, [60, 35, 20])
+        with self.assertNumQueries(3):
+            board = build_board(cohort(self.subject_area, 1))
+        self.assertEqual(len(board), 10)
+        self.assertEqual(
+            [entry['module'] for entry in board[0]['failed']],
+            ['Module 1 (1900/01)', 'Module 2 (1900/01)']
+        )
+        self.assertEqual(board[0]['compensable'], ['Module 1 (1900/01)'])
+
+    def test_recommendations(self):
+        self.create_student('pass', [60, 60, 60])
+        self.create_student('qld', [35, 60, 60])
+        self.create_student('compensate', [60, 35, 60])
+        self.create_student('fail', [60, 20, 60])
+        self.assertEqual(self.board_row('pass')['recommended'], 'PP')
+        self.assertEqual(
+            self.board_row('qld')['qld_problems'], ['Module 0 (1900/01)'])
+        self.assertEqual(self.board_row('compensate')['recommended'], 'PC')
+        self.assertIsNone(self.board_row('fail')['recommended'])
+        self.assertIsNone(recommendation(3, [], [], []))
+
+    def test_decision_overrides_the_recommendation(self):
+        self.create_student('bb23', [60, 60, 60], next_year='R')
+        row = self.board_row('bb23')
+        self.assertEqual(row['recommended'], 'PP')
+        self.assertEqual(row['selected'], 'R')
+
+    def test_options_depend_on_the_year(self):
+        self.assertNotIn('1', dict(options_for(1)))
+        self.assertIn('C', dict(options_for(2)))
+        self.assertNotIn('PP', dict(options_for(3)))
+        self.assertEqual(options_for(9), [])
+
+    def test_students_without_course_are_left_out(self):
+        self.create_student('bb23', [60, 60, 60])
+        Student.objects.create(
+            student_id='dd42', first_name='Daffy', last_name='Duck', year=1)
+        board = build_board(cohort(self.subject_area, 1))
+        self.assertEqual([row['student_id'] for row in board], ['bb23'])
+
+    def test_board_is_cached_until_marks_change(self):
+        student = self.create_student('bb23', [60, 60, 60])
+        progression_board(self.subject_area, 1)
+        with self.assertNumQueries(0):
+            progression_board(self.subject_area, 1)
+        performance = Performance.objects.get(
+            student=student, module=self.modules[1])
+        performance.set_assessment_result('exam', 20)
+        board = progression_board(self.subject_area, 1)
+        self.assertEqual(len(board[0]['failed']), 1)
+
+    def test_decisions_are_saved(self):
+        self.create_student('bb23', [60, 60, 60])
+        self.create_student('dd42', [60, 20, 60])
+        url = reverse(
+            'enter_student_progression', args=[self.subject_area.slug, 1])
+        response = self.client.get(url)
+        self.assertContains(
+            response, '<option value="PP" selected>Pass and Proceed '
+            '(recommended)</option>', html=True)
+        self.client.post(url, {'bb23': 'PP', 'dd42': ''})
+        self.assertEqual(Student.objects.get(student_id='bb23').next_year, 'PP')
+        self.assertIsNone(Student.objects.get(student_id='dd42').next_year)
+        board = progression_board(self.subject_area)
+        self.assertEqual([row['student_id'] for row in board], ['dd42'])
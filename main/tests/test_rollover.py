@@ -0,0 +1,158 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from .base import *
+from main.db_settings import db_settings
+from main.rollover import Rollover, YearChanged, roll_over
+
+
+class RolloverTest(MainAdminUnitTest):
+    """Testing the rollover into the next academic year"""
+
+    def setUp(self):
+        super(RolloverTest, self).setUp()
+        self.module = Module.objects.create(
+            title='Carrot Eating', code='CE23', year=1900, foundational=True)
+        self.essay = Assessment.objects.create(
+            module=self.module, title='Essay', value=50)
+        self.exam = Assessment.objects.create(
+            module=self.module, title='Exam', value=50)
+
+    def create_student(self, student_id, next_year, year=1, **kwargs):
+        return Student.objects.create(
+            student_id=student_id,
+            first_name='Bugs',
+            last_name=student_id,
+            year=year,
+            next_year=next_year,
+            **kwargs
+        )
+
+    def add_results(self, student, essay, exam):
+        performance = Performance.objects.create(
+            student=student, module=self.module, belongs_to_year=student.year)
+        for assessment, mark in [(self.essay, essay), (self.exam, exam)]:
+            performance.assessment_results.add(AssessmentResult.objects.create(
+                assessment=assessment, mark=mark))
+        performance.calculate_average()
+        return performance
+
+    def test_plan_is_computed_with_a_constant_number_of_queries(self):
+        for number in range(20):
+            student = self.create_student(
+                's%02d' % number, ['PT', 'PC'][number % 2])
+            self.add_results(student, 30, 20)
+        with self.assertNumQueries(3):
+            rollover = Rollover(1900)
+        self.assertEqual(len(rollover.changes), 20)
+        self.assertEqual(
+            rollover.rows[1]['note'],
+            'Failure in Carrot Eating (25.0) has been compensated'
+        )
+        self.assertEqual(
+            rollover.rows[0]['note'],
+            'In Year 2, Bugs will have to resit Carrot Eating (Essay); '
+            'Carrot Eating (Exam) (trailed)'
+        )
+
+    def test_dry_run_changes_nothing(self):
+        self.create_student('bb23', '1', year=3)
+        rollover = Rollover(1900)
+        self.assertEqual(
+            rollover.changes['bb23'],
+            {
+                'next_year': None,
+                'achieved_degree': 1,
+                'year': 9,
+                'graduated_in': 1900
+            }
+        )
+        self.assertEqual(Student.objects.get().year, 3)
+        self.assertEqual(rollover.summary(), {'Graduate with First': 1})
+
+    def test_all_students_are_written_with_one_update(self):
+        self.create_student('bb23', 'PP')
+        self.create_student('dd42', 'R', year=2, notes='Lazy')
+        self.create_student('pp2323', 'WD', year=3)
+        with CaptureQueriesContext(connection) as queries:
+            roll_over(1900)
+        writes = [
+            query['sql'].split()[0] for query in queries.captured_queries
+            if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))
+        ]
+        self.assertEqual(writes, ['UPDATE', 'UPDATE'])
+        self.assertEqual(Student.objects.get(student_id='bb23').year, 2)
+        repeating = Student.objects.get(student_id='dd42')
+        self.assertEqual(repeating.year, 2)
+        self.assertEqual(repeating.notes, 'Lazy\n\nRepeated Year 2')
+        self.assertEqual(
+            Student.objects.get(student_id='pp2323').achieved_degree, 8)
+        self.assertFalse(Student.objects.exclude(next_year=None).exists())
+        self.assertEqual(db_settings.current_year, 1901)
+
+    def test_nothing_is_saved_if_the_rollover_fails(self):
+        self.create_student('bb23', 'PP')
+        Setting.objects.filter(name='current_year').update(value='nonsense')
+        with self.assertRaises(ValueError):
+            roll_over(1900)
+        self.assertEqual(Student.objects.get().next_year, 'PP')
+
+    def test_qld_resits_only_count_foundational_modules(self):
+        student = self.create_student('bb23', 'PQ')
+        self.add_results(student, 30, 80)
+        other_module = Module.objects.create(
+            title='Running Away', code='RA23', year=1900)
+        performance = Performance.objects.create(
+            student=student, module=other_module, belongs_to_year=1)
+        performance.assessment_results.add(AssessmentResult.objects.create(
+            assessment=Assessment.objects.create(
+                module=other_module, title='Race', value=100),
+            mark=10
+        ))
+        rollover = Rollover(1900)
+        self.assertEqual(
+            rollover.rows[0]['note'],
+            'In Year 2, Bugs will have to resit Carrot Eating (Essay) '
+            'for QLD purposes'
+        )
+
+    def test_the_same_year_cannot_be_rolled_over_twice(self):
+        self.create_student('bb23', 'PP')
+        url = reverse('proceed_to_next_year')
+        response = self.client.post(url, {'current_year': '1900'})
+        self.assertRedirects(
+            response, reverse('home'), fetch_redirect_response=False)
+        Student.objects.filter(student_id='bb23').update(next_year='PP')
+        response = self.client.post(url, {'current_year': '1900'})
+        self.assertRedirects(
+            response, reverse('admin'), fetch_redirect_response=False)
+        self.assertEqual(db_settings.current_year, 1901)
+        self.assertEqual(Student.objects.get().year, 2)
+        with self.assertRaises(YearChanged):
+            roll_over(1900)
+
+    def test_a_get_request_changes_nothing(self):
+        self.create_student('bb23', 'PP')
+        self.client.get(reverse('proceed_to_next_year'))
+        self.assertEqual(Student.objects.get().year, 1)
+        self.assertEqual(db_settings.current_year, 1900)
+
+    def test_preview_shows_the_plan(self):
+        self.create_student('bb23', 'PP')
+        response = self.client.get(reverse('proceed_to_next_year'))
+        self.assertTemplateUsed(response, 'rollover_preview.html')
+        self.assertContains(response, 'bb23')
+        self.assertEqual(Student.objects.get().year, 1)
+
+    def test_command_reports_progress(self):
+        self.create_student('bb23', 'PP')
+        out = StringIO()
+        call_command('proceed_to_next_year', dry_run=True, stdout=out)
+        self.assertIn('Nothing has been changed', out.getvalue())
+        self.assertEqual(Student.objects.get().year, 1)
+        out = StringIO()
+        call_command('proceed_to_next_year', stdout=out)
+        self.assertIn('Updated 1 of 1 students', out.getvalue())
+        self.assertIn('The current year is now 1901', out.getvalue())
+        self.assertEqual(Student.objects.get().year, 2)
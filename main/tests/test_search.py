@@ -0,0 +1,113 @@
+import json
+import warnings
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.urlresolvers import reverse
+from .base import *
+from main import search
+from main.models import SearchTerm
+
+
+class SearchTest(AdminUnitTest):
+    """Testing the search index and the autocomplete view"""
+
+    def setUp(self):
+        super(SearchTest, self).setUp()
+        cache.clear()
+        self.module = set_up_stuff()[0]
+        Student.objects.create(
+            student_id='bb42',
+            first_name='Bugsy',
+            last_name='Bunnington',
+            exam_id='X-1234',
+            active=False
+        )
+
+    def labels(self, query, **kwargs):
+        results, has_next = search.search(query, **kwargs)
+        return [result['label'] for result in results]
+
+    def test_students_are_indexed_when_saved(self):
+        student = Student.objects.get(student_id='dd42')
+        student.last_name = 'Drake'
+        student.save()
+        self.assertEqual(self.labels('drake'), ['Drake, Daffy'])
+        self.assertEqual(self.labels('duck'), [])
+
+    def test_deleted_students_cannot_be_found(self):
+        self.assertEqual(self.labels('daffy'), ['Duck, Daffy'])
+        Student.objects.get(student_id='dd42').delete()
+        self.assertEqual(self.labels('daffy'), [])
+        self.assertFalse(
+            SearchTerm.objects.filter(student_id='dd42').exists())
+
+    def test_students_can_be_found_by_id_and_exam_id(self):
+        self.assertEqual(self.labels('dd42'), ['Duck, Daffy'])
+        self.assertEqual(self.labels('x-1234'), ['Bunnington, Bugsy'])
+        self.assertEqual(self.labels('X1234'), ['Bunnington, Bugsy'])
+
+    def test_all_words_have_to_match(self):
+        self.assertEqual(self.labels('bugs bunny'), ['Bunny, Bugs'])
+        self.assertEqual(self.labels('Bunny, Bugs'), ['Bunny, Bugs'])
+        self.assertEqual(self.labels('bugs duck'), [])
+
+    def test_exact_matches_and_active_students_come_first(self):
+        self.assertEqual(
+            self.labels('bun'), ['Bunny, Bugs', 'Bunnington, Bugsy'])
+        self.assertEqual(
+            self.labels('bugsy'), ['Bunnington, Bugsy'])
+        self.assertEqual(
+            self.labels('bunnington'), ['Bunnington, Bugsy'])
+
+    def test_modules_can_be_found_by_code_and_title(self):
+        results, has_next = search.search('hp23')
+        self.assertEqual(results[0]['type'], 'module')
+        self.assertEqual(results[0]['url'], self.module.get_absolute_url())
+        self.assertEqual(self.labels('hunting'), [str(self.module)])
+
+    def test_results_are_paginated(self):
+        self.assertEqual(len(self.labels('b', per_page=1)), 1)
+        results, has_next = search.search('bu', page=1, per_page=1)
+        self.assertTrue(has_next)
+        results, has_next = search.search('bu', page=2, per_page=1)
+        self.assertEqual(results[0]['label'], 'Bunnington, Bugsy')
+        self.assertFalse(has_next)
+
+    def test_results_are_cached_until_the_index_changes(self):
+        self.assertEqual(self.labels('porky'), ['Pig, Porky'])
+        with self.assertNumQueries(0):
+            self.labels('Porky')
+        search.index_students(['pp2323'])
+        with self.assertNumQueries(2):
+            self.labels('porky')
+
+    def test_long_queries_give_valid_cache_keys(self):
+        query = ' '.join(['Bugs Bunny Ünïcödé'] * 30)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', CacheKeyWarning)
+            search.search(query)
+        self.assertEqual(
+            [warning for warning in caught
+             if issubclass(warning.category, CacheKeyWarning)],
+            []
+        )
+
+    def test_autocomplete_returns_json(self):
+        response = self.client.get(reverse('autocomplete'), {'q': 'daf'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['page'], 1)
+        self.assertFalse(data['has_next'])
+        self.assertEqual(data['results'], [{
+            'type': 'student',
+            'label': 'Duck, Daffy',
+            'detail': 'dd42, 1',
+            'url': '/student/dd42/'
+        }])
+
+    def test_search_page_redirects_to_a_single_result(self):
+        response = self.client.get(reverse('search_student'), {'q': 'porky'})
+        self.assertRedirects(
+            response, '/student/pp2323/', fetch_redirect_response=False)
+        response = self.client.get(reverse('search_student'), {'q': 'bu'})
+        self.assertTemplateUsed(response, 'search_results.html')
+        self.assertEqual(len(response.context['results']), 2)
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+from .base import *
+from main import staging
+
+
+@override_settings(DATA_PURGE_PROBABILITY=0)
+class StagingTest(TestCase):
+    """Testing the storage of data between requests"""
+
+    def test_small_values_are_stored_inline(self):
+        data_id = staging.store('bb23,dd42', prefix='imported_', length=8)
+        self.assertTrue(data_id.startswith('imported_'))
+        self.assertEqual(len(data_id), 17)
+        self.assertEqual(staging.load(data_id), 'bb23,dd42')
+        self.assertFalse(DataChunk.objects.exists())
+
+    def test_large_values_are_compressed_in_chunks(self):
+        value = ''.join(str(number) for number in range(500000))
+        old_size, staging.CHUNK_SIZE = staging.CHUNK_SIZE, 1000
+        try:
+            data_id = staging.store(value)
+        finally:
+            staging.CHUNK_SIZE = old_size
+        data = Data.objects.get(id=data_id)
+        self.assertEqual(data.value, '')
+        self.assertGreater(data.chunks, 1)
+        self.assertEqual(DataChunk.objects.count(), data.chunks)
+        self.assertEqual(staging.load(data_id), value)
+
+    def test_expired_values_cannot_be_loaded(self):
+        data_id = staging.store('bb23', lifetime=-1)
+        with self.assertRaises(Data.DoesNotExist):
+            staging.load(data_id)
+
+    def test_purge_deletes_expired_data_and_chunks(self):
+        value = 'x' * (staging.INLINE_LIMIT + 1)
+        expired = staging.store(value, lifetime=-1)
+        staging.store('bb23', lifetime=-1)
+        current = staging.store(value)
+        # Data from before there was an expiry date
+        Data.objects.create(id='legacy', value='dd42')
+        Data.objects.filter(id='legacy').update(
+            timestamp=timezone.now() - timedelta(days=15))
+        with self.assertNumQueries(2):
+            self.assertEqual(staging.purge_data(), (3, 1))
+        self.assertEqual(list(Data.objects.values_list('id', flat=True)),
+                         [current])
+        self.assertEqual(
+            DataChunk.objects.filter(data_id=expired).count(), 0)
+        self.assertEqual(staging.load(current), value)
+
+    def test_purge_can_be_limited(self):
+        for number in range(3):
+            staging.store('bb23', lifetime=-1)
+        self.assertEqual(staging.purge_data(limit=2), (2, 0))
+        self.assertEqual(Data.objects.count(), 1)
+
+    @override_settings(DATA_PURGE_PROBABILITY=1, DATA_PURGE_LIMIT=1)
+    def test_storing_purges_some_expired_data(self):
+        Data.objects.create(
+            id='old', expires=timezone.now() - timedelta(days=1))
+        Data.objects.create(
+            id='older', expires=timezone.now() - timedelta(days=2))
+        staging.store('bb23')
+        self.assertFalse(Data.objects.filter(id='older').exists())
+        self.assertTrue(Data.objects.filter(id='old').exists())
+
+    def test_clean_data_command_reports_deletions(self):
+        staging.store('bb23', lifetime=-1)
+        output = StringIO()
+        call_command('clean_data', stdout=output)
+        self.assertEqual(
+            output.getvalue().strip(), 'Deleted 1 data instances (0 chunks)')
+        self.assertFalse(Data.objects.exists())
@@ -0,0 +1,79 @@
+import datetime
+from django.core.urlresolvers import reverse
+from .base import *
+from feedback.models import IndividualFeedback
+from main.student_actions import apply_action
+
+
+class StudentActionTest(AdminUnitTest):
+    """Testing the bulk actions of year_view"""
+
+    def setUp(self):
+        super(StudentActionTest, self).setUp()
+        stuff = set_up_stuff()
+        self.module = stuff[0]
+        self.students = stuff[1:]
+        self.assessment = Assessment.objects.create(
+            module=self.module, title='Essay', value=100)
+        teacher = create_teacher()
+        for student in self.students[:2]:
+            performance = Performance.objects.get(
+                student=student, module=self.module)
+            performance.set_assessment_result('essay', 60)
+            feedback = IndividualFeedback.objects.create(
+                assessment_result=performance.assessment_results.get(),
+                attempt='first'
+            )
+            feedback.markers.add(teacher)
+            TuteeSession.objects.create(
+                tutee=student,
+                tutor=teacher,
+                date_of_meet=datetime.date(2014, 10, 1),
+                notes='What\'s up, doc?'
+            )
+
+    def test_fields_are_changed_with_one_update(self):
+        student_ids = ['bb23', 'dd42', 'pp2323']
+        with self.assertNumQueries(4):
+            # The update in a savepoint and the modules for the caches
+            summary = apply_action(student_ids, 'qld_off')
+        self.assertEqual(summary, 'QLD Status changed for 3 students.')
+        self.assertEqual(
+            list(Student.objects.filter(qld=False).values_list(
+                'student_id', flat=True).order_by('student_id')),
+            student_ids
+        )
+
+    def test_course_titles_can_contain_underscores(self):
+        course = Course.objects.create(title='LLB_Law', short_title='Law')
+        apply_action(['bb23'], 'course_LLB_Law')
+        self.assertEqual(Student.objects.get(student_id='bb23').course, course)
+
+    def test_deletion_removes_everything_that_belongs_to_the_students(self):
+        summary = apply_action(['bb23', 'dd42', 'pp2323'], 'delete_yes')
+        self.assertEqual(
+            summary,
+            'Deleted 3 students with 3 performances, 2 assessment results, '
+            '2 feedback sheets and 2 tutee meetings.'
+        )
+        self.assertEqual(
+            Student.objects.filter(student_id__in=['bb23', 'dd42']).count(),
+            0
+        )
+        self.assertEqual(AssessmentResult.objects.count(), 0)
+        self.assertEqual(IndividualFeedback.objects.count(), 0)
+        self.assertEqual(
+            IndividualFeedback.markers.through.objects.count(), 0)
+        self.assertEqual(
+            Performance.assessment_results.through.objects.count(), 0)
+        self.assertEqual(TuteeSession.objects.count(), 0)
+        self.assertEqual(
+            Performance.objects.filter(module=self.module).count(), 2)
+
+    def test_summary_is_shown_after_the_action(self):
+        response = self.client.post(
+            reverse('year_view', args=['1']),
+            {'selected_student_id': ['bb23', 'dd42'], 'modify': 'year_2'},
+            follow=True
+        )
+        self.assertContains(response, 'Year changed for 2 students.')
@@ -0,0 +1,78 @@
+from django.core.urlresolvers import reverse
+from .base import *
+from main.student_lists import (
+    StudentPage, decode_cursor, encode_cursor)
+
+
+class StudentListTest(MainAdminUnitTest):
+    """Testing the filtered, sorted and paged student lists"""
+
+    def setUp(self):
+        super(StudentListTest, self).setUp()
+        self.course = create_course()
+        for number in range(25):
+            Student.objects.create(
+                student_id='s%02d' % number,
+                first_name='Student',
+                last_name='Number %02d' % (24 - number),
+                year=1,
+                course=self.course if number % 2 else None,
+                qld=number < 10
+            )
+
+    def ids(self, page):
+        return [student.student_id for student in page.students]
+
+    def test_pages_follow_each_other(self):
+        students = Student.objects.all()
+        seen = []
+        page = StudentPage(students, size=10)
+        while True:
+            seen.extend(self.ids(page))
+            if not page.has_next:
+                break
+            page = StudentPage(students, after=page.next_cursor(), size=10)
+        self.assertEqual(
+            seen, ['s%02d' % number for number in reversed(range(25))])
+
+    def test_pages_can_be_walked_backwards(self):
+        students = Student.objects.all()
+        first = StudentPage(students, sort='id', size=10)
+        second = StudentPage(
+            students, sort='id', after=first.next_cursor(), size=10)
+        back = StudentPage(
+            students, sort='id', before=second.previous_cursor(), size=10)
+        self.assertEqual(self.ids(back), self.ids(first))
+        self.assertFalse(back.has_previous)
+        self.assertTrue(back.has_next)
+
+    def test_nullable_columns_can_be_sorted_descending(self):
+        students = Student.objects.all()
+        page = StudentPage(students, sort='course', descending=True, size=12)
+        self.assertTrue(all(student.course for student in page.students))
+        page = StudentPage(
+            students, sort='course', descending=True,
+            after=page.next_cursor(), size=12)
+        self.assertEqual(len(page.students), 12)
+        self.assertEqual(page.students[0].course, None)
+        self.assertEqual(decode_cursor('not a cursor'), None)
+
+    def test_cursors_that_are_not_lists_are_ignored(self):
+        self.assertEqual(decode_cursor(encode_cursor(1)), None)
+        self.assertEqual(decode_cursor(encode_cursor([{'a': 1}])), None)
+        response = self.client.get(
+            reverse('year_view', args=['1']), {'after': 'MQ=='})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['students']), 25)
+
+    def test_year_view_is_filtered_and_counted_in_the_database(self):
+        response = self.client.get(
+            reverse('year_view', args=['1']),
+            {'course': self.course.pk, 'qld': 'no', 'sort': 'id'}
+        )
+        ids = [student.student_id for student in response.context['students']]
+        self.assertEqual(
+            ids, ['s11', 's13', 's15', 's17', 's19', 's21', 's23'])
+        self.assertEqual(response.context['number_of_students'], 7)
+        self.assertIn('course=%s' % self.course.pk,
+                      response.context['sort_urls']['name'])
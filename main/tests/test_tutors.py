@@ -0,0 +1,110 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .base import *
+from main.tutors import allocate, save_tutors, tutor_workload
+
+
+class TutorAllocationTest(AdminUnitTest):
+    """Testing the tutor workload and the automatic allocation"""
+
+    def setUp(self):
+        super(TutorAllocationTest, self).setUp()
+        self.subject_area = create_subject_area()
+        self.courses = []
+        for title in ['BA in Cartoon Studies', 'BA in Evil Plotting']:
+            course = Course.objects.create(title=title)
+            course.subject_areas.add(self.subject_area)
+            self.courses.append(course)
+        self.tutors = []
+        for name in ['Fudd', 'Sam', 'Martian']:
+            user = User.objects.create_user(
+                username=name.lower(), password='pw', last_name=name)
+            tutor = Staff.objects.create(user=user, role='teacher')
+            tutor.subject_areas.add(self.subject_area)
+            self.tutors.append(tutor)
+
+    def create_students(self, number, year=1, tutor=None, course=0):
+        start = Student.objects.count()
+        for counter in range(start, start + number):
+            Student.objects.create(
+                student_id='s%03d' % counter,
+                last_name='Student %03d' % counter,
+                year=year,
+                course=self.courses[course],
+                tutor=tutor
+            )
+
+    def test_workload_is_counted_in_one_query(self):
+        self.create_students(2, year=1, tutor=self.tutors[0])
+        self.create_students(1, year=3, tutor=self.tutors[0])
+        self.create_students(1, year=9, tutor=self.tutors[0])
+        with self.assertNumQueries(1):
+            workload = [
+                (tutor.user.last_name, tutor.number_of_tutees_1,
+                 tutor.number_of_tutees_3, tutor.number_of_tutees)
+                for tutor in tutor_workload(self.subject_area)
+            ]
+        self.assertEqual(
+            workload,
+            [('Fudd', 2, 1, 3), ('Martian', 0, 0, 0), ('Sam', 0, 0, 0)]
+        )
+
+    def test_new_students_are_spread_evenly(self):
+        self.create_students(3, year=2, tutor=self.tutors[0])
+        self.create_students(9, course=0)
+        self.create_students(6, course=1)
+        students = list(Student.objects.cohort(self.subject_area, 1))
+        allocation = allocate(
+            students, list(tutor_workload(self.subject_area)))
+        self.assertEqual(len(allocation), 15)
+        per_tutor = {}
+        per_course = {}
+        for student in students:
+            tutor = allocation[student.pk]
+            per_tutor[tutor] = per_tutor.get(tutor, 0) + 1
+            key = (tutor, student.course_id)
+            per_course[key] = per_course.get(key, 0) + 1
+        # Fudd already has three tutees in year 2
+        self.assertEqual(
+            [per_tutor[tutor.pk] for tutor in self.tutors], [3, 6, 6])
+        for tutor in self.tutors:
+            self.assertTrue(per_course[tutor.pk, self.courses[1].pk] >= 1)
+
+    def test_existing_pairings_are_kept_unless_asked(self):
+        self.create_students(4, tutor=self.tutors[0])
+        self.create_students(2)
+        students = list(Student.objects.cohort(self.subject_area, 1))
+        tutors = list(tutor_workload(self.subject_area))
+        self.assertEqual(len(allocate(students, tutors)), 2)
+        allocation = allocate(students, tutors, keep_existing=False)
+        self.assertEqual(len(allocation), 6)
+        self.assertEqual(
+            sorted(list(allocation.values()).count(tutor.pk)
+                   for tutor in self.tutors),
+            [2, 2, 2]
+        )
+
+    def test_assignments_are_saved_with_one_update(self):
+        self.create_students(3)
+        with CaptureQueriesContext(connection) as queries:
+            save_tutors({
+                's000': self.tutors[0].pk,
+                's001': self.tutors[1].pk,
+                's002': None
+            })
+        updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            Student.objects.get(student_id='s001').tutor, self.tutors[1])
+        self.assertIsNone(Student.objects.get(student_id='s002').tutor)
+
+    def test_automatic_allocation_from_the_page(self):
+        self.create_students(6)
+        self.client.post(
+            '/assign_tutors/cartoon-studies/1/', {'allocate': 'Assign'})
+        self.assertFalse(Student.objects.filter(tutor=None).exists())
+        for tutor in self.tutors:
+            self.assertEqual(tutor.tutees.count(), 2)
@@ -4,6 +4,7 @@ from main.views import *
 from bs4 import BeautifulSoup
 from .base import *
 import datetime
+import json
 from feedback.models import IndividualFeedback
 
 
@@ -1385,6 +1386,20 @@ class AttendanceTest(TeacherUnitTest):
         self.assertContains(response, student4.last_name)
         self.assertNotContains(response, student5.last_name)
 
+    def test_recorded_attendance_is_checked_in_the_form(self):
+        stuff = set_up_stuff()
+        module = stuff[0]
+        performance = Performance.objects.get(student=stuff[1], module=module)
+        performance.save_attendance(5, 'e')
+        request = self.factory.get(module.get_attendance_url('all'))
+        request.user = self.user
+        response = attendance(request, module.code, module.year, 'all')
+        soup = BeautifulSoup(response.content)
+        checked = soup.select('input[name="bb23_5"][checked]')
+        self.assertEqual(len(checked), 1)
+        self.assertEqual(checked[0]['value'], 'e')
+        self.assertEqual(soup.select('input[name="dd42_5"][checked]'), [])
+
     def test_attendance_can_be_added_through_form(self):
         stuff = set_up_stuff()
         module = stuff[0]
@@ -2387,12 +2402,15 @@ class CSVParsingTests(AdminUnitTest):
     """Tests for the CSV Parsing"""
 
     def test_csv_data_gets_parsed_properly(self):
-        parsed_csvlist = (
-            'bb42;Bunny;Bugs;1900;1;bb42@acme.edu;+112345678/////' +
-            'dd23;Duck;Daffy;1900;1;dd23@acme.edu;+123456789/////' +
-            'pp42;Pig;Porky;1899;2;pp42@acme.edu;+134567890/////' +
-            'test;wrong;entry;to;beignored'
-        )
+        parsed_csvlist = json.dumps([
+            ['bb42', 'Bunny', 'Bugs', '1900', '1', 'bb42@acme.edu',
+             '+112345678'],
+            ['dd23', 'Duck', 'Daffy', '1900', '1', 'dd23@acme.edu',
+             '+123456789'],
+            ['pp42', 'Pig', 'Porky', '1899', '2', 'pp42@acme.edu',
+             '+134567890'],
+            ['test', 'wrong', 'entry', 'to', 'beignored']
+        ])
         data = Data.objects.create(id='randomstring', value=parsed_csvlist)
         request = self.factory.post('/parse_csv/randomstring/', data={
             'column1': 'student_id',
@@ -2715,6 +2733,31 @@ class AllTuteeMeetingTest(TeacherUnitTest):
         self.assertContains(response, '1 Jan 1900')
         self.assertContains(response, meeting1.get_absolute_url())
 
+    def test_students_without_course_are_left_out(self):
+        subject_area = create_subject_area()
+        course = Course.objects.create(title='Cartoon Studies')
+        course.subject_areas.add(subject_area)
+        Student.objects.create(
+            student_id='bb1',
+            first_name='Bugs',
+            last_name='Bunny',
+            year=1,
+            course=course
+        )
+        Student.objects.create(
+            student_id='dd1',
+            first_name='Duck',
+            last_name='Daffy',
+            year=1
+        )
+        self.user.staff.programme_director = True
+        self.user.staff.save()
+        request = self.factory.get('/all_tutee_meetings/cartoon-studies/1/')
+        request.user = self.user
+        response = all_tutee_meetings(request, 'cartoon-studies', '1')
+        self.assertContains(response, '/student/bb1/')
+        self.assertNotContains(response, '/student/dd1/')
+
 
 class MyTuteesTests(TeacherUnitTest):
     """Making sure that the my tutee view shows everything necessary"""
@@ -3578,7 +3621,10 @@ class NextYearTest(MainAdminUnitTest):
         )
         this_year = int(Setting.objects.get(name="current_year").value)
         next_year = str(this_year + 1)
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3604,7 +3650,10 @@ class NextYearTest(MainAdminUnitTest):
             second_part_time_year=True,
             next_year='PP'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student1_out = Student.objects.get(first_name="Bugs")
@@ -3655,7 +3704,10 @@ class NextYearTest(MainAdminUnitTest):
         performance.assessment_results.add(result1)
         performance.assessment_results.add(result2)
         self.assertEqual(performance.qld_failures_after_resit(), [result1])
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3706,7 +3758,10 @@ class NextYearTest(MainAdminUnitTest):
         performance.assessment_results.add(result1)
         performance.assessment_results.add(result2)
         performance.calculate_average()
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3757,7 +3812,10 @@ class NextYearTest(MainAdminUnitTest):
         performance.assessment_results.add(result1)
         performance.assessment_results.add(result2)
         performance.calculate_average()
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3776,7 +3834,10 @@ class NextYearTest(MainAdminUnitTest):
         )
         this_year = int(Setting.objects.get(name="current_year").value)
         next_year = str(this_year + 1)
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3795,7 +3856,10 @@ class NextYearTest(MainAdminUnitTest):
         )
         this_year = int(Setting.objects.get(name="current_year").value)
         next_year = str(this_year + 1)
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3812,7 +3876,10 @@ class NextYearTest(MainAdminUnitTest):
             year=3,
             next_year='1'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3828,7 +3895,10 @@ class NextYearTest(MainAdminUnitTest):
             year=3,
             next_year='21'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3844,7 +3914,10 @@ class NextYearTest(MainAdminUnitTest):
             year=3,
             next_year='22'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3860,7 +3933,10 @@ class NextYearTest(MainAdminUnitTest):
             year=3,
             next_year='3'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3876,7 +3952,10 @@ class NextYearTest(MainAdminUnitTest):
             year=3,
             next_year='C'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3892,7 +3971,10 @@ class NextYearTest(MainAdminUnitTest):
             year=3,
             next_year='D'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3908,7 +3990,10 @@ class NextYearTest(MainAdminUnitTest):
             year=3,
             next_year='O'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3924,7 +4009,10 @@ class NextYearTest(MainAdminUnitTest):
             year=3,
             next_year='WD'
         )
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_out = Student.objects.first()
@@ -3939,7 +4027,10 @@ class NextYearTest(MainAdminUnitTest):
             students[student].save()
         students['3-4'].next_year = '1'
         students['3-4'].save()
-        request = self.factory.get(reverse('proceed_to_next_year'))
+        request = self.factory.post(
+            reverse('proceed_to_next_year'),
+            {'current_year': Setting.objects.get(name='current_year').value}
+        )
         request.user = self.user
         response = proceed_to_next_year(request)
         student_1_2 = Student.objects.get(
@@ -0,0 +1,105 @@
+"""Assigning personal tutors to the students of a subject area
+
+The workload of every tutor (the number of current tutees in years 1 to
+3) is counted with one aggregate query. When a new intake arrives, the
+students without a tutor can be spread automatically: every student goes
+to the tutor with the fewest tutees, and among equally busy tutors to the
+one with the fewest students of the same course, so that each tutor gets
+a mix of courses. Existing pairings are kept unless asked otherwise.
+
+All assignments are written with one UPDATE per batch, so no signals are
+sent and the caches are invalidated here.
+"""
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Sum, Value, When
+from main.functions import bulk_update
+from main.models import Staff, Student
+from main.student_actions import modules_of_students, students_changed
+
+YEARS = [1, 2, 3]
+
+
+def tutee_count(year=None):
+    """Counts the active tutees of a tutor, in one year or in all YEARS"""
+    if year is None:
+        in_year = Q(tutees__year__in=YEARS)
+    else:
+        in_year = Q(tutees__year=year)
+    return Sum(Case(
+        When(in_year & Q(tutees__active=True), then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField()
+    ))
+
+
+def tutor_workload(subject_area):
+    """Returns the teachers of a subject area with their tutee counts
+
+    Every teacher is annotated with number_of_tutees_1, _2 and _3 (the
+    tutees per year) and number_of_tutees (the total).
+    """
+    return Staff.objects.filter(
+        role='teacher', subject_areas=subject_area
+    ).select_related('user').annotate(
+        number_of_tutees_1=tutee_count(1),
+        number_of_tutees_2=tutee_count(2),
+        number_of_tutees_3=tutee_count(3),
+        number_of_tutees=tutee_count()
+    ).order_by('user__last_name', 'user__first_name', 'pk')
+
+
+def allocate(students, tutors, keep_existing=True, mix_courses=True):
+    """Spreads students evenly across tutors
+
+    students is a list of Students and tutors a list of Staff annotated
+    by tutor_workload(). With keep_existing, students who have a tutor
+    keep them. Returns {student id: tutor pk} for the students that have
+    been allocated.
+    """
+    if not tutors:
+        return {}
+    load = {}
+    courses = {}
+    for tutor in tutors:
+        load[tutor.pk] = tutor.number_of_tutees
+        courses[tutor.pk] = {}
+    if keep_existing:
+        for student in students:
+            if student.tutor_id in courses:
+                mix = courses[student.tutor_id]
+                mix[student.course_id] = mix.get(student.course_id, 0) + 1
+        students = [student for student in students if not student.tutor_id]
+    else:
+        for student in students:
+            if student.tutor_id in load and student.active and (
+                    student.year in YEARS):
+                load[student.tutor_id] -= 1
+    order = dict((tutor.pk, number) for number, tutor in enumerate(tutors))
+    allocation = {}
+    for student in sorted(students, key=lambda student: (
+            student.course_id or 0, student.last_name, student.pk)):
+        if mix_courses:
+            same_course = dict(
+                (pk, mix.get(student.course_id, 0))
+                for pk, mix in courses.items())
+        else:
+            same_course = dict((pk, 0) for pk in courses)
+        tutor = min(
+            load, key=lambda pk: (load[pk], same_course[pk], order[pk]))
+        allocation[student.pk] = tutor
+        load[tutor] += 1
+        courses[tutor][student.course_id] = (
+            courses[tutor].get(student.course_id, 0) + 1)
+    return allocation
+
+
+def save_tutors(assignments):
+    """Saves {student id: tutor pk or None}, returns the number of students"""
+    with transaction.atomic():
+        updated = bulk_update(
+            Student,
+            dict((student_id, {'tutor': tutor})
+                 for student_id, tutor in assignments.items())
+        )
+    students_changed(modules_of_students(list(assignments)))
+    return updated
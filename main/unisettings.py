@@ -1,4 +1,5 @@
 import datetime
+import os
 
 START_YEAR = 2013  # Only used for the very first run
 
@@ -9,6 +10,19 @@ NOMOSDB_NAME = 'NomosDB'
 ADMIN_EMAIL = 'chuck.jones@acme.edu'
 ADMIN_NAME = 'Chuck Jones'
 
+# The logo printed at the top of the PDF exports. The 'logo_path' Setting
+# (see Main Settings) overrides this file and can also be a URL. If the
+# file cannot be read and LOGO_URL is set, the logo is downloaded from
+# there instead, once per process - this can hold up the first PDF of
+# every process, so it is left empty by default (the old logo was at
+# https://cccu.tobiaskliem.de/static/images/cccu.jpg). Without a logo,
+# the name of the university is printed instead: the 'uni_name' Setting,
+# or UNI_NAME if that has not been set.
+LOGO_PATH = os.path.join(
+    os.path.dirname(__file__), 'static', 'img', 'logo.jpg')
+LOGO_URL = ''
+UNI_NAME = 'Canterbury Christ Church University'
+
 TEACHING_WEEKS = (
     [(i, 'Week ' + str(i)) for i in range(1, 53)]
 )
@@ -65,3 +79,6 @@ FIRST_WEEK_STARTS = {
 }
 
 PASSMARK = 40
+
+# A failed module can be compensated if the student has at least this mark
+COMPENSATION_MARK = 30
@@ -1,34 +1,48 @@
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.mail import send_mail
 from django.core.urlresolvers import resolve
 from django.core.urlresolvers import reverse
 from django.db import IntegrityError
 from django.db.models import Q
-from django.http import HttpResponse
-from django.shortcuts import redirect, render
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.utils.datastructures import OrderedDict
+from django.utils.html import format_html
 from feedback.views import group_presentation_marksheet, individual_marksheet
+from main.attendance import (
+    cohort_attendance, read_attendance, save_register)
+from main import (
+    exports, importer, progression, rollover, search, staging,
+    student_actions, student_lists, tutors)
+from main.db_settings import db_settings
+from main.mark_grid import module_mark_grid
+from main.marks import (
+    enter_marks, marks_from_post, recalculate_module_averages)
 from main.forms import *
+from main.jobs import queue_export, result_path
 from main.functions import (
-    week_number, week_starting_date, formatted_date, academic_year_string
+    week_number, week_starting_date, formatted_date, academic_year_string,
+    page_number
 )
 from main.messages import (
     new_staff_email, attendance_email, password_reset_email, new_student_email
 )
 from main.models import *
+from main.pdf import logo
 from main.unisettings import *
+import mimetypes
+import os
 from operator import itemgetter
 from pytz import utc
-from random import shuffle, choice
-from string import ascii_letters, digits
+from random import shuffle
 from reportlab.platypus import (
     Paragraph,
     SimpleDocTemplate,
     Spacer,
     Table,
     TableStyle,
-    Image,
     ListFlowable,
     ListItem
 )
@@ -124,7 +138,7 @@ def reset_password(request, testing=False):
             else:
                 name = user.first_name
             message = password_reset_email(name, username, new_password)
-            sender = Setting.objects.get(name='admin_email').value
+            sender = db_settings.admin_email
             if testing:
                 text = message
                 return render(
@@ -148,7 +162,7 @@ def reset_password(request, testing=False):
 
 def wrong_email(request):
     """Small page to show that the password was wrong"""
-    example_email = Setting.objects.get(name='example_email').value
+    example_email = db_settings.example_email
     return render(
         request,
         'wrong_password.html',
@@ -169,7 +183,7 @@ def home(request):
     redirected to the settings page.
     """
 
-    if Setting.objects.exists():
+    if db_settings.exists():
 
         if is_student(request.user):
             # The view for the student, returns a page with marksheets only
@@ -231,7 +245,7 @@ def home(request):
 @user_passes_test(is_admin)
 def admin(request):
     """Opens the admin dashboard"""
-    current_year = Setting.objects.get(name="current_year").value
+    current_year = db_settings.get('current_year')
     today = timezone.now().date()
     if request.user.staff.main_admin:
         main_admin = True
@@ -345,35 +359,23 @@ def main_settings(request):
             except Setting.DoesNotExist:
                 Setting.objects.create(
                     name='example_email', value='example_email')
+            logo_path = form.cleaned_data['logo_path']
+            try:
+                model = Setting.objects.get(name='logo_path')
+                model.value = logo_path
+                model.save()
+            except Setting.DoesNotExist:
+                Setting.objects.create(name='logo_path', value=logo_path)
         return redirect(reverse('home'))
-    try:
-        current_year = Setting.objects.get(name="current_year").value
-    except Setting.DoesNotExist:
-        current_year = str(timezone.now().date().year)
-    try:
-        uni_name = Setting.objects.get(name="uni_name").value
-    except Setting.DoesNotExist:
-        uni_name = 'Acme University'
-    try:
-        uni_short_name = Setting.objects.get(name="uni_short_name").value
-    except Setting.DoesNotExist:
-        uni_short_name = 'ACME U'
-    try:
-        nomosdb_url = Setting.objects.get(name="nomosdb_url").value
-    except Setting.DoesNotExist:
-        nomosdb_url = 'acme.nomosdb.org'
-    try:
-        admin_name = Setting.objects.get(name="admin_name").value
-    except Setting.DoesNotExist:
-        admin_name = "Chuck Jones"
-    try:
-        admin_email = Setting.objects.get(name="admin_email").value
-    except Setting.DoesNotExist:
-        admin_email = 'chuck.jones@acme.edu'
-    try:
-        example_email = Setting.objects.get(name="example_email").value
-    except Setting.DoesNotExist:
-        example_email = 'b.bunny23@acme.edu'
+    current_year = db_settings.get(
+        'current_year', str(timezone.now().date().year))
+    uni_name = db_settings.get('uni_name', 'Acme University')
+    uni_short_name = db_settings.get('uni_short_name', 'ACME U')
+    nomosdb_url = db_settings.get('nomosdb_url', 'acme.nomosdb.org')
+    admin_name = db_settings.get('admin_name', "Chuck Jones")
+    admin_email = db_settings.get('admin_email', 'chuck.jones@acme.edu')
+    example_email = db_settings.get('example_email', 'b.bunny23@acme.edu')
+    logo_path = db_settings.get('logo_path', '')
     form = MainSettingsForm(
         initial={
             'current_year': current_year,
@@ -383,6 +385,7 @@ def main_settings(request):
             'admin_name': admin_name,
             'admin_email': admin_email,
             'example_email': example_email,
+            'logo_path': logo_path,
         }
     )
     return render(request, 'main_settings_form.html', {'form': form})
@@ -477,7 +480,7 @@ def add_or_edit_staff(request, username=None, testing=False):
                 user = User.objects.create_user(username, email, password)
                 message = new_staff_email(first_name, username, password)
                 subject = 'NomosDB Login Data'
-                sender = Setting.objects.get(name='admin_email').value
+                sender = db_settings.admin_email
                 if not testing:
                     send_mail(subject, message, sender, [email, ])
                 else:
@@ -617,7 +620,7 @@ def invite_students(request, subject_area, testing=False):
                     password
                 )
                 subject = 'NomosDB Login Data'
-                sender = Setting.objects.get(name='admin_email').value
+                sender = db_settings.admin_email
                 if not testing:
                     send_mail(subject, message, sender, [student.email, ])
                 else:
@@ -640,14 +643,10 @@ def invite_students(request, subject_area, testing=False):
 
     else:
         subject_area = SubjectArea.objects.get(slug=subject_area)
-        all_students = Student.objects.filter(active=True)
-        students = []
+        students = Student.objects.cohort(subject_area).filter(user=None)
         years = {}
-        for student in all_students:
-            if subject_area in student.course.subject_areas.all():
-                if student.user is None:
-                    students.append(student)
-                    years[student.year] = True
+        for student in students:
+            years[student.year] = True
         return render(
             request,
             'invite_students.html',
@@ -720,155 +719,80 @@ def student_view(request, student_id, meeting_id=None):
 @login_required
 @user_passes_test(is_staff)
 def search_student(request):
-    """Little search function. Can at some point be replaced with AJAX"""
-    if 'q' in request.GET and request.GET['q']:
-        q = request.GET['q']
-        students = []
-        if len(q) > 1:
-            if "," in q:
-                search = q.split(",")
-                first_name = search[-1].strip()
-                last_name = search[0].strip()
-            else:
-                search = q.split()
-                first_name = search[0]
-                last_name = search[-1]
-            students = Student.objects.filter(
-                last_name__icontains=last_name,
-                first_name__icontains=first_name
-                )
-        if len(students) == 0:
-            students = Student.objects.filter(
-                Q(last_name__istartswith=q) | Q(first_name__istartswith=q))
-        if len(students) == 1:
-            student = students[0]
-            return redirect(student.get_absolute_url())
-        else:
-            return render(
-                request,
-                'search_results.html',
-                {'students': students, 'query': q},
-            )
-    else:
+    """Shows the students and modules that match a search
+
+    If there is only one match, it is shown straight away.
+    """
+    q = request.GET.get('q', '')
+    if not q:
         return redirect(reverse('home'))
+    page = page_number(request)
+    results, has_next = search.search(q, page)
+    if page == 1 and len(results) == 1:
+        return redirect(results[0]['url'])
+    return render(
+        request,
+        'search_results.html',
+        {
+            'results': results,
+            'query': q,
+            'page': page,
+            'has_next': has_next
+        },
+    )
+
+
+@login_required
+@user_passes_test(is_staff)
+def autocomplete(request):
+    """Returns the best matches for the search box as JSON"""
+    page = page_number(request)
+    results, has_next = search.search(
+        request.GET.get('q', ''), page, per_page=search.AUTOCOMPLETE_RESULTS)
+    return JsonResponse(
+        {'results': results, 'page': page, 'has_next': has_next})
 
 
 @login_required
 @user_passes_test(is_staff)
 def year_view(request, year):
-    """Shows all students in a particular year and allows bulk changes"""
+    """Shows all students in a particular year and allows bulk changes
+
+    The list is filtered, sorted and paged in the database, see
+    main.student_lists.
+    """
     if request.method == 'POST':
-        selected_students = request.POST.getlist('selected_student_id')
-        selected_option = request.POST.__getitem__('modify')
-        selected = selected_option.split('_')
-        if selected[0] == 'tutor':
-            tutor = User.objects.get(id=selected[1])
-            for student_id in selected_students:
-                student = Student.objects.get(student_id=student_id)
-                student.tutor = tutor
-                student.save()
-        elif selected[0] == 'qld':
-            if selected[1] == 'on':
-                for student_id in selected_students:
-                    student = Student.objects.get(student_id=student_id)
-                    student.qld = True
-                    student.save()
-            elif selected[1] == 'off':
-                for student_id in selected_students:
-                    student = Student.objects.get(student_id=student_id)
-                    student.qld = False
-                    student.save()
-        elif selected[0] == 'course':
-            course = Course.objects.get(title=selected[1])
-            for student_id in selected_students:
-                student = Student.objects.get(student_id=student_id)
-                student.course = course
-                student.save()
-        elif selected[0] == 'since':
-            startyear = selected[1]
-            for student_id in selected_students:
-                student = Student.objects.get(student_id=student_id)
-                student.since = startyear
-                student.save()
-        elif selected[0] == 'year':
-            for student_id in selected_students:
-                student = Student.objects.get(student_id=student_id)
-                student.year = selected[1]
-                student.save()
-        elif selected[0] == 'active':
-            if selected[1] == 'yes':
-                for student_id in selected_students:
-                    student = Student.objects.get(student_id=student_id)
-                    student.active = True
-                    student.save()
-            elif selected[1] == 'no':
-                for student_id in selected_students:
-                    student = Student.objects.get(student_id=student_id)
-                    student.active = False
-                    student.save()
-        elif selected[0] == 'delete':
-            if selected[1] == 'yes':
-                for student_id in selected_students:
-                    student = Student.objects.get(student_id=student_id)
-                    performances = Performance.objects.filter(student=student)
-                    for performance in performances:
-                        for result in performance.assessment_results.all():
-                            try:
-                                for feedback in result.feedback.all():
-                                    feedback.delete()
-                            except AttributeError:
-                                pass
-                            result.delete()
-                        performance.delete()
-                    student.delete()
-            if selected[1] == 'no':
-                pass
-        return redirect(reverse('year_view', args=[str(year)]))
+        summary = student_actions.apply_action(
+            request.POST.getlist('selected_student_id'),
+            request.POST['modify']
+        )
+        messages.success(request, summary, fail_silently=True)
+        return redirect(request.get_full_path())
     if year.startswith('imported_'):
-        data = Data.objects.get(id=year)
-        student_ids = data.value.split(',')
+        try:
+            student_ids = staging.load(year).split(',')
+        except Data.DoesNotExist:
+            return upload_expired(request)
         students = Student.objects.filter(student_id__in=student_ids)
         headline = 'Recently Added Students'
         courses = Course.objects.all()
         show_year = True
     else:
+        if year == 'all':
+            students = Student.objects.filter(active=True)
+        elif year == 'unassigned':
+            students = Student.objects.filter(year=None, active=True)
+        elif year == 'inactive':
+            students = Student.objects.filter(active=False)
+        else:
+            students = Student.objects.filter(year=year, active=True)
         if request.user.staff.main_admin:
-            if year == 'all':
-                students = Student.objects.filter(active=True)
-            elif year == 'unassigned':
-                students = Student.objects.filter(year=None, active=True)
-            elif year == 'inactive':
-                students = Student.objects.filter(active=False)
-            else:
-                students = Student.objects.filter(year=year, active=True)
             courses = Course.objects.all()
         else:
-            staff_subject_areas = (
-                request.user.staff.subject_areas.all().values('name'))
-            if year == 'all':
-                students = Student.objects.filter(
-                    active=True,
-                    course__subject_areas__name__in=staff_subject_areas
-                )
-            elif year == 'unassigned':
-                students = Student.objects.filter(
-                    active=True,
-                    course__subject_areas__name__in=staff_subject_areas,
-                    year=None
-                )
-            elif year == 'inactive':
-                students = Student.objects.filter(
-                    active=False,
-                    course__subject_areas__name__in=staff_subject_areas,
-                )
-            else:
-                students = Student.objects.filter(
-                    active=True,
-                    course__subject_areas__name__in=staff_subject_areas,
-                    year=year
-                )
             courses = Course.objects.filter(
-                subject_areas__name__in=staff_subject_areas)
+                subject_areas__in=request.user.staff.subject_areas.all()
+            ).distinct()
+            students = students.filter(course__in=courses)
         if year == 'all':
             headline = 'All Students'
             show_year = True
@@ -891,7 +815,7 @@ def year_view(request, year):
             headline = 'Year ' + year
             show_year = False
     academic_years = []
-    current_year = int(Setting.objects.get(name='current_year').value)
+    current_year = db_settings.current_year
     latest_start_year = current_year + 2
     for academic_year in ACADEMIC_YEARS:
         if academic_year[0] < latest_start_year:
@@ -903,19 +827,60 @@ def year_view(request, year):
             edit = True
         else:
             edit = False
-    number_of_students = len(students)
+    student_tutors = Staff.objects.filter(
+        pk__in=students.values('tutor')).select_related('user')
+    students, filters = student_lists.filter_students(students, request.GET)
+    number_of_students = students.count()
+    descending = request.GET.get('order') == 'desc'
+    page = student_lists.StudentPage(
+        students,
+        sort=request.GET.get('sort', 'name'),
+        descending=descending,
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    path = request.path
+    listed = dict(filters)
+    if page.sort != 'name':
+        listed['sort'] = page.sort
+    if descending:
+        listed['order'] = 'desc'
+    sort_urls = {}
+    for column in student_lists.SORTS:
+        if column == page.sort and not descending:
+            order = 'desc'
+        else:
+            order = None
+        sort_urls[column] = student_lists.query_url(
+            path, filters, sort=column, order=order)
+    next_url = previous_url = None
+    if page.next_cursor():
+        next_url = student_lists.query_url(
+            path, listed, after=page.next_cursor())
+    if page.previous_cursor():
+        previous_url = student_lists.query_url(
+            path, listed, before=page.previous_cursor())
     return render(
         request,
         'year_view.html',
         {
-            'students': students,
+            'students': page.students,
             'headline': headline,
             'show_year': show_year,
             'academic_years': academic_years,
             'courses': courses,
+            'tutors': student_tutors,
             'edit': edit,
             'year': year,
-            'number_of_students': number_of_students
+            'number_of_students': number_of_students,
+            'filters': filters,
+            'sort': page.sort,
+            'descending': descending,
+            'sort_urls': sort_urls,
+            'next_url': next_url,
+            'previous_url': previous_url,
+            'first_url': student_lists.query_url(path, listed),
+            'path': path
         }
     )
 
@@ -923,44 +888,43 @@ def year_view(request, year):
 @login_required
 @user_passes_test(is_staff)
 def assign_tutors(request, subject_area, year):
-    """Allows admin or PD to assign tutees to tutors"""
+    """Allows admin or PD to assign tutees to tutors
+
+    The tutors can be chosen one by one, or the students without a tutor
+    can be spread evenly across all tutors of the subject area.
+    """
     if is_admin(request.user) or request.user.staff.programme_director:
         subject_area = SubjectArea.objects.get(slug=subject_area)
-        all_students = Student.objects.filter(active=True, year=int(year))
-        students = []
-        for student in all_students:
-            if subject_area in student.course.subject_areas.all():
-                students.append(student)
+        students = Student.objects.cohort(
+            subject_area, int(year)).select_related('tutor__user')
+        teachers = tutors.tutor_workload(subject_area)
 
         if request.method == 'POST':
+            if 'allocate' in request.POST:
+                assignments = tutors.allocate(
+                    list(students),
+                    list(teachers),
+                    keep_existing='reassign' not in request.POST,
+                    mix_courses='mix_courses' in request.POST
+                )
+                tutors.save_tutors(assignments)
+                messages.success(
+                    request,
+                    'Assigned tutors to %s students.' % (len(assignments)),
+                    fail_silently=True
+                )
+                return redirect(request.get_full_path())
+            staff = dict(teachers.values_list('user__username', 'pk'))
+            assignments = {}
             for student in students:
                 if student.student_id in request.POST:
-                    if request.POST[student.student_id]:
-                        user = User.objects.get(
-                            username=request.POST[student.student_id])
-                        student.tutor = user.staff
-                        student.save()
-                    else:
-                        student.tutor = None
-                        student.save()
+                    tutor = staff.get(request.POST[student.student_id])
+                    if tutor != student.tutor_id:
+                        assignments[student.student_id] = tutor
+            tutors.save_tutors(assignments)
             return redirect(reverse('admin'))
 
         else:
-
-            all_teachers = Staff.objects.filter(role="teacher")
-            teachers = []
-            for teacher in all_teachers:
-                if subject_area in teacher.subject_areas.all():
-                    y_1 = teacher.tutees.filter(year=1).count()
-                    y_2 = teacher.tutees.filter(year=2).count()
-                    y_3 = teacher.tutees.filter(year=3).count()
-                    number = y_1 + y_2 + y_3
-                    teacher_tpl = (
-                        teacher.user.username,
-                        teacher.name(),
-                        number
-                    )
-                    teachers.append(teacher_tpl)
             return render(
                 request,
                 'assign_tutors.html',
@@ -974,40 +938,40 @@ def assign_tutors(request, subject_area, year):
 @user_passes_test(is_staff)
 def all_attendances(request, subject_area, year):
     subject_area = SubjectArea.objects.get(slug=subject_area)
-    all_students = Student.objects.filter(active=True, year=year)
-    current_year = int(Setting.objects.get(name="current_year").value)
+    current_year = db_settings.current_year
     rows = []
     weeks = WEEKS_TO_LOOK_AT
     admin_name = request.user.staff.name()
-    for student in all_students:
-        if subject_area in student.course.subject_areas.all():
-            performances = Performance.objects.filter(
-                student=student, module__year=current_year)
-            problems = []
-            attendances = []
-            row = {}
-            for performance in performances:
-                if performance.missed_the_last_two_sessions():
-                    attendancestr = performance.count_attendance()
-                    attendancestr = attendancestr.replace('/', ' of ')
-                    problems.append((performance.module.title, attendancestr))
-                attendance = [performance.module.link()]
-                attendance_dict = performance.attendance_as_dict()
-                for week in weeks:
-                    if str(week) in attendance_dict:
-                        attendance.append(attendance_dict[str(week)])
-                    else:
-                        attendance.append('')
-                attendances.append(attendance)
-            row['student'] = student
-            row['attendances'] = attendances
-            if problems:
-                row['message'] = attendance_email(
-                    student, problems, admin_name)
+    attendance = cohort_attendance(subject_area, year, current_year, weeks)
+    students = Student.objects.cohort(
+        subject_area, year).select_related('tutor__user')
+    for student in students:
+        modules = attendance.get(student.student_id, [])
+        problems = []
+        attendances = []
+        row = {}
+        for module in modules:
+            if module['at_risk']:
+                problems.append((
+                    module['title'],
+                    '%s of %s' % (module['present'], module['sessions'])
+                ))
+            link = format_html(
+                '<a href="{}">{}</a>', module['url'], module['title'])
+            if module['percentage'] is None:
+                percentage = ''
             else:
-                row['message'] = ''
-            row['counter'] = (len(performances) + 1)
-            rows.append(row)
+                percentage = '%s%%' % (module['percentage'])
+            attendances.append([link] + module['weeks'] + [percentage])
+        row['student'] = student
+        row['attendances'] = attendances
+        if problems:
+            row['message'] = attendance_email(
+                student, problems, admin_name)
+        else:
+            row['message'] = ''
+        row['counter'] = (len(modules) + 1)
+        rows.append(row)
     return render(
         request,
         'all_attendances.html',
@@ -1056,7 +1020,7 @@ def my_tutees(request):
         row['student'] = tutee
         if not tutee.active:
             row['inactive'] = True
-        current_year = int(Setting.objects.get(name="current_year").value)
+        current_year = db_settings.current_year
         performances = Performance.objects.filter(
             student=tutee, module__year=current_year)
         problems = []
@@ -1107,27 +1071,21 @@ def my_tutees(request):
 @user_passes_test(is_pd)
 def all_tutee_meetings(request, subject_area, year):
     subject_area = SubjectArea.objects.get(slug=subject_area)
-    all_students = Student.objects.filter(active=True, year=year)
-    students = []
-    for student in all_students:
-        if subject_area in student.course.subject_areas.all():
-            students.append(student)
-    rows = []
+    students = Student.objects.cohort(
+        subject_area, year).select_related('tutor__user')
+    sessions = {}
+    for session in TuteeSession.objects.filter(
+            tutee__in=students.values('student_id')).select_related('tutee'):
+        sessions.setdefault(session.tutee_id, []).append(session)
     max_columns = 0
-    for student in students:
-        meetings = TuteeSession.objects.filter(tutee=student).count()
-        if meetings > max_columns:
-            max_columns = meetings
+    for student_sessions in sessions.values():
+        max_columns = max(max_columns, len(student_sessions))
+    rows = []
     for student in students:
         row = {}
         row['student'] = student
-        sessions = TuteeSession.objects.filter(tutee=student)
-        row['sessions'] = []
-        for counter in range(0, max_columns):
-            try:
-                row['sessions'].append(sessions[counter])
-            except IndexError:
-                row['sessions'].append(None)
+        row['sessions'] = sessions.get(student.student_id, [])
+        row['sessions'] += [None] * (max_columns - len(row['sessions']))
         rows.append(row)
     return render(
         request,
@@ -1145,10 +1103,8 @@ def all_tutee_meetings(request, subject_area, year):
 @user_passes_test(is_admin)
 def tutor_list_by_student(request, subject_area, year):
     subject_area = SubjectArea.objects.get(slug=subject_area)
-    students = []
-    for student in Student.objects.filter(year=year, active=True):
-        if subject_area in student.course.subject_areas.all():
-            students.append(student)
+    students = Student.objects.cohort(
+        subject_area, year).select_related('tutor__user')
     return render(request, 'tutor_list_by_student.html', {'students': students})
 
 @login_required
@@ -1199,70 +1155,18 @@ def tutor_list(request, subject_area, year):
 def enter_student_progression(request, subject_area, year=None):
     """Allows to set the student's path into the next year"""
     subject_area = SubjectArea.objects.get(slug=subject_area)
-    students = []
-    if year:
-        all_students = Student.objects.filter(active=True, year=year)
-        for student in all_students:
-            if subject_area in student.course.subject_areas.all():
-                students.append(student)
-    else:
-         for student in Student.objects.all():
-             if student.year in [1, 2, 3] and student.next_year is None:
-                 students.append(student)
     if request.method == 'POST':
-        for student in students:
-            if student.student_id in request.POST:
-                student.next_year = request.POST[student.student_id]
-                student.save()
+        student_ids = progression.cohort(
+            subject_area, year).values_list('student_id', flat=True)
+        options = dict(Student.NEXT_YEAR_OPTIONS)
+        decisions = {}
+        for student_id in student_ids:
+            if request.POST.get(student_id) in options:
+                decisions[student_id] = {
+                    'next_year': request.POST[student_id]}
+        progression.save_decisions(decisions)
         return redirect(reverse('admin'))
-    current_year = int(Setting.objects.get(name="current_year").value)
-    next_year = current_year + 1
-    next_academic_year = academic_year_string(next_year)
-    student_dict = OrderedDict()
-    for student in students:
-        this_dict = {}
-        this_dict['good'] = []
-        this_dict['bad'] = []
-        for performance in student.performances.all():
-            if performance.belongs_to_year == student.year:
-                if performance.average < PASSMARK:
-                    this_dict['bad'].append(performance)
-                else:
-                    this_dict['good'].append(performance)
-        default = False
-        student_options = ['<option>Please choose one</option>']
-        if student.next_year:
-            default = student.next_year
-        elif this_dict['bad']:
-            student_options = ['<option selected>Please choose one</option>']
-        else:
-            default = 'PP'
-        for option in student.NEXT_YEAR_OPTIONS:
-            use = False
-            if student.year == 1:
-                if option[0] not in ['1', '21', '22', '3', 'C', 'D']:
-                    use = True
-            elif student.year == 2:
-                if option[0] not in ['1', '21', '22', '3', 'D']:
-                    use = True
-            elif student.year == 3:
-                if option[0] not in ['PP', 'PT', 'PC', 'C']:
-                    use = True
-            if use:
-                option_string = '<option value="'
-                option_string += option[0]
-                if option[0] == default:
-                    option_string += '" selected'
-                else:
-                    option_string += '"'
-                option_string += (
-                        '>' +
-                        option[1] +
-                        '</option>'
-                )
-                student_options.append(option_string)
-        this_dict['options'] = student_options
-        student_dict[student] = this_dict
+    next_academic_year = academic_year_string(db_settings.current_year + 1)
     if year:
         level = int(year) + 3
     else:
@@ -1271,7 +1175,7 @@ def enter_student_progression(request, subject_area, year=None):
         request,
         'enter_student_progression.html',
         {
-            'student_dict': student_dict,
+            'board': progression.progression_board(subject_area, year),
             'next_academic_year': next_academic_year,
             'level': level
         }
@@ -1282,120 +1186,31 @@ def enter_student_progression(request, subject_area, year=None):
 @user_passes_test(is_main_admin)
 def proceed_to_next_year(request):
     """Transfers all UG students into the next year
-    
+
     The decisions per students need to be taken within
-    enter_student_progression.
+    enter_student_progression. A GET only shows what would happen to
+    every student; the form on that page posts the year it was shown for,
+    and nothing happens if that is no longer the current year.
     """
-    db_year = Setting.objects.get(name="current_year")
-    current_year = int(db_year.value)
-    for year in [3, 2, 1]:
-        for student in Student.objects.filter(active=True, year=year):
-            if student.next_year in ['1', '21', '22', '3', 'D', 'C', 'O', 'WD']:
-                if student.next_year == '1':
-                    student.achieved_degree = 1
-                elif student.next_year == '21':
-                    student.achieved_degree = 21
-                elif student.next_year == '22':
-                    student.achieved_degree = 22
-                elif student.next_year == '3':
-                    student.achieved_degree = 3
-                elif student.next_year == 'D':
-                    student.achieved_degree = 6
-                elif student.next_year == 'C':
-                    student.achieved_degree = 7
-                elif student.next_year == 'O':
-                    student.achieved_degree = 5
-                elif student.next_year == 'WD':
-                    student.achieved_degree = 8
-                student.year = 9
-                student.graduated_in = current_year
-            elif student.next_year in ['PP', 'PQ', 'PT', 'PC']:
-                if student.is_part_time:
-                    if student.second_part_time_year:
-                        student.year = student.year + 1
-                        student.second_part_time_year = False
-                    else:
-                        student.second_part_time_year = True
-                else:
-                    student.year = student.year + 1
-                comment = ''
-                if student.next_year == 'PQ':
-                    qld_failures = []
-                    for performance in student.performances.filter(
-                            belongs_to_year=year):
-                        if performance.module.foundational:
-                            eligible = performance.qld_failures_after_resit()
-                            for result in eligible:
-                                assessment = result.assessment
-                                module = performance.module
-                                resit_str = (
-                                    module.title +
-                                    ' (' +
-                                    assessment.title +
-                                    ')'
-                                )
-                                qld_failures.append(resit_str)
-                    if qld_failures:
-                        comment += (
-                            'In Year ' +
-                            str(student.year) +
-                            ', ' +
-                            student.first_name +
-                            ' will have to resit '
-                        )
-                        qld_str = '; '.join(qld_failures)
-                        comment += qld_str
-                        comment += ' for QLD purposes'
-                elif student.next_year == 'PT':
-                    failures = []
-                    for performance in student.performances.filter(
-                            belongs_to_year=year):
-                        for result in performance.failures_after_resit():
-                            resit_str = (
-                                performance.module.title +
-                                ' (' +
-                                result.assessment.title +
-                                ')'
-                            )
-                            failures.append(resit_str)
-                    if failures:
-                        comment += (
-                            'In Year ' +
-                            str(student.year) +
-                            ', ' +
-                            student.first_name +
-                            ' will have to resit '
-                        )
-                        failure_str = '; '.join(failures)
-                        comment += failure_str
-                        comment += ' (trailed)'
-                elif student.next_year == 'PC':
-                    for performance in student.performances.filter(
-                            belongs_to_year=year):
-                        if performance.average < PASSMARK:
-                            comment += (
-                                'Failure in ' +
-                                performance.module.title +
-                                ' (' +
-                                str(performance.real_average) +
-                                ') has been compensated'
-                            )
-                if student.notes:
-                    student.notes += "\n\n"
-                student.notes += comment
-            elif student.next_year in ['R', 'ABSJ']:
-                if student.next_year == 'R':
-                    comments = 'Repeated Year %s' %(year)
-                else:
-                    comments = 'Repeated Year %s ABSJ' %(year)
-                if student.notes:
-                    student.notes += "\n\n"
-                student.notes += comments
-            student.next_year = None
-            student.save()
-    db_year.value = str(current_year + 1)
-    db_year.save()
-    return redirect(reverse('home'))
+    if request.method == 'POST':
+        expected_year = request.POST.get('current_year', '')
+        if not expected_year.isdigit():
+            return redirect(reverse('proceed_to_next_year'))
+        try:
+            rollover.roll_over(int(expected_year))
+        except rollover.YearChanged:
+            messages.error(
+                request,
+                'The year has already been changed, nothing has been done.',
+                fail_silently=True
+            )
+            return redirect(reverse('admin'))
+        return redirect(reverse('home'))
+    return render(
+        request,
+        'rollover_preview.html',
+        {'rollover': rollover.Rollover(db_settings.current_year)}
+    )
 
 
 # Module views
@@ -1462,24 +1277,9 @@ def add_or_edit_module(request, code=None, year=None):
 def module_view(request, code, year):
     """Shows all information about a module"""
     module = Module.objects.get(code=code, year=year)
-    performances = Performance.objects.filter(
-        module=module, student__active=True)
-    seminar_groups = []
-    resit_required = False
-    qld_resit_required = False
-    for performance in performances:
-        if not resit_required:
-            if 'r' in performance.results_eligible_for_resit().values():
-                resit_required = True
-        if not qld_resit_required:
-            if 'q' in performance.results_eligible_for_resit().values():
-                qld_resit_required = True
-        if performance.seminar_group:
-            if performance.seminar_group not in seminar_groups:
-                seminar_groups.append(performance.seminar_group)
-    seminar_groups.sort()
+    grid = module_mark_grid(module)
     seminar_group_links = []
-    for seminar_group in seminar_groups:
+    for seminar_group in grid['seminar_groups']:
         seminar_group_links.append(
             (seminar_group, module.get_attendance_url(seminar_group))
         )
@@ -1497,11 +1297,11 @@ def module_view(request, code, year):
         'module_view.html',
         {
             'module': module,
-            'performances': performances,
+            'rows': grid['rows'],
             'seminar_group_links': seminar_group_links,
             'admin_or_instructor': admin_or_instructor,
-            'resit_required': resit_required,
-            'qld_resit_required': qld_resit_required,
+            'resit_required': grid['resit_required'],
+            'qld_resit_required': grid['qld_resit_required'],
         }
     )
 
@@ -1511,7 +1311,7 @@ def module_view(request, code, year):
 def add_students_to_module(request, code, year):
     """Simple form to add students to a module and create Performance items"""
     module = Module.objects.get(code=code, year=year)
-    current_year = int(Setting.objects.get(name="current_year").value)
+    current_year = db_settings.current_year
     if request.method == 'POST':
         students_to_add = request.POST.getlist('student_ids')
         for student_id in students_to_add:
@@ -1600,27 +1400,10 @@ def delete_module(request, code, year):
 def address_nines(request, code, year):
     module = Module.objects.get(code=code, year=year)
     if request.method == 'POST':
-        for performance in Performance.objects.filter(module=module):
-            if performance.student.active:
-                for assessment in module.assessments.all():
-                    field_id = (
-                        'mark_' +
-                        assessment.slug +
-                        '_' +
-                        performance.student.student_id
-                    )
-                    if field_id in request.POST and request.POST[field_id]:
-                        raw = request.POST[field_id]
-                        try:
-                            mark = int(raw)
-                            if mark in range(0, 100):
-                                performance.set_assessment_result(
-                                    assessment.slug,
-                                    mark,
-                                    'first'
-                                )
-                        except ValueError:
-                            pass
+        for assessment in module.assessments.all():
+            marks = marks_from_post(
+                request.POST, 'mark_' + assessment.slug + '_')
+            enter_marks(assessment, marks, 'first')
         return redirect(module.get_absolute_url())
     else:
         slugs = []
@@ -1951,19 +1734,14 @@ def attendance(request, code, year, group):
     """The registers for the seminar groups or the whole module"""
     module = Module.objects.get(code=code, year=year)
     group = str(group)
+    performances = Performance.objects.filter(
+        module=module, student__active=True).select_related('student')
     if group == 'all':
-        all_performances = Performance.objects.filter(module=module)
         seminar_group = False
     else:
-        all_performances = Performance.objects.filter(
-            module=module,
-            seminar_group=group
-        )
+        performances = performances.filter(seminar_group=group)
         seminar_group = group
-    performances = []
-    for performance in all_performances:
-        if performance.student.active:
-            performances.append(performance)
+    performances = list(performances)
     if request.method == 'POST':
         save = request.POST['save']
         save_li = save.split()
@@ -1971,30 +1749,42 @@ def attendance(request, code, year, group):
         for word in save_li:
             if word.isdigit():
                 check = word
+        weeks = []
+        for week in module.all_teaching_weeks():
+            if check == 'all' or str(week) == check:
+                weeks.append(str(week))
+        register = {}
         for performance in performances:
             student_id = performance.student.student_id
-            for week in module.all_teaching_weeks():
-                week = str(week)
+            cells = {}
+            for week in weeks:
                 key = student_id + '_' + week
                 if key in request.POST:
-                    presence = request.POST[key]
-                    if check == 'all':
-                        performance.save_attendance(week, presence)
-                    else:
-                        if week == check:
-                            performance.save_attendance(week, presence)
+                    cells[week] = request.POST[key]
+            register[performance.pk] = cells
+        save_register(register)
         return redirect(module.get_absolute_url())
-    current_year = int(Setting.objects.get(name="current_year").value)
+    current_year = db_settings.current_year
     if module.year == current_year:
         this_week = week_number()
     else:
         this_week = False
+    weeks = module.all_teaching_weeks()
+    attendance = read_attendance(performances)
+    rows = []
+    for performance in performances:
+        recorded = attendance[performance.pk]
+        rows.append({
+            'student': performance.student,
+            'cells': [(week, recorded.get(week)) for week in weeks]
+        })
     return render(
         request,
         'attendance.html',
         {
             'seminar_group': seminar_group,
-            'performances': performances,
+            'rows': rows,
+            'weeks': weeks,
             'module': module,
             'this_week': this_week
         }
@@ -2022,6 +1812,7 @@ def assessment(request, code, year, slug=None):
             assessment = form.save()
             assessment.module = module
             assessment.save()
+            recalculate_module_averages(module)
             return redirect(module.get_assessment_url())
     else:
         if edit:
@@ -2058,6 +1849,7 @@ def delete_assessment(request, code, year, slug):
     for result in results:
         result.delete()
     assessment.delete()
+    recalculate_module_averages(module)
     return redirect(module.get_assessment_url())
 
 
@@ -2160,21 +1952,7 @@ def mark_all(request, code, year, slug, attempt):
     module = Module.objects.get(code=code, year=year)
     assessment = Assessment.objects.get(module=module, slug=slug)
     if request.method == 'POST':
-        for performance in Performance.objects.filter(module=module):
-            if performance.student.active:
-                field_id = 'mark_' + performance.student.student_id
-                if field_id in request.POST and request.POST[field_id]:
-                    raw = request.POST[field_id]
-                    try:
-                        mark = int(raw)
-                        if mark in range(0, 100):
-                            performance.set_assessment_result(
-                                assessment.slug,
-                                mark,
-                                attempt
-                            )
-                    except ValueError:
-                        pass
+        enter_marks(assessment, marks_from_post(request.POST), attempt)
         return redirect(module.get_absolute_url())
     else:
         slugs = []
@@ -2185,27 +1963,9 @@ def mark_all(request, code, year, slug, attempt):
         if attempt == 'first':
             performances = Performance.objects.filter(module=module)
         elif attempt == 'resit':
-            performances = []
-            for performance in Performance.objects.filter(module=module):
-                keep = False
-                eligible = performance.results_eligible_for_resit()
-                for result in eligible:
-                    if eligible[result] == 'r':
-                        if result.assessment == assessment:
-                            keep = True
-                if keep:
-                    performances.append(performance)
+            performances = module.performances_with_resit(assessment, 'r')
         elif attempt == 'qld_resit':
-            performances = []
-            for performance in Performance.objects.filter(module=module):
-                keep = False
-                eligible = performance.results_eligible_for_resit()
-                for result in eligible:
-                    if eligible[result] == 'q':
-                        if result.assessment == assessment:
-                            keep = True
-                if keep:
-                    performances.append(performance)
+            performances = module.performances_with_resit(assessment, 'q')
         for performance in performances:
             if performance.student.active:
                 row = [performance.student.name(), ]
@@ -2281,49 +2041,22 @@ def mark_all_anonymously(request, code, year, slug, attempt):
     module = Module.objects.get(code=code, year=year)
     assessment = Assessment.objects.get(module=module, slug=slug)
     if request.method == 'POST':
-        for performance in Performance.objects.filter(module=module):
-            if performance.student.active and performance.student.exam_id:
-                field_id = 'mark_' + performance.student.exam_id
-                if field_id in request.POST and request.POST[field_id]:
-                    raw = request.POST[field_id]
-                    try:
-                        mark = int(raw)
-                        if mark in range(0, 100):
-                            performance.set_assessment_result(
-                                assessment.slug,
-                                mark,
-                                attempt
-                            )
-                    except ValueError:
-                        pass
+        enter_marks(
+            assessment,
+            marks_from_post(request.POST),
+            attempt,
+            anonymous=True
+        )
         return redirect(module.get_absolute_url())
     rows = []
     students_without_id = []
-    admin_email = Setting.objects.get(name='admin_email').value
+    admin_email = db_settings.admin_email
     if attempt == 'first':
         performances = Performance.objects.filter(module=module)
     elif attempt == 'resit':
-        performances = []
-        for performance in Performance.objects.filter(module=module):
-            keep = False
-            eligible = performance.results_eligible_for_resit()
-            for result in eligible:
-                if eligible[result] == 'r':
-                    if result.assessment == assessment:
-                        keep = True
-            if keep:
-                performances.append(performance)
+        performances = module.performances_with_resit(assessment, 'r')
     elif attempt == 'qld_resit':
-        performances = []
-        for performance in Performance.objects.filter(module=module):
-            keep = False
-            eligible = performance.results_eligible_for_resit()
-            for result in eligible:
-                if eligible[result] == 'q':
-                    if result.assessment == assessment:
-                        keep = True
-            if keep:
-                performances.append(performance)
+        performances = module.performances_with_resit(assessment, 'q')
     for performance in performances:
         if performance.student.active:
             if performance.student.exam_id:
@@ -2374,15 +2107,8 @@ def mark_all_anonymously(request, code, year, slug, attempt):
 @user_passes_test(is_admin)
 def edit_exam_ids(request, subject_slug, year):
     """Allows manual editing of anonymous IDs"""
-    all_students = Student.objects.filter(active=True, year=year)
     subject_area = SubjectArea.objects.get(slug=subject_slug)
-    students = []
-    for student in all_students:
-        if (
-                student.course and
-                subject_area in student.course.subject_areas.all()
-        ):
-            students.append(student)
+    students = Student.objects.cohort(subject_area, year)
     if request.method == 'POST':
         for student in students:
             if (
@@ -2503,170 +2229,74 @@ def concessions(request, code, year, attempt):
 @login_required
 @user_passes_test(is_staff)
 def upload_csv(request):
-    """Upload CSV, saves result in session and redirects to parser"""
+    """Upload CSV, stages the parsed rows and redirects to parser"""
     if request.method == 'POST':
         form = CSVUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            f = request.FILES['csvfile']
-            f.read()
-            csv_string = ''
-            for line in f:
-                csv_string += line.decode('utf-8') + '/////'
-            chars = ascii_letters + digits
-            data_id = ''
-            while data_id == '':
-                data_id = ''.join(choice(chars) for x in range(16))
-                try:
-                    Data.objects.create(id=data_id, value=csv_string)
-                except IntegrityError:
-                    data_id = ''
+            data_id = importer.stage_csv(request.FILES['csvfile'])
             return redirect(reverse('parse_csv', args=[data_id]))
     else:
         form = CSVUploadForm()
     return render(request, 'upload_csv.html', {'form': form})
 
 
+def upload_expired(request):
+    """Sends the user back to upload_csv if a staged file has expired"""
+    messages.error(
+        request,
+        'This import has expired, please upload the file again.',
+        fail_silently=True
+    )
+    return redirect(reverse('upload_csv'))
+
+
 @login_required
 @user_passes_test(is_staff)
 def parse_csv(request, data_id):
-    """Parses CSV Files with Student data, creates / amends Students"""
-    data = Data.objects.get(id=data_id)
-    importdata = data.value.split('/////')
-    table = []
-    no_of_columns = 0
-    for line in importdata:
-        row = line.split(';')
-        if len(row) > no_of_columns:
-            no_of_columns = len(row)
-        table.append(row)
+    """Parses CSV Files with Student data, creates / amends Students
+
+    With 'preview' in the POST data, the changes are only shown.
+    """
+    try:
+        table = importer.staged_rows(data_id)
+    except Data.DoesNotExist:
+        return upload_expired(request)
+    no_of_columns = max([len(row) for row in table] or [0])
     if request.method == "POST":
-        all_ids = ''
-        list_of_columns = []
-        i = 1
-        while i <= no_of_columns:
-            column = 'column' + str(i)
-            list_of_columns.append(request.POST[column])
-            i += 1
-        item_in_table = 0
-        ignore_students = request.POST.getlist('exclude')
-        for row in table:
-            item_in_table += 1
-            if str(item_in_table) not in ignore_students:
-                result = {}
-                counter = 0
-                for entry in row:
-                    column = list_of_columns[counter]
-                    if column != 'ignore':
-                        result[column] = entry
-                    counter += 1
-                try:
-                    student = Student.objects.get(
-                        student_id=result['student_id']
-                    )
-                except Student.DoesNotExist:
-                    student = Student.objects.create(
-                        student_id=result['student_id']
-                    )
-                if 'first_name' in result:
-                    student.first_name = result['first_name']
-                if 'last_name' in result:
-                    student.last_name = result['last_name']
-                if 'since' in result:
-                    student.since = int(result['since'])
-                if 'year' in result:
-                    # Can contain other entries, so necessary to parse
-                    possible_years = ['1', '2', '3', '7', '8', '9']
-                    tmp = result['year'].split()
-                    for part in tmp:
-                        if part in possible_years:
-                            student.year = int(part)
-                            break
-                if 'email' in result:
-                    student.email = result['email']
-                if 'phone_number' in result:
-                    number = ''
-                    if result['phone_number'][0] not in ['0', '+']:
-                        number = '0' + result['phone_number']
-                    else:
-                        number = result['phone_number']
-                    student.phone_number = number
-                if 'cell_number' in result:
-                    number = ''
-                    if not result['cell_number'].startswith('0'):
-                        number = '0' + result['cell_number']
-                    else:
-                        number = result['cell_number']
-                    student.cell_number = number
-                if 'permanent_email' in result:
-                    student.permanent_email = result['permanent_email']
-                if 'achieved_degree' in result:
-                    student.achieved_degree = result['achieved_degree']
-                address_fields = [
-                    'address1'
-                    'address2',
-                    'address3',
-                    'address4',
-                    'address5'
-                ]
-                if any(k in result for k in address_fields):
-                    student.address = ""
-                    for field in address_fields:
-                        if field in result:
-                            student.address += result[field] + '\n'
-                home_address_fields = [
-                    'home_address1'
-                    'home_address2',
-                    'home_address3',
-                    'home_address4',
-                    'home_address5'
-                ]
-                if any(k in result for k in home_address_fields):
-                    student.home_address = ''
-                    for field in home_address_fields:
-                        if field in result:
-                            student.home_address += result[field] + '\n'
-                all_ids += student.student_id + ','
-                student.save()
-        chars = ascii_letters + digits
-        data_id = 'imported_'
-        while data_id == 'imported_':
-            random_string = ''.join(choice(chars) for x in range(8))
-            data_id += random_string
-            try:
-                Data.objects.create(id=data_id, value=all_ids)
-            except IntegrityError:
-                data_id = 'imported_'
+        columns = [
+            request.POST['column' + str(i)]
+            for i in range(1, no_of_columns + 1)
+        ]
+        excluded = set(
+            int(number) for number in request.POST.getlist('exclude'))
+        by_student, errors = importer.import_values(table, columns, excluded)
+        diff = importer.ImportDiff(by_student, errors)
+        if 'preview' in request.POST:
+            choices = [
+                (key, value)
+                for key, values in request.POST.lists()
+                if key not in ['csrfmiddlewaretoken', 'preview']
+                for value in values
+            ]
+            return render(
+                request,
+                'import_preview.html',
+                {'diff': diff, 'choices': choices, 'data_id': data_id}
+            )
+        diff.apply()
+        if diff.errors:
+            messages.warning(
+                request, diff.error_summary(), fail_silently=True)
+        data_id = staging.store(
+            ','.join(diff.student_ids()), prefix='imported_', length=8)
         return redirect(reverse('year_view', args=[data_id]))
-    options = (
-        ('student_id', 'Student ID'),
-        ('first_name', 'First Name'),
-        ('last_name', 'Last Name'),
-        ('exam_id', 'Exam ID'),
-        ('since', 'Studying since'),
-        ('year', 'Year of Study'),
-        ('email', 'University email'),
-        ('phone_number', 'Phone Number'),
-        ('cell_number', 'Mobile Number'),
-        ('permanent_email', 'Private email'),
-        ('achieved_degree', 'Achieved degree'),
-        ('address1', 'Term time address line 1'),
-        ('address2', 'Term time address line 2'),
-        ('address3', 'Term time address line 3'),
-        ('address4', 'Term time address line 4'),
-        ('address5', 'Term time address line 5'),
-        ('home_address1', 'Home address line 1'),
-        ('home_address2', 'Home address line 2'),
-        ('home_address3', 'Home address line 3'),
-        ('home_address4', 'Home address line 4'),
-        ('home_address5', 'Home address line 5')
-    )
     return render(
         request,
         'parse_csv.html',
         {
             'columns': no_of_columns,
             'csv_list': table,
-            'options': options
+            'options': importer.COLUMNS
         }
     )
 
@@ -2674,7 +2304,16 @@ def parse_csv(request, data_id):
 @login_required
 @user_passes_test(is_staff)
 def export_attendance_sheet(request, code, year):
-    """Returns attendance sheets for a module."""
+    """Returns attendance sheets for a module.
+
+    With ?format=csv or ?format=json, the attendance is streamed as data.
+    """
+    export_format = request.GET.get('format')
+    if export_format in exports.FORMATS:
+        module = Module.objects.get(code=code, year=year)
+        header, rows = exports.attendance_sheet(module)
+        return exports.streaming_export(
+            header, rows, export_format, 'attendance_sheet')
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = (
         'attachment; filename=attendance_sheet.pdf')
@@ -2800,8 +2439,16 @@ def export_attendance_sheet(request, code, year):
 @login_required
 @user_passes_test(is_admin)
 def export_tier_4_attendance(request, slug, year):
-    """Gives a pdf listing the attendance of all Tier 4 students"""
+    """Gives a pdf listing the attendance of all Tier 4 students
+
+    With ?format=csv or ?format=json, the attendance is streamed as data.
+    """
     subject_area = SubjectArea.objects.get(slug=slug)
+    export_format = request.GET.get('format')
+    if export_format in exports.FORMATS:
+        header, rows = exports.tier_4_attendance(subject_area, year)
+        filename = 'tier_4_attendance_' + slug + '_' + year
+        return exports.streaming_export(header, rows, export_format, filename)
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = (
         'attachment; filename=tier_4_attendance_' +
@@ -2818,11 +2465,7 @@ def export_tier_4_attendance(request, slug, year):
     ac_year = year + '/' + next_year[-2:]
     heading = 'Tier 4 Attendance ' + subject_area.name + ' ' + ac_year
     elements.append(Paragraph(heading, styles['Heading1']))
-    all_students = Student.objects.filter(active=True, tier_4=True)
-    students = []
-    for student in all_students:
-        if subject_area in student.course.subject_areas.all():
-            students.append(student)
+    students = Student.objects.cohort(subject_area).filter(tier_4=True)
     for student in students:
         modules = {}
         performances = Performance.objects.filter(
@@ -3027,18 +2670,6 @@ def elements_for_module_mark_overview(
     return elements
 
 
-def logo():
-    """Returns the university logo, unless it is not available"""
-    styles = getSampleStyleSheet()
-    url = "https://cccu.tobiaskliem.de/static/images/cccu.jpg"
-    try:
-        image = Image(url, 2.45*inch, 1*inch)
-    except IOError:
-        image = Paragraph(
-            "Canterbury Christ Church University", styles['Heading1'])
-    return image
-
-
 def paragraph(text, bold=False):
     """Makes a platypus Paragraph out of a string"""
     if bold:
@@ -3063,12 +2694,18 @@ def export_marks_for_module(request, code, year):
     """Gives a useful sheet of all marks for the module.
 
     Students will be highlighted if they failed the module, or if a QLD
-    student failed a component in a Foundational module
+    student failed a component in a Foundational module. With ?format=csv
+    or ?format=json, the marks are streamed as data instead.
     """
     module = Module.objects.get(code=code, year=year)
-    response = HttpResponse(content_type='application/pdf')
     filename = module.title.replace(" ", "_")
-    filename += "_Marks_" + str(module.year) + ".pdf"
+    filename += "_Marks_" + str(module.year)
+    export_format = request.GET.get('format')
+    if export_format in exports.FORMATS:
+        header, rows = exports.module_marks(module)
+        return exports.streaming_export(header, rows, export_format, filename)
+    response = HttpResponse(content_type='application/pdf')
+    filename += ".pdf"
     responsestring = 'attachment; filename=' + filename
     response['Content-Disposition'] = responsestring
     doc = SimpleDocTemplate(response)
@@ -3090,8 +2727,28 @@ def export_marks_for_module(request, code, year):
 @login_required
 @user_passes_test(is_staff)
 def export_exam_board_overview(request, subject_slug, year, level):
+    """Queues the export of all marks of a level for the exam boards"""
+    levelstr = str(int(level) + 3)
+    filename = (
+        'Exam_Board_Module_Overview_Year_' +
+        academic_year_string(year) +
+        '_Level_' +
+        levelstr +
+        '.pdf'
+    )
+    job = queue_export(
+        request.user,
+        'exam_board_overview',
+        filename,
+        subject_slug,
+        year,
+        level
+    )
+    return redirect(job.get_absolute_url())
+
+
+def exam_board_overview_pdf(output, progress, subject_slug, year, level):
     """Exports all marks for all modules in a given year for exam boards"""
-    response = HttpResponse(content_type='application/pdf')
     levelstr = str(int(level) + 3)
     now = timezone.now()
     today = formatted_date(now)
@@ -3105,16 +2762,7 @@ def export_exam_board_overview(request, subject_slug, year, level):
         ':' +
         minute
     )
-    filename = (
-        'Exam_Board_Module_Overview_Year_' +
-        academic_year_string(year) +
-        '_Level_' +
-        levelstr +
-        '.pdf'
-    )
-    responsestring = 'attachment; filename=' + filename
-    response['Content-Disposition'] = responsestring
-    doc = SimpleDocTemplate(response)
+    doc = SimpleDocTemplate(output)
     doc.pagesize = landscape(A4)
     elements = []
     styles = getSampleStyleSheet()
@@ -3144,8 +2792,9 @@ def export_exam_board_overview(request, subject_slug, year, level):
     subtitle = Paragraph(tmp, styles['Heading3'])
     elements.append(subtitle)
     elements.append(PageBreak())
-    modules = Module.objects.filter(year=year)
-    for module in modules:
+    modules = list(Module.objects.filter(year=year))
+    for number, module in enumerate(modules):
+        progress(number, len(modules))
         if (
                 str(level) in module.eligible and
                 subject_area in module.subject_areas.all()
@@ -3159,15 +2808,35 @@ def export_exam_board_overview(request, subject_slug, year, level):
                 elements.append(element)
             elements.append(PageBreak())
     doc.build(elements)
-    return response
 
 
 
 @login_required
 @user_passes_test(is_staff)
 def export_resit_exam_board_overview(request, subject_slug, year, level):
+    """Queues the export of all marks of a level for the resit boards"""
+    levelstr = str(int(level) + 3)
+    filename = (
+        'Resit_Exam_Board_Module_Overview_Year_' +
+        academic_year_string(year) +
+        '_Level_' +
+        levelstr +
+        '.pdf'
+    )
+    job = queue_export(
+        request.user,
+        'resit_exam_board_overview',
+        filename,
+        subject_slug,
+        year,
+        level
+    )
+    return redirect(job.get_absolute_url())
+
+
+def resit_exam_board_overview_pdf(
+        output, progress, subject_slug, year, level):
     """Exports all marks for all modules in a given year for resit boards"""
-    response = HttpResponse(content_type='application/pdf')
     levelstr = str(int(level) + 3)
     now = timezone.now()
     today = formatted_date(now)
@@ -3181,16 +2850,7 @@ def export_resit_exam_board_overview(request, subject_slug, year, level):
         ':' +
         minute
     )
-    filename = (
-        'Resit_Exam_Board_Module_Overview_Year_' +
-        academic_year_string(year) +
-        '_Level_' +
-        levelstr +
-        '.pdf'
-    )
-    responsestring = 'attachment; filename=' + filename
-    response['Content-Disposition'] = responsestring
-    doc = SimpleDocTemplate(response)
+    doc = SimpleDocTemplate(output)
     doc.pagesize = landscape(A4)
     elements = []
     styles = getSampleStyleSheet()
@@ -3220,8 +2880,9 @@ def export_resit_exam_board_overview(request, subject_slug, year, level):
     subtitle = Paragraph(tmp, styles['Heading3'])
     elements.append(subtitle)
     elements.append(PageBreak())
-    modules = Module.objects.filter(year=year)
-    for module in modules:
+    modules = list(Module.objects.filter(year=year))
+    for number, module in enumerate(modules):
+        progress(number, len(modules))
         if (
                 str(level) in module.eligible and
                 subject_area in module.subject_areas.all()
@@ -3237,17 +2898,12 @@ def export_resit_exam_board_overview(request, subject_slug, year, level):
                 elements.append(Spacer(1, 20))
                 # elements.append(PageBreak())
     doc.build(elements)
-    return response
 
 
 @login_required
 @user_passes_test(is_staff)
 def export_problem_students(request, subject_slug, year, level):
-    """Gives an overview of all problematic students
-    
-    This includes everyone with a failed module, a concession or a QLD fail.
-    """
-    response = HttpResponse(content_type='application/pdf')
+    """Queues the overview of all problematic students of a level"""
     levelstr = str(int(level) + 3)
     filename = (
         'Problem_Results' +
@@ -3256,28 +2912,32 @@ def export_problem_students(request, subject_slug, year, level):
         levelstr +
         '.pdf'
     )
-    responsestring = 'attachment; filename=' + filename
-    response['Content-Disposition'] = responsestring
-    doc = SimpleDocTemplate(response)
+    job = queue_export(
+        request.user, 'problem_students', filename, subject_slug, year, level)
+    return redirect(job.get_absolute_url())
+
+
+def problem_students_pdf(output, progress, subject_slug, year, level):
+    """Gives an overview of all problematic students
+    
+    This includes everyone with a failed module, a concession or a QLD fail.
+    """
+    levelstr = str(int(level) + 3)
+    doc = SimpleDocTemplate(output)
     elements = []
     problem_performances = {}
-    current_year = int(Setting.objects.get(name="current_year").value)
+    current_year = db_settings.current_year
     subject_area = SubjectArea.objects.get(slug=subject_slug)
-    students = []
     if int(year) < current_year:
         difference = current_year - int(year)
         level = int(level) - difference
     else:
         level = int(level)
-    all_students = Student.objects.filter(active=True, year=level)
-    for student in all_students:
-        if (
-                student.course and
-                subject_area in student.course.subject_areas.all()
-        ):
-            students.append(student)
+    students = list(Student.objects.cohort(
+        subject_area, level).prefetch_related('performances__module'))
     problem_students = []
-    for student in students:
+    for number, student in enumerate(students):
+        progress(number, len(students))
         for performance in student.performances.all():
             if performance.module.year == int(year):
                 resit_required = performance.results_eligible_for_resit()
@@ -3361,14 +3021,35 @@ def export_problem_students(request, subject_slug, year, level):
             elements.append(t)
             elements.append(Spacer(1, 25))
     doc.build(elements)
-    return response
 
 
 @login_required
 @user_passes_test(is_staff)
 def export_all_marks(request, subject_slug, year, level):
+    """Queues the export of all marks of a level without highlights
+
+    With ?format=csv or ?format=json, the marks are streamed instead.
+    """
+    levelstr = str(int(level) + 3)
+    filename = (
+        'All_Module_Marks_' +
+        academic_year_string(year) +
+        '_Level_' +
+        levelstr
+    )
+    export_format = request.GET.get('format')
+    if export_format in exports.FORMATS:
+        subject_area = SubjectArea.objects.get(slug=subject_slug)
+        header, rows = exports.all_marks(subject_area, year, level)
+        return exports.streaming_export(header, rows, export_format, filename)
+    filename += '.pdf'
+    job = queue_export(
+        request.user, 'all_marks', filename, subject_slug, year, level)
+    return redirect(job.get_absolute_url())
+
+
+def all_marks_pdf(output, progress, subject_slug, year, level):
     """Exports all marks for all modules in a given year without highlight"""
-    response = HttpResponse(content_type='application/pdf')
     levelstr = str(int(level) + 3)
     now = timezone.now()
     today = formatted_date(now)
@@ -3382,16 +3063,7 @@ def export_all_marks(request, subject_slug, year, level):
         ':' +
         minute
     )
-    filename = (
-        'All_Module_Marks_' +
-        academic_year_string(year) +
-        '_Level_' +
-        levelstr +
-        '.pdf'
-    )
-    responsestring = 'attachment; filename=' + filename
-    response['Content-Disposition'] = responsestring
-    doc = SimpleDocTemplate(response)
+    doc = SimpleDocTemplate(output)
     elements = []
     styles = getSampleStyleSheet()
     problem_performances = []
@@ -3420,8 +3092,9 @@ def export_all_marks(request, subject_slug, year, level):
     subtitle = Paragraph(tmp, styles['Heading3'])
     elements.append(subtitle)
     elements.append(PageBreak())
-    modules = Module.objects.filter(year=year)
-    for module in modules:
+    modules = list(Module.objects.filter(year=year))
+    for number, module in enumerate(modules):
+        progress(number, len(modules))
         if (
                 str(level) in module.eligible and
                 subject_area in module.subject_areas.all()
@@ -3434,7 +3107,6 @@ def export_all_marks(request, subject_slug, year, level):
                 elements.append(element)
             elements.append(PageBreak())
     doc.build(elements)
-    return response
 
 
 @login_required
@@ -3833,21 +3505,15 @@ def export_problem_students_after_resits(request, subject_slug, year, level):
     doc = SimpleDocTemplate(response)
     elements = []
     problem_performances = {}
-    current_year = int(Setting.objects.get(name="current_year").value)
+    current_year = db_settings.current_year
     subject_area = SubjectArea.objects.get(slug=subject_slug)
-    students = []
     if int(year) < current_year:
         difference = current_year - int(year)
         level = int(level) - difference
     else:
         level = int(level)
-    all_students = Student.objects.filter(active=True, year=level)
-    for student in all_students:
-        if (
-                student.course and
-                subject_area in student.course.subject_areas.all()
-        ):
-            students.append(student)
+    students = list(Student.objects.cohort(
+        subject_area, level).prefetch_related('performances__module'))
     problem_students = []
     for student in students:
         for performance in student.performances.all():
@@ -3926,9 +3592,8 @@ def export_problem_students_after_resits(request, subject_slug, year, level):
 @login_required
 @user_passes_test(is_admin)
 def export_nors(request, subject_slug, year, level):
-    """Exports letters to notify students of their results"""
+    """Queues the letters notifying students of their resits"""
     levelstr = str(int(level) + 3)
-    response = HttpResponse(content_type='application/pdf')
     filename = (
         'NORs_Year_' +
         levelstr +
@@ -3936,20 +3601,19 @@ def export_nors(request, subject_slug, year, level):
         academic_year_string(year) +
         ').pdf'
     )
-    responsestring = 'attachment; filename=' + filename
-    response['Content-Disposition'] = responsestring
-    doc = SimpleDocTemplate(response)
+    job = queue_export(
+        request.user, 'nors', filename, subject_slug, year, level)
+    return redirect(job.get_absolute_url())
+
+
+def nors_pdf(output, progress, subject_slug, year, level):
+    """Exports letters to notify students of their results"""
+    levelstr = str(int(level) + 3)
+    doc = SimpleDocTemplate(output)
     elements = []
     styles = getSampleStyleSheet()
-    all_students = Student.objects.filter(active=True, year=level)
     subject_area = SubjectArea.objects.get(slug=subject_slug)
-    students = []
-    for student in all_students:
-        if (
-                student.course and
-                subject_area in student.course.subject_areas.all()
-        ):
-            students.append(student)
+    students = list(Student.objects.cohort(subject_area, level))
     headline = (
         'NOTIFICATION OF RE-SITS / SITS FORM ' +
         academic_year_string(year)
@@ -4198,7 +3862,8 @@ def export_nors(request, subject_slug, year, level):
         'process and support available.'
     ))
 
-    for student in students:
+    for number, student in enumerate(students):
+        progress(number, len(students))
         problem_performances = []
         for performance in student.performances.all():
             if performance.module.year == int(year):
@@ -4320,6 +3985,39 @@ def export_nors(request, subject_slug, year, level):
                 elements.append(element)
             elements.append(PageBreak())
     doc.build(elements)
+
+
+@login_required
+@user_passes_test(is_staff)
+def export_job(request, job_id):
+    """Shows the progress of a background export and the download link
+
+    With ?format=json, only the status and progress are returned, so that
+    the page can poll them. Jobs of other users, and jobs that have
+    expired and been deleted, are not found.
+    """
+    job = get_object_or_404(ExportJob, id=job_id, user=request.user)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'status': job.status,
+            'progress': job.progress,
+        })
+    return render(request, 'export_job.html', {'job': job})
+
+
+@login_required
+@user_passes_test(is_staff)
+def download_export(request, job_id):
+    """Serves the file of a finished export"""
+    job = get_object_or_404(ExportJob, id=job_id, user=request.user)
+    path = result_path(job)
+    if job.status != 'done' or not os.path.exists(path):
+        return redirect(job.get_absolute_url())
+    content_type = mimetypes.guess_type(job.filename)[0]
+    response = FileResponse(
+        open(path, 'rb'), content_type=content_type or 'application/pdf')
+    responsestring = 'attachment; filename=' + job.filename
+    response['Content-Disposition'] = responsestring
     return response
 
 
@@ -12,6 +12,7 @@ import django.conf.global_settings as DEFAULT_SETTINGS
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 import os
+import sys
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
 
@@ -68,6 +69,29 @@ DATABASES = {
     }
 }
 
+# Caches
+# The cached values (see main.caching and main.db_settings) are
+# invalidated by changing a version stamp in the cache, so all worker
+# processes have to share one cache - with the default local memory cache,
+# a change would only be noticed by the process that made it. The file
+# cache needs nothing else on a single server; installations running on
+# several servers should use memcached instead. The tests use a fresh
+# local memory cache, so that nothing is left over from earlier runs.
+
+if 'test' in sys.argv:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        }
+    }
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.6/topics/i18n/
 
@@ -98,3 +122,24 @@ CRISPY_TEMPLATE_PACK = 'bootstrap3'
 PASSWORD_HASHERS = (
     'django.contrib.auth.hashers.MD5PasswordHasher',
 )
+
+# Background exports (see main.jobs). Finished files are kept in
+# EXPORT_ROOT for EXPORT_LIFETIME seconds, jobs that are still running
+# after EXPORT_TIMEOUT seconds are considered crashed.
+EXPORT_ROOT = os.path.join(BASE_DIR, 'exports')
+EXPORT_LIFETIME = 60 * 60 * 24
+EXPORT_TIMEOUT = 60 * 60
+
+# Processes used to render the marksheets of a whole assessment (see
+# feedback.bulk). None means one per CPU core.
+MARKSHEET_WORKERS = None
+
+# Rendered marksheets are kept here (see feedback.marksheets)
+MARKSHEET_CACHE = os.path.join(BASE_DIR, 'marksheet_cache')
+
+# Staged data (main.staging) expires after DATA_LIFETIME seconds. Storing
+# a value purges up to DATA_PURGE_LIMIT expired instances with a
+# probability of DATA_PURGE_PROBABILITY, so no cron job is needed.
+DATA_LIFETIME = 60 * 60 * 24 * 14
+DATA_PURGE_PROBABILITY = 0.01
+DATA_PURGE_LIMIT = 100
@@ -86,6 +86,7 @@ urlpatterns += patterns(
         name='assign_tutors'
     ),
     url(r'^attendance/(\w+)/(\d{4})/(\w+)/$', 'attendance', name='attendance'),
+    url(r'^autocomplete/$', 'autocomplete', name='autocomplete'),
     url(r'^cause_error/', 'cause_error', name='cause_error'),
     url(
         r'^concessions/(\w+)/(\d{4})/(\w+)/$',
@@ -113,6 +114,11 @@ urlpatterns += patterns(
         'delete_staff_member',
         name='delete_staff_member'
     ),
+    url(
+        r'^download_export/(\d+)/$',
+        'download_export',
+        name='download_export'
+    ),
     url(
         r'^edit_assessment/(\w+)/(\d{4})/([-\w]+)/$',
         'assessment',
@@ -186,6 +192,7 @@ urlpatterns += patterns(
         'export_examiner_pack',
         name='export_examiner_pack'
     ),
+    url(r'^export_job/(\d+)/$', 'export_job', name='export_job'),
     url(
         r'^export_marks/(\w+)/(\d{4})/$',
         'export_marks_for_module',